@@ -4,7 +4,7 @@ from django.utils.translation import ugettext_lazy as _
 from django.contrib import admin
 from django.http import HttpResponseRedirect
 from django.core.urlresolvers import reverse
-from backup.tasks import make_databases_backup
+from backup.tasks import make_databases_backup_now
 from system.models import Configuration
 import logging
 
@@ -35,7 +35,7 @@ class SnapshotAdmin(admin.ModelAdmin):
         return ChangeList
 
     def backup_databases(request, id):
-        make_databases_backup.delay()
+        make_databases_backup_now.delay()
         return HttpResponseRedirect(reverse('admin:notification_taskhistory_changelist'))
 
     def get_urls(self):
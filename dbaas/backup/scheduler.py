@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import logging
+import time
+from collections import OrderedDict
+
+LOG = logging.getLogger(__name__)
+
+BACKUP_WINDOW = 6 * 60 * 60
+MAX_CONCURRENT_SNAPSHOTS = 2
+LATENCY_THRESHOLD = 5 * 60
+MAX_BACKOFF = 10 * 60
+# Weight of the last snapshot on the observed latency
+LATENCY_WEIGHT = 0.3
+# Wait before trying again a snapshot with every slot taken
+RETRY_INTERVAL = 60
+# The slot of a snapshot that never finished is freed after it
+SLOT_TIMEOUT = 3 * 60 * 60
+# Snapshots of a run are started from its plan at this interval, tasks with
+# a countdown longer than the visibility timeout of the broker are
+# delivered again
+DISPATCH_INTERVAL = 60
+
+ACQUIRE_SLOT_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[2]) then
+    redis.call('ZADD', KEYS[1], ARGV[3], ARGV[4])
+    redis.call('EXPIRE', KEYS[1], ARGV[5])
+    return 1
+end
+return 0
+"""
+
+
+def plan_backups(instances, window):
+    """
+    Countdown in seconds of the snapshot of each instance. Each environment
+    has its own storage backend, so the starts of each environment are
+    spread over window on their own.
+    """
+    by_environment = OrderedDict()
+    for instance in instances:
+        environment = instance.databaseinfra.environment_id
+        by_environment.setdefault(environment, []).append(instance)
+
+    plan = []
+    for environment_instances in by_environment.values():
+        step = float(window) / len(environment_instances)
+        for position, instance in enumerate(environment_instances):
+            plan.append((instance, int(position * step)))
+    return plan
+
+
+class InfraBackupReport(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.started_at = None
+        self.ended_at = None
+        self.size = 0
+        self.snapshots = 0
+        self.errors = 0
+
+    @property
+    def duration(self):
+        if self.started_at is None or self.ended_at is None:
+            return 0
+        return (self.ended_at - self.started_at).total_seconds()
+
+    def add(self, started_at, ended_at, snapshot):
+        if self.started_at is None or started_at < self.started_at:
+            self.started_at = started_at
+        if self.ended_at is None or ended_at > self.ended_at:
+            self.ended_at = ended_at
+
+        self.snapshots += 1
+        if snapshot.was_error:
+            self.errors += 1
+        else:
+            self.size += snapshot.size or 0
+
+    def __unicode__(self):
+        return "{}: {} snapshots, {} errors, {} bytes in {:.0f}s".format(
+            self.name, self.snapshots, self.errors, self.size, self.duration
+        )
+
+    def __str__(self):
+        return self.__unicode__()
+
+
+def infra_reports(snapshots):
+    """ Duration and size of the snapshots of each database infra """
+    reports = OrderedDict()
+    for snapshot in snapshots:
+        infra = snapshot.instance.databaseinfra
+        report = reports.setdefault(infra.name, InfraBackupReport(infra.name))
+        report.add(
+            snapshot.start_at, snapshot.end_at or snapshot.start_at, snapshot
+        )
+    return reports
+
+
+def pending_instances(instances, since):
+    """ Instances without a successful snapshot started after since """
+    from backup.models import Snapshot
+
+    done = set(Snapshot.objects.filter(
+        start_at__gte=since,
+        status__in=[Snapshot.SUCCESS, Snapshot.WARNING],
+        instance__in=instances,
+    ).values_list('instance_id', flat=True))
+    return [instance for instance in instances if instance.id not in done]
+
+
+class EnvironmentSlots(object):
+
+    """
+    Snapshots running in the storage backend of one environment, shared by
+    every worker. At most max_concurrent hold a slot at a time and, while
+    snapshots take longer than latency_threshold, a snapshot without a slot
+    waits the extra time they are taking, up to max_backoff.
+    """
+
+    def __init__(self, environment_id, max_concurrent=MAX_CONCURRENT_SNAPSHOTS,
+                 latency_threshold=LATENCY_THRESHOLD, max_backoff=MAX_BACKOFF,
+                 client=None):
+        if client is None:
+            from util.decorators import REDIS_CLIENT
+            client = REDIS_CLIENT
+
+        self.client = client
+        self.max_concurrent = max_concurrent
+        self.latency_threshold = latency_threshold
+        self.max_backoff = max_backoff
+        self.slots_key = "backup:slots:{}".format(environment_id)
+        self.latency_key = "backup:latency:{}".format(environment_id)
+
+    def acquire(self, token, timeout=SLOT_TIMEOUT):
+        now = time.time()
+        acquire = self.client.register_script(ACQUIRE_SLOT_SCRIPT)
+        return bool(acquire(
+            keys=[self.slots_key],
+            args=[now, self.max_concurrent, now + timeout, token, timeout]
+        ))
+
+    def release(self, token):
+        self.client.zrem(self.slots_key, token)
+
+    @property
+    def latency(self):
+        latency = self.client.get(self.latency_key)
+        return float(latency) if latency is not None else None
+
+    def record_latency(self, elapsed):
+        latency = self.latency
+        if latency is not None:
+            elapsed = LATENCY_WEIGHT * elapsed + (1 - LATENCY_WEIGHT) * latency
+        self.client.set(self.latency_key, elapsed)
+
+    def retry_delay(self):
+        delay = RETRY_INTERVAL
+        latency = self.latency
+        if latency is not None and latency > self.latency_threshold:
+            delay += min(latency - self.latency_threshold, self.max_backoff)
+        return delay
+
+
+class BackupPlan(object):
+
+    """
+    Start time of the snapshot of each instance of a backup run, shared by
+    the dispatches of the run. An instance is started by the dispatch that
+    removes it from the plan.
+    """
+
+    def __init__(self, run_id, client=None):
+        if client is None:
+            from util.decorators import REDIS_CLIENT
+            client = REDIS_CLIENT
+
+        self.client = client
+        self.plan_key = "backup:plan:{}".format(run_id)
+
+    def add(self, plan, started_at, timeout):
+        self.client.zadd(self.plan_key, **dict(
+            (str(instance.id), started_at + countdown)
+            for instance, countdown in plan
+        ))
+        self.client.expire(self.plan_key, timeout)
+
+    def pop_due(self, now=None):
+        if now is None:
+            now = time.time()
+        due = self.client.zrangebyscore(self.plan_key, '-inf', now)
+        return [
+            int(instance_id) for instance_id in due
+            if self.client.zrem(self.plan_key, instance_id)
+        ]
+
+    def pending(self):
+        return self.client.zcard(self.plan_key)
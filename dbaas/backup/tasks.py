@@ -1,10 +1,17 @@
 # -*- coding: utf-8 -*-
 import logging
+import uuid
 from dbaas.celery import app
-from util.decorators import only_one
+from util.decorators import only_one, REDIS_CLIENT
 from physical.models import DatabaseInfra, Plan, Instance
 from logical.models import Database
 from models import Snapshot
+from scheduler import EnvironmentSlots, pending_instances, plan_backups
+from scheduler import BackupPlan, infra_reports
+from scheduler import (
+    BACKUP_WINDOW, MAX_CONCURRENT_SNAPSHOTS, LATENCY_THRESHOLD, MAX_BACKOFF,
+    SLOT_TIMEOUT, RETRY_INTERVAL, DISPATCH_INTERVAL
+)
 from notification.models import TaskHistory
 from system.models import Configuration
 import datetime
@@ -23,6 +30,12 @@ from workflow.steps.util.nfsaas_utils import create_snapshot, delete_snapshot, \
 
 LOG = logging.getLogger(__name__)
 
+BACKUP_LOCK_KEY = "makedatabasebackupkey"
+BACKUP_NOW_LOCK_KEY = "makedatabasebackupnowkey"
+BACKUP_LOCK_TIMEOUT = 10 * 60
+# How long the status of a backup run is kept after its last snapshot
+BACKUP_RUN_TIMEOUT = 24 * 60 * 60
+
 
 def set_backup_error(databaseinfra, snapshot, errormsg):
     LOG.error(errormsg)
@@ -208,79 +221,276 @@ def make_instance_snapshot_backup(instance, error):
     return snapshot
 
 
-@app.task(bind=True)
-@only_one(key="makedatabasebackupkey")
-def make_databases_backup(self):
+def backup_eligible_instances(task_history):
+    databaseinfras = DatabaseInfra.objects.filter(
+        plan__provider=Plan.CLOUDSTACK, plan__has_persistence=True
+    )
+    instances = Instance.objects.filter(
+        databaseinfra__in=databaseinfras, read_only=False
+    ).select_related('databaseinfra', 'databaseinfra__environment')
+
+    eligible, failed = [], []
+    for instance in instances:
+        try:
+            if not instance.databaseinfra.get_driver().check_instance_is_eligible_for_backup(instance):
+                LOG.info('Instance %s is not eligible for backup' % (str(instance)))
+                continue
+        except Exception as e:
+            failed.append(instance)
+            msg = "Backup for %s was unsuccessful. Error: %s" % (
+                str(instance), str(e))
+            LOG.error(msg)
+            time_now = str(time.strftime("%m/%d/%Y %H:%M:%S"))
+            task_history.update_details(
+                persist=True, details="\n{} - {}".format(time_now, msg)
+            )
+        else:
+            eligible.append(instance)
+
+    return eligible, failed
 
+
+def backup_run_key(task_history):
+    return "backup:run:{}".format(task_history.id)
+
+
+def log_backup(task_history, msg):
+    time_now = str(time.strftime("%m/%d/%Y %H:%M:%S"))
+    task_history.update_details(
+        persist=True, details="\n{} - {}".format(time_now, msg)
+    )
+
+
+def schedule_databases_backup(request, window, skip_backed_up):
+    """
+    Plans the snapshot of each eligible instance, the starts of each
+    environment spread over window seconds, and starts dispatch_backups
+    for the run. With
+    skip_backed_up the instances with a snapshot in the last window are
+    not backed up again. The task history is finished by the last snapshot.
+    """
     LOG.info("Making databases backups")
     worker_name = get_worker_name()
-    task_history = TaskHistory.register(request=self.request,
+    task_history = TaskHistory.register(request=request,
                                         worker_name=worker_name, user=None)
+    started_at = time.time()
 
-    status = TaskHistory.STATUS_SUCCESS
-    databaseinfras = DatabaseInfra.objects.filter(
-        plan__provider=Plan.CLOUDSTACK, plan__has_persistence=True
+    instances, failed = backup_eligible_instances(task_history)
+    if skip_backed_up:
+        pending = pending_instances(
+            instances, datetime.datetime.now() - timedelta(seconds=window)
+        )
+    else:
+        pending = instances
+
+    status = TaskHistory.STATUS_ERROR if failed else TaskHistory.STATUS_SUCCESS
+    task_history.update_details(persist=True, details=(
+        "\n{} instances to backup in {} minutes, {} already backed up".format(
+            len(pending), window / 60, len(instances) - len(pending)
+        )
+    ))
+    if not pending:
+        task_history.update_status_for(status, details="\nBackup finished")
+        return
+
+    timeout = window + SLOT_TIMEOUT + BACKUP_RUN_TIMEOUT
+    run_key = backup_run_key(task_history)
+    REDIS_CLIENT.hmset(run_key, {'remaining': len(pending), 'status': status})
+    REDIS_CLIENT.expire(run_key, timeout)
+
+    BackupPlan(task_history.id).add(
+        plan_backups(pending, window), started_at, timeout
     )
-    error = {}
-    backup_number = 0
-    backups_per_group = len(databaseinfras) / 12
-    for databaseinfra in databaseinfras:
-        if backups_per_group > 0:
-            if backup_number < backups_per_group:
-                backup_number += 1
-            else:
-                backup_number = 0
-                waiting_msg = "\nWaiting 5 minutes to start the next backup group"
-                task_history.update_details(persist=True, details=waiting_msg)
-                time.sleep(300)
-
-        instances = Instance.objects.filter(
-            databaseinfra=databaseinfra, read_only=False
+    dispatch_backups.delay(task_history.id, started_at)
+
+
+@app.task(acks_late=True)
+def dispatch_backups(task_history_id, since):
+    """
+    Starts the snapshots of a backup run whose time came and runs again
+    every DISPATCH_INTERVAL seconds, until every snapshot of the plan was
+    started. A countdown over the window would outlive the visibility
+    timeout of the broker and start snapshots twice.
+    """
+    plan = BackupPlan(task_history_id)
+    for instance_id in plan.pop_due():
+        make_instance_backup.delay(instance_id, task_history_id, since)
+
+    if plan.pending():
+        dispatch_backups.apply_async(
+            args=[task_history_id, since], countdown=DISPATCH_INTERVAL
         )
-        for instance in instances:
-            try:
-                if not instance.databaseinfra.get_driver().check_instance_is_eligible_for_backup(instance):
-                    LOG.info('Instance %s is not eligible for backup' % (str(instance)))
-                    continue
-            except Exception as e:
-                status = TaskHistory.STATUS_ERROR
-                msg = "Backup for %s was unsuccessful. Error: %s" % (
-                    str(instance), str(e))
-                LOG.error(msg)
-            else:
-                time_now = str(time.strftime("%m/%d/%Y %H:%M:%S"))
-                start_msg = "\n{} - Starting backup for {} ...".format(time_now, instance)
-                task_history.update_details(persist=True, details=start_msg)
-                try:
-                    snapshot = make_instance_snapshot_backup(
-                        instance=instance, error=error
-                    )
-                    if snapshot and snapshot.was_successful:
-                        msg = "Backup for %s was successful" % (str(instance))
-                        LOG.info(msg)
-                    elif snapshot and snapshot.has_warning:
-                        status = TaskHistory.STATUS_WARNING
-                        msg = "Backup for %s has warning" % (str(instance))
-                        LOG.info(msg)
-                    else:
-                        status = TaskHistory.STATUS_ERROR
-                        msg = "Backup for %s was unsuccessful. Error: %s" % (
-                            str(instance), error['errormsg'])
-                        LOG.error(msg)
-                    LOG.info(msg)
-                except Exception as e:
-                    status = TaskHistory.STATUS_ERROR
-                    msg = "Backup for %s was unsuccessful. Error: %s" % (
-                        str(instance), str(e))
-                    LOG.error(msg)
 
-            time_now = str(time.strftime("%m/%d/%Y %H:%M:%S"))
-            msg = "\n{} - {}".format(time_now, msg)
-            task_history.update_details(persist=True, details=msg)
 
+def finish_instance_backup(task_history, instance, status, since):
+    """ Counts the snapshot of instance on its run once, even when its task
+    is delivered again. The last one finishes the run with a report of
+    each database infra. """
+    run_key = backup_run_key(task_history)
+    if not REDIS_CLIENT.hsetnx(run_key, 'done:{}'.format(instance.id), status):
+        return
+
+    if status != TaskHistory.STATUS_SUCCESS:
+        if status == TaskHistory.STATUS_ERROR or \
+                REDIS_CLIENT.hget(run_key, 'status') != TaskHistory.STATUS_ERROR:
+            REDIS_CLIENT.hset(run_key, 'status', status)
+
+    if REDIS_CLIENT.hincrby(run_key, 'remaining', -1) > 0:
+        return
+
+    status = REDIS_CLIENT.hget(run_key, 'status') or TaskHistory.STATUS_SUCCESS
+    instance_ids = [
+        int(field.split(':')[1]) for field in REDIS_CLIENT.hkeys(run_key)
+        if field.startswith('done:')
+    ]
+    REDIS_CLIENT.delete(run_key)
+    log_backup_report(task_history, instance_ids, since)
     task_history.update_status_for(status, details="\nBackup finished")
 
-    return
+
+def log_backup_report(task_history, instance_ids, since):
+    snapshots = Snapshot.objects.filter(
+        instance__in=instance_ids,
+        start_at__gte=datetime.datetime.fromtimestamp(since)
+    ).select_related('instance__databaseinfra').order_by('start_at')
+    reports = infra_reports(snapshots)
+    for report in reports.values():
+        LOG.info("Backup report %s", report)
+
+    report_msg = "\n".join(str(report) for report in reports.values())
+    if report_msg:
+        task_history.update_details(
+            persist=True, details="\nBackups by infra:\n" + report_msg
+        )
+
+
+def snapshot_status(snapshot):
+    if snapshot and snapshot.was_successful:
+        return TaskHistory.STATUS_SUCCESS
+    if snapshot and snapshot.has_warning:
+        return TaskHistory.STATUS_WARNING
+    return TaskHistory.STATUS_ERROR
+
+
+@app.task(bind=True, acks_late=True, max_retries=None)
+def make_instance_backup(self, instance_id, task_history_id, since):
+    """
+    Snapshots one instance of a backup run, waiting for a free slot on the
+    storage of its environment. Deliveries of the task repeated by the
+    broker or after a worker restart run one at a time, and an instance is
+    counted once on its run.
+    """
+    instance = Instance.objects.select_related(
+        'databaseinfra', 'databaseinfra__environment'
+    ).get(id=instance_id)
+    task_history = TaskHistory.objects.get(id=task_history_id)
+
+    run_key = backup_run_key(task_history)
+    if not REDIS_CLIENT.exists(run_key) or \
+            REDIS_CLIENT.hexists(run_key, 'done:{}'.format(instance.id)):
+        LOG.info("Instance %s already backed up on this run" % instance)
+        return
+
+    token = uuid.uuid4().hex
+    lock_key = "{}:instance:{}".format(run_key, instance.id)
+    if not REDIS_CLIENT.set(lock_key, token, ex=SLOT_TIMEOUT, nx=True):
+        LOG.info("Instance %s is being backed up by another delivery" % (
+            instance))
+        raise self.retry(countdown=RETRY_INTERVAL)
+
+    try:
+        backup_instance(self, instance, task_history, since, token)
+    finally:
+        if REDIS_CLIENT.get(lock_key) == token:
+            REDIS_CLIENT.delete(lock_key)
+
+
+def backup_instance(task, instance, task_history, since, token):
+    run_key = backup_run_key(task_history)
+    started_key = 'started:{}'.format(instance.id)
+    interrupted_at = REDIS_CLIENT.hget(run_key, started_key)
+    snapshots = Snapshot.objects.filter(
+        instance=instance,
+        start_at__gte=datetime.datetime.fromtimestamp(since)
+    ).exclude(status=Snapshot.ERROR)
+    for snapshot in snapshots:
+        if snapshot.status != Snapshot.RUNNING:
+            LOG.info("Instance %s already backed up on this run" % instance)
+            finish_instance_backup(
+                task_history, instance, snapshot_status(snapshot), since
+            )
+            return
+
+        if interrupted_at and snapshot.start_at >= \
+                datetime.datetime.fromtimestamp(int(float(interrupted_at))):
+            # Left running by a delivery of this run that stopped
+            set_backup_error(
+                instance.databaseinfra, snapshot,
+                "Backup interrupted, it is taken again"
+            )
+
+    slots = EnvironmentSlots(
+        instance.databaseinfra.environment_id,
+        max_concurrent=Configuration.get_by_name_as_int(
+            'backup_max_concurrent_snapshots',
+            default=MAX_CONCURRENT_SNAPSHOTS),
+        latency_threshold=Configuration.get_by_name_as_int(
+            'backup_latency_threshold', default=LATENCY_THRESHOLD),
+        max_backoff=Configuration.get_by_name_as_int(
+            'backup_max_backoff', default=MAX_BACKOFF),
+    )
+    if not slots.acquire(token):
+        raise task.retry(countdown=slots.retry_delay())
+
+    log_backup(task_history, "Starting backup for {} ...".format(instance))
+    started_at = time.time()
+    REDIS_CLIENT.hset(run_key, started_key, started_at)
+    snapshot = None
+    try:
+        snapshot = make_instance_snapshot_backup(instance=instance, error={})
+    except Exception:
+        LOG.error("Error on backup of %s", instance, exc_info=True)
+    finally:
+        elapsed = time.time() - started_at
+        slots.release(token)
+        slots.record_latency(elapsed)
+
+    status = snapshot_status(snapshot)
+    if status == TaskHistory.STATUS_SUCCESS:
+        msg = "Backup for %s was successful" % (str(instance))
+        LOG.info(msg)
+    elif status == TaskHistory.STATUS_WARNING:
+        msg = "Backup for %s has warning" % (str(instance))
+        LOG.info(msg)
+    else:
+        msg = "Backup for %s was unsuccessful. Error: %s" % (
+            str(instance), snapshot and snapshot.error)
+        LOG.error(msg)
+
+    size = snapshot.size if snapshot and snapshot.size else 0
+    log_backup(task_history, "{} ({:.0f}s, {} bytes)".format(
+        msg, elapsed, size
+    ))
+    finish_instance_backup(task_history, instance, status, since)
+
+
+@app.task(bind=True)
+@only_one(key=BACKUP_LOCK_KEY, timeout=BACKUP_LOCK_TIMEOUT)
+def make_databases_backup(self):
+    """
+    Periodic backup: snapshots are spread over backup_window_minutes and
+    instances with a snapshot in the last window are skipped
+    """
+    window = Configuration.get_by_name_as_int(
+        'backup_window_minutes', default=BACKUP_WINDOW / 60) * 60
+    schedule_databases_backup(self.request, window, skip_backed_up=True)
+
+
+@app.task(bind=True)
+@only_one(key=BACKUP_NOW_LOCK_KEY, timeout=BACKUP_LOCK_TIMEOUT)
+def make_databases_backup_now(self):
+    """ On demand backup of every eligible instance, starting now """
+    schedule_databases_backup(self.request, window=0, skip_backed_up=False)
 
 
 def remove_snapshot_backup(snapshot):
@@ -5,7 +5,12 @@ when you run "manage.py test".
 Replace this with more appropriate tests for your application.
 """
 
+import mock
+from datetime import datetime
 from django.test import TestCase
+from util.tests.test_shared_cache import FakeRedis
+from backup.scheduler import EnvironmentSlots, plan_backups, RETRY_INTERVAL
+from backup.scheduler import BackupPlan, infra_reports
 
 
 class SimpleTest(TestCase):
@@ -15,3 +20,115 @@ class SimpleTest(TestCase):
         Tests that 1 + 1 always equals 2.
         """
         self.assertEqual(1 + 1, 2)
+
+
+class PlanBackupsTestCase(TestCase):
+
+    def instance(self, environment):
+        instance = mock.Mock()
+        instance.databaseinfra.environment_id = environment
+        return instance
+
+    def test_spreads_each_environment_over_window(self):
+        dev = [self.instance(1) for _ in range(4)]
+        prod = [self.instance(2) for _ in range(2)]
+
+        plan = dict(plan_backups(dev + prod, window=100))
+        self.assertEqual([plan[instance] for instance in dev], [0, 25, 50, 75])
+        self.assertEqual([plan[instance] for instance in prod], [0, 50])
+
+    def test_without_window_everything_starts_now(self):
+        instances = [self.instance(1) for _ in range(3)]
+        self.assertEqual(
+            [countdown for _, countdown in plan_backups(instances, window=0)],
+            [0, 0, 0]
+        )
+
+
+class EnvironmentSlotsTestCase(TestCase):
+
+    def setUp(self):
+        self.client = FakeRedis()
+        self.slots = EnvironmentSlots(
+            1, max_concurrent=2, latency_threshold=60, max_backoff=100,
+            client=self.client
+        )
+
+    def test_acquire_runs_script_with_limit(self):
+        self.client.register_script = mock.Mock()
+        script = self.client.register_script.return_value
+        script.return_value = 0
+
+        self.assertFalse(self.slots.acquire('task-1', timeout=10))
+        args = script.call_args[1]['args']
+        self.assertEqual(args[1], 2)
+        self.assertEqual(args[3], 'task-1')
+
+    def test_waits_retry_interval_while_snapshots_are_fast(self):
+        self.assertEqual(self.slots.retry_delay(), RETRY_INTERVAL)
+        self.slots.record_latency(30)
+        self.assertEqual(self.slots.retry_delay(), RETRY_INTERVAL)
+
+    def test_backs_off_when_snapshots_are_slow(self):
+        self.slots.record_latency(90)
+        self.assertEqual(self.slots.retry_delay(), RETRY_INTERVAL + 30)
+
+        self.slots.record_latency(1000)
+        self.assertEqual(self.slots.retry_delay(), RETRY_INTERVAL + 100)
+
+
+class BackupPlanTestCase(TestCase):
+
+    def setUp(self):
+        self.client = mock.Mock()
+        self.plan = BackupPlan(1, client=self.client)
+
+    def test_adds_start_time_of_each_instance(self):
+        instances = [mock.Mock(id=id) for id in (10, 11)]
+        self.plan.add(zip(instances, [0, 50]), started_at=1000, timeout=60)
+
+        self.client.zadd.assert_called_once_with(
+            'backup:plan:1', **{'10': 1000, '11': 1050}
+        )
+        self.client.expire.assert_called_once_with('backup:plan:1', 60)
+
+    def test_pops_only_instances_removed_by_this_dispatch(self):
+        self.client.zrangebyscore.return_value = ['10', '11', '12']
+        self.client.zrem.side_effect = [1, 0, 1]
+
+        self.assertEqual(self.plan.pop_due(now=1050), [10, 12])
+        self.client.zrangebyscore.assert_called_once_with(
+            'backup:plan:1', '-inf', 1050
+        )
+
+
+class InfraReportsTestCase(TestCase):
+
+    def snapshot(self, infra, start, end, size, was_error=False):
+        snapshot = mock.Mock(
+            start_at=datetime(2016, 1, 1, 0, start),
+            end_at=datetime(2016, 1, 1, 0, end),
+            size=size, was_error=was_error
+        )
+        snapshot.instance.databaseinfra.name = infra
+        return snapshot
+
+    def test_reports_duration_and_size_by_infra(self):
+        reports = infra_reports([
+            self.snapshot('infra_1', 0, 10, 10),
+            self.snapshot('infra_2', 5, 6, 30),
+            self.snapshot('infra_1', 20, 30, 10),
+        ])
+
+        self.assertEqual(list(reports), ['infra_1', 'infra_2'])
+        self.assertEqual(reports['infra_1'].snapshots, 2)
+        self.assertEqual(reports['infra_1'].size, 20)
+        self.assertEqual(reports['infra_1'].duration, 30 * 60)
+        self.assertEqual(reports['infra_2'].errors, 0)
+
+    def test_backup_errors_are_reported(self):
+        reports = infra_reports([
+            self.snapshot('infra_1', 0, 10, 10, was_error=True),
+        ])
+        self.assertEqual(reports['infra_1'].errors, 1)
+        self.assertEqual(reports['infra_1'].size, 0)
@@ -4,6 +4,7 @@ from django.shortcuts import render_to_response
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator, EmptyPage, InvalidPage
 from physical.models import DatabaseInfra
+from physical.capacity import with_used
 from logical.models import Database
 
 LOG = logging.getLogger(__name__)
@@ -13,7 +14,9 @@ LOG = logging.getLogger(__name__)
 def dashboard(request):
     env_id = request.GET.get('env_id')
     engine_type = request.GET.get('engine_type')
-    dbinfra_list = DatabaseInfra.objects.all().order_by('name')
+    dbinfra_list = with_used(DatabaseInfra.objects.select_related(
+        'engine', 'environment', 'plan'
+    )).order_by('name')
     url_par = "?"
     if env_id or engine_type:
         if env_id:
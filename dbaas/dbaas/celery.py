@@ -13,6 +13,7 @@ from logging.handlers import SysLogHandler
 from celery.log import redirect_stdouts_to_logger
 
 from celery.signals import after_setup_task_logger, after_setup_logger
+from celery.signals import worker_init
 
 
 def setup_log(**args):
@@ -46,6 +47,16 @@ app.config_from_object(celeryconfig)
 app.autodiscover_tasks(lambda: settings.INSTALLED_APPS)
 
 
+@worker_init.connect
+def compile_workflow_plans(**kwargs):
+    # Resolves the steps of every topology before the pool is forked, so
+    # invalid steps are logged at startup and never imported again
+    from workflow.plan import compile_topologies
+    errors = compile_topologies()
+    if errors:
+        LOG.error('%s invalid workflow plans', len(errors))
+
+
 @app.task(bind=True)
 def debug_task(self):
     LOG.debug('Request: {0!r}'.format(self.request))
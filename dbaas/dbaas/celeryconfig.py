@@ -4,6 +4,9 @@ REDIS_PORT = os.getenv('DBAAS_NOTIFICATION_BROKER_PORT', '6379')
 BROKER_URL = os.getenv(
     'DBAAS_NOTIFICATION_BROKER_URL', 'redis://localhost:%s/0' % REDIS_PORT)
 CELERYD_TASK_TIME_LIMIT = 10800
+# Redis delivers again the tasks not acknowledged after visibility_timeout,
+# it must be longer than the time limit of acks_late tasks
+BROKER_TRANSPORT_OPTIONS = {'visibility_timeout': 4 * 60 * 60}
 CELERY_TRACK_STARTED = True
 CELERY_IGNORE_RESULT = False
 CELERY_RESULT_BACKEND = 'djcelery.backends.cache:CacheBackend'
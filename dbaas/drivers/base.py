@@ -231,48 +231,72 @@ class BaseDriver(object):
         pass
 
     def start_agents(self, host):
-        from dbaas_cloudstack.models import HostAttr
-        from util import exec_remote_command
-
-        host_attr = HostAttr.objects.get(host=host)
-
-        for agent in self.get_database_agents():
-            script = '/etc/init.d/{} start'.format(agent)
-            output = {}
-            return_code = exec_remote_command(
-                server=host.address,
-                username=host_attr.vm_user,
-                password=host_attr.vm_password,
-                command=script,
-                output=output
+        from util.ssh import RemoteTarget, run_remote_commands
+
+        host_target = RemoteTarget.for_host(host)
+        targets = [
+            RemoteTarget(
+                host, host_target.address, host_target.username,
+                host_target.password, context={'agent': agent}
             )
+            for agent in self.get_database_agents()
+        ]
+        # The agents of a host start one at a time, in order
+        results = run_remote_commands(
+            targets, '/etc/init.d/{{ agent }} start', max_workers=1
+        )
+        for result in results:
             LOG.info(
-                'Running {} - Return Code: {}. Output script: {}'.format(
-                    script, return_code, output
+                'Running /etc/init.d/{} start - Return Code: {}. Output script: {} {}'.format(
+                    result.target.context['agent'], result.exit_status,
+                    result.stdout, result.stderr
                 )
             )
 
     def check_replication_and_switch(self, instance, attempts=100, check_is_master_attempts=5):
-        from time import sleep
-        for attempt in range(0, attempts):
-            if self.is_replication_ok(instance):
-                self.switch_master()
-                LOG.info("Switch master returned ok...")
-
-                check_is_master_attempts_count = check_is_master_attempts
-                while self.check_instance_is_master(instance):
-                    if check_is_master_attempts_count == 0:
-                        break
-                    check_is_master_attempts_count -= 1
-                    sleep(10)
-                else:
-                    return
-
-                raise Exception("Could not change master")
-
-            LOG.info("Waiting 10s to check replication...")
-            sleep(10)
-        raise Exception("Could not switch master because of replication's delay")
+        from util.wait import wait_until
+        LOG.info("Waiting replication to switch master...")
+        if not wait_until(lambda: self.is_replication_ok(instance),
+                          timeout=attempts * 10, max_interval=10,
+                          name='replication_ok'):
+            raise Exception("Could not switch master because of replication's delay")
+
+        self.switch_master()
+        LOG.info("Switch master returned ok...")
+
+        if not wait_until(lambda: not self.check_instance_is_master(instance),
+                          timeout=check_is_master_attempts * 10,
+                          max_interval=10, name='switch_master'):
+            raise Exception("Could not change master")
+
+    def snapshot(self):
+        """ Returns info() along with the liveness and the replication lag
+        of every instance, collected in a single pass over the infra """
+        try:
+            databaseinfra_status = self.info()
+        except Exception as e:
+            LOG.warning("Could not retrieve info for databaseinfra {}: {}".format(
+                self.databaseinfra, e))
+            databaseinfra_status = DatabaseInfraStatus(
+                databaseinfra_model=self.databaseinfra)
+
+        for instance in self.databaseinfra.instances.all():
+            try:
+                is_alive = bool(self.check_status(instance=instance))
+            except Exception:
+                is_alive = False
+            databaseinfra_status.instances_status[instance.id] = is_alive
+
+            if not (is_alive and instance.is_database):
+                continue
+
+            try:
+                replication_lag = self.get_replication_info(instance=instance)
+            except Exception:
+                replication_lag = None
+            databaseinfra_status.replication_lag[instance.id] = replication_lag
+
+        return databaseinfra_status
 
     def get_database_agents(self):
         """ Returns database agents list"""
@@ -315,7 +339,17 @@ class DatabaseInfraStatus(object):
         self.version = None
         self.used_size_in_bytes = -1
         self.databases_status = {}
+        self.instances_status = {}
+        self.replication_lag = {}
 
     def get_database_status(self, database_name):
         """ Return DatabaseStatus of one specific database """
         return self.databases_status.get(database_name, None)
+
+    def get_instance_status(self, instance):
+        """ Return if the instance was alive, None when it was not checked """
+        return self.instances_status.get(instance.id, None)
+
+    @property
+    def has_dead_instances(self):
+        return False in self.instances_status.values()
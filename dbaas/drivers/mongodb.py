@@ -9,6 +9,7 @@ from . import DatabaseInfraStatus
 from . import DatabaseStatus
 from . import AuthenticationError
 from . import ConnectionError
+from .pool import connection_pool, pool_key
 from physical.models import Instance
 from util import make_db_random_password
 from system.models import Configuration
@@ -160,17 +161,26 @@ class MongoDB(BaseDriver):
     def unlock_database(self, client):
         client.unlock()
 
+    def __pool_key(self, instance):
+        return pool_key(
+            self.databaseinfra, self.__get_admin_connection(instance),
+            self.databaseinfra.user, self.databaseinfra.password
+        )
+
     @contextmanager
     def pymongo(self, instance=None, database=None):
-        client = None
         try:
-            client = self.__mongo_client__(instance)
-
-            if database is None:
-                return_value = client
-            else:
-                return_value = getattr(client, database.name)
-            yield return_value
+            with connection_pool.connection(
+                key=self.__pool_key(instance),
+                factory=lambda: self.__mongo_client__(instance),
+                close=lambda client: client.close(),
+                health_check=lambda client: client.admin.command('ping')
+            ) as client:
+                if database is None:
+                    return_value = client
+                else:
+                    return_value = getattr(client, database.name)
+                yield return_value
         except pymongo.errors.OperationFailure, e:
             if e.code == 18:
                 raise AuthenticationError('Invalid credentials to databaseinfra %s: %s' %
@@ -180,13 +190,6 @@ class MongoDB(BaseDriver):
         except pymongo.errors.PyMongoError, e:
             raise ConnectionError('Error connecting to databaseinfra %s (%s): %s' %
                                   (self.databaseinfra, self.__get_admin_connection(), e.message))
-        finally:
-            try:
-                if client:
-                    client.close()
-            except:
-                LOG.warn('Error disconnecting from databaseinfra %s. Ignoring...',
-                         self.databaseinfra, exc_info=True)
 
     def check_status(self, instance=None):
         with self.pymongo(instance=instance) as client:
@@ -226,18 +229,22 @@ class MongoDB(BaseDriver):
             databaseinfra_status.used_size_in_bytes = json_list_databases.get(
                 'totalSize', 0)
 
-            list_databases = self.list_databases()
+            list_databases = [
+                db['name'] for db in json_list_databases.get('databases', [])
+            ]
+            try:
+                is_alive = client.admin.command('ping').get('ok', 0) == 1.0
+            except pymongo.errors.PyMongoError:
+                is_alive = False
+
             for database in self.databaseinfra.databases.all():
                 database_name = database.name
                 json_db_status = getattr(
                     client, database_name).command('dbStats')
                 db_status = DatabaseStatus(database)
-                # is_alive?
-                try:
-                    if self.check_status() and (database_name in list_databases):
-                        db_status.is_alive = True
-                except:
-                    pass
+                db_status.is_alive = is_alive and (
+                    database_name in list_databases
+                )
 
                 storageSize = json_db_status.get("storageSize") or 0
                 db_status.used_size_in_bytes = storageSize
@@ -9,6 +9,7 @@ from . import BaseDriver
 from . import DatabaseInfraStatus
 from . import AuthenticationError
 from . import ConnectionError
+from .pool import connection_pool, pool_key
 from . import GenericDriverError
 from . import DatabaseAlreadyExists
 from . import InvalidCredential
@@ -95,11 +96,26 @@ class MySQL(BaseDriver):
     def unlock_database(self, client):
         client.query("unlock tables")
 
+    def __pool_key(self, instance):
+        return pool_key(
+            self.databaseinfra,
+            "%s:%s" % self.__get_admin_connection(instance),
+            self.databaseinfra.user, self.databaseinfra.password
+        )
+
     @contextmanager
     def mysqldb(self, instance=None, database=None):
-        client = None
         try:
-            yield self.__mysql_client__(instance)
+            with connection_pool.connection(
+                key=self.__pool_key(instance),
+                factory=lambda: self.__mysql_client__(instance),
+                close=lambda client: client.close(),
+                health_check=lambda client: client.ping(),
+                # Ends the transaction of the caller, so the next one does
+                # not read its snapshot or wait on its locks
+                reset=lambda client: client.rollback()
+            ) as client:
+                yield client
         except _mysql_exceptions.OperationalError as e:
             if e.args[0] == ER_ACCESS_DENIED_ERROR:
                 raise AuthenticationError(e.args[1])
@@ -109,15 +125,6 @@ class MySQL(BaseDriver):
                 raise ConnectionError(e.args[1])
             else:
                 raise GenericDriverError(e.args)
-        finally:
-            try:
-                if client:
-                    LOG.debug(
-                        'Disconnecting mysql databaseinfra %s', self.databaseinfra)
-                    client.close()
-            except:
-                LOG.warn('Error disconnecting from databaseinfra %s. Ignoring...',
-                         self.databaseinfra, exc_info=True)
 
     def __query(self, query_string, instance=None):
         with self.mysqldb(instance=instance) as client:
@@ -150,15 +157,12 @@ class MySQL(BaseDriver):
         return self.__query(query_string, instance)
 
     def info(self):
-        from logical.models import Database
-
         databaseinfra_status = DatabaseInfraStatus(
             databaseinfra_model=self.databaseinfra)
 
         r = self.__query("SELECT VERSION()")
         databaseinfra_status.version = r[0]['VERSION()']
 
-        my_all_dbs = self.__query("SHOW DATABASES")
         db_sizes = self.__query("SELECT s.schema_name 'Database', ifnull(SUM( t.data_length + t.index_length), 0) 'Size' \
                                 FROM information_schema.SCHEMATA s \
                                   left outer join information_schema.TABLES t on s.schema_name = t.table_schema \
@@ -168,31 +172,19 @@ class MySQL(BaseDriver):
         for database in db_sizes:
             all_dbs[database['Database']] = int(database['Size'])
 
-        list_databases = self.list_databases()
-        for database_name in all_dbs.keys():
-            database_model = None
-            try:
-                # LOG.debug("checking status for database %s" % database_name)
-                database_model = Database.objects.get(
-                    name=database_name, databaseinfra=self.databaseinfra)
-            except Database.DoesNotExist:
-                pass
-
-            if database_model:
-                db_status = DatabaseStatus(database_model)
-                # is_alive?
-                try:
-                    if self.check_status() and (database_name in list_databases):
-                        db_status.is_alive = True
-                except Exception as e:
-                    LOG.warning(
-                        "could not retrieve db status for %s: %s" % (database_name, e))
-
-                db_status.total_size_in_bytes = 0
-                db_status.used_size_in_bytes = all_dbs[database_name]
-
-                databaseinfra_status.databases_status[
-                    database_name] = db_status
+        is_alive = self.check_status()
+        for database_model in self.databaseinfra.databases.all():
+            database_name = database_model.name
+            if database_name not in all_dbs:
+                continue
+
+            db_status = DatabaseStatus(database_model)
+            db_status.is_alive = is_alive
+            db_status.total_size_in_bytes = 0
+            db_status.used_size_in_bytes = all_dbs[database_name]
+
+            databaseinfra_status.databases_status[
+                database_name] = db_status
 
         databaseinfra_status.used_size_in_bytes = sum(all_dbs.values())
 
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import hashlib
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+LOG = logging.getLogger(__name__)
+
+__all__ = ['ConnectionPool', 'connection_pool', 'pool_key']
+
+POOL_MAX_IDLE_PER_KEY = 5
+POOL_MAX_IDLE = 200
+POOL_IDLE_TIMEOUT = 300
+POOL_HEALTH_CHECK_INTERVAL = 30
+
+
+def pool_key(databaseinfra, address, user=None, password=None, extra=None):
+    """ Key of the connections of one infra/instance endpoint and credential.
+    Returns None when the infra is not persisted, disabling the pool """
+    if not databaseinfra or not databaseinfra.pk:
+        return None
+
+    credential = hashlib.sha1(
+        "{}:{}".format(user or '', password or '').encode('utf-8')
+    ).hexdigest()
+    return (databaseinfra.pk, address, credential, extra)
+
+
+class _PooledConnection(object):
+
+    def __init__(self, client, close):
+        self.client = client
+        self.close = close
+        self.last_used = time.time()
+        self.generation = None
+
+    @property
+    def idle_time(self):
+        return time.time() - self.last_used
+
+    def disconnect(self):
+        try:
+            self.close(self.client)
+        except Exception:
+            LOG.warn('Error closing pooled connection. Ignoring...',
+                     exc_info=True)
+
+
+class ConnectionPool(object):
+
+    """
+    Process-wide pool of driver clients.
+    Clients are checked out for the exclusive use of one caller and given
+    back when the caller is done, so not thread-safe clients can be shared.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.pid = os.getpid()
+            self.idle = {}
+            self.generations = {}
+
+    def __setting(self, name, default):
+        from system.models import Configuration
+        return Configuration.get_by_name_as_int(name, default=default)
+
+    @property
+    def max_idle_per_key(self):
+        return self.__setting(
+            'driver_pool_max_idle_per_key', POOL_MAX_IDLE_PER_KEY)
+
+    @property
+    def max_idle(self):
+        return self.__setting('driver_pool_max_idle', POOL_MAX_IDLE)
+
+    @property
+    def idle_timeout(self):
+        return self.__setting('driver_pool_idle_timeout', POOL_IDLE_TIMEOUT)
+
+    @property
+    def health_check_interval(self):
+        return self.__setting(
+            'driver_pool_health_check_interval', POOL_HEALTH_CHECK_INTERVAL)
+
+    def __check_pid(self):
+        if self.pid != os.getpid():
+            # Connections opened by the parent process can not be reused
+            # by a forked worker
+            self.reset()
+
+    def __evict_expired(self):
+        idle_timeout = self.idle_timeout
+        expired = []
+        for key, connections in self.idle.items():
+            for connection in list(connections):
+                if connection.idle_time > idle_timeout:
+                    connections.remove(connection)
+                    expired.append(connection)
+            if not connections:
+                del self.idle[key]
+        return expired
+
+    def __idle_count(self):
+        return sum(len(connections) for connections in self.idle.values())
+
+    def acquire(self, key, factory, close, health_check=None):
+        """ Returns an idle healthy connection for key or a new one """
+        with self.lock:
+            self.__check_pid()
+            to_close = self.__evict_expired()
+            connection = None
+            connections = self.idle.get(key, [])
+            if connections:
+                connection = connections.pop()
+            generation = self.generations.get(key[0], 0)
+
+        for expired in to_close:
+            expired.disconnect()
+
+        if connection and health_check and \
+                connection.idle_time > self.health_check_interval:
+            try:
+                health_check(connection.client)
+            except Exception as e:
+                LOG.info('Discarding unhealthy pooled connection: %s', e)
+                connection.disconnect()
+                connection = None
+
+        if connection is None:
+            connection = _PooledConnection(factory(), close)
+        connection.generation = generation
+        return connection
+
+    def release(self, key, connection):
+        """ Gives back a connection, closing it when it can not be kept """
+        with self.lock:
+            keep = (
+                self.pid == os.getpid() and
+                connection.generation == self.generations.get(key[0], 0) and
+                len(self.idle.get(key, [])) < self.max_idle_per_key and
+                self.__idle_count() < self.max_idle
+            )
+            if keep:
+                connection.last_used = time.time()
+                self.idle.setdefault(key, []).append(connection)
+
+        if not keep:
+            connection.disconnect()
+
+    def invalidate(self, databaseinfra_pk):
+        """ Closes the idle connections of an infra; connections in use
+        are closed when released """
+        with self.lock:
+            self.generations[databaseinfra_pk] = \
+                self.generations.get(databaseinfra_pk, 0) + 1
+            to_close = []
+            for key in self.idle.keys():
+                if key[0] == databaseinfra_pk:
+                    to_close.extend(self.idle.pop(key))
+
+        LOG.debug('Invalidating %s pooled connections of databaseinfra %s',
+                  len(to_close), databaseinfra_pk)
+        for connection in to_close:
+            connection.disconnect()
+
+    def clear(self):
+        with self.lock:
+            to_close = []
+            for connections in self.idle.values():
+                to_close.extend(connections)
+            self.idle = {}
+
+        for connection in to_close:
+            connection.disconnect()
+
+    @contextmanager
+    def connection(self, key, factory, close, health_check=None,
+                   reset=None):
+        """
+        Checks out a client for key. When the block raises an exception the
+        client is closed instead of going back to the pool.
+        reset(client) is called before the client goes back to the pool, to
+        drop the state left by the caller; when it fails the client is closed.
+        A key None means no pooling: a new client is created and closed.
+        """
+        if key is None:
+            client = factory()
+            try:
+                yield client
+            finally:
+                _PooledConnection(client, close).disconnect()
+            return
+
+        connection = self.acquire(key, factory, close, health_check)
+        try:
+            yield connection.client
+        except:
+            connection.disconnect()
+            raise
+
+        if reset:
+            try:
+                reset(connection.client)
+            except Exception as e:
+                LOG.info('Discarding pooled connection not reset: %s', e)
+                connection.disconnect()
+                return
+        self.release(key, connection)
+
+
+connection_pool = ConnectionPool()
@@ -8,6 +8,7 @@ from . import BaseDriver
 from . import DatabaseInfraStatus
 from . import DatabaseStatus
 from . import ConnectionError
+from .pool import connection_pool, pool_key
 from system.models import Configuration
 from physical.models import Instance
 from util import exec_remote_command
@@ -153,14 +154,26 @@ class Redis(BaseDriver):
     def unlock_database(self, client):
         pass
 
+    def __pool_key(self, instance):
+        if instance:
+            address = "%s:%s" % (instance.address, instance.port)
+        else:
+            address = self.__concatenate_instances()
+
+        return pool_key(
+            self.databaseinfra, address, password=self.databaseinfra.password
+        )
+
     @contextmanager
     def redis(self, instance=None, database=None):
-        client = None
         try:
-            client = self.__redis_client__(instance)
-
-            return_value = client
-            yield return_value
+            with connection_pool.connection(
+                key=self.__pool_key(instance),
+                factory=lambda: self.__redis_client__(instance),
+                close=lambda client: client.connection_pool.disconnect(),
+                health_check=lambda client: client.ping()
+            ) as client:
+                yield client
         except Exception as e:
             raise ConnectionError(
                 'Error connecting to databaseinfra %s : %s' % (self.databaseinfra, str(e)))
@@ -205,15 +218,15 @@ class Redis(BaseDriver):
             databaseinfra_status.used_size_in_bytes = json_server_info.get(
                 'used_memory', 0)
 
-            list_databases = self.list_databases()
+            try:
+                is_alive = bool(client.ping())
+            except Exception:
+                is_alive = False
+
             for database in self.databaseinfra.databases.all():
                 database_name = database.name
                 db_status = DatabaseStatus(database)
-                try:
-                    if self.check_status():
-                        db_status.is_alive = True
-                except:
-                    pass
+                db_status.is_alive = is_alive
 
                 db_status.total_size_in_bytes = 0
                 db_status.used_size_in_bytes = databaseinfra_status.used_size_in_bytes
@@ -1,4 +1,12 @@
 # -*- coding: utf-8 -*-
+class ParallelSteps(tuple):
+    """
+    Steps of a group that can run for every instance at the same time.
+    Use it only when the steps of one instance do not depend on the
+    steps of the other instances, like on new read only instances.
+    """
+
+
 class BaseTopology(object):
 
     def deploy_first_steps(self):
@@ -118,13 +126,18 @@ class BaseTopology(object):
     def get_add_database_instances_steps_description(self):
         return "Add instances"
 
+    def get_add_database_instances_first_steps_description(self):
+        return "Creating virtual machines"
+
     def get_remove_readonly_instance_steps_description(self):
         return "Remove instance"
 
     def get_add_database_instances_steps(self):
         return [{
+            self.get_add_database_instances_first_steps_description():
+            ParallelSteps(self.get_add_database_instances_first_steps())
+        }, {
             self.get_add_database_instances_steps_description():
-            self.get_add_database_instances_first_steps() +
             self.get_add_database_instances_middle_steps() +
             self.get_add_database_instances_last_steps()
         }]
@@ -1,6 +1,6 @@
 #!/bin/bash
 
-[[ $# -ne 11 ]] && echo "usage: db_orig user_orig pass_orig host_orig port_orig db_dest user_dest pass_dest host_dest port_dest path_of_dump" && exit 1
+[[ $# -lt 11 ]] && echo "usage: db_orig user_orig pass_orig host_orig port_orig db_dest user_dest pass_dest host_dest port_dest path_of_dump [compress]" && exit 1
 
 db2clone=${1}
 user2clone=${2}
@@ -16,45 +16,25 @@ port_dest=${10}
 
 pass2clone2=$(echo "${pass2clone#*=}")
 pass_dest2=$(echo "${pass_dest#*=}")
-path_of_dump=${11}/${db_dest}_$(echo $RANDOM)
 
-echo $(date "+%Y-%m-%d %T") "- Creating temporary dir..."
-mkdir -p ${path_of_dump}
-ret=$?
-if [ ${ret} -ne 0 ]
+# The dump is streamed to the target database, path_of_dump is not used
+compress=""
+if [ "${12}" == "compress" ]
 then
-    echo $(date "+%Y-%m-%d %T") "- ERROR on creating temporary dir"
-    exit ${ret}
+    compress="--compress"
 fi
 
-echo ""; echo $(date "+%Y-%m-%d %T") "- Dumping source database..."
-mysqldump -h ${host2clone} --port ${port2clone} -u ${user2clone} -p${pass2clone2} --routines ${db2clone} > ${path_of_dump}/mysql.dump
-ret=$?
-if [ ${ret} -ne 0 ]
-then
-    echo $(date "+%Y-%m-%d %T") "- ERROR on dumping source database"
-    rm -rf ${path_of_dump}
-    exit ${ret}
-fi
+set -o pipefail
 
-echo ""; echo $(date "+%Y-%m-%d %T") "- Restoring target database..."
-mysql -h ${host_dest} --port ${port_dest} -u ${user_dest} -p${pass_dest2} ${db_dest} < ${path_of_dump}/mysql.dump
+echo $(date "+%Y-%m-%d %T") "- Dumping source database and restoring target database..."
+mysqldump -h ${host2clone} --port ${port2clone} -u ${user2clone} -p${pass2clone2} ${compress} --routines ${db2clone} \
+    | ./stream_meter.py --name ${db2clone} \
+    | mysql -h ${host_dest} --port ${port_dest} -u ${user_dest} -p${pass_dest2} ${compress} ${db_dest}
 ret=$?
 if [ ${ret} -ne 0 ]
 then
-    echo $(date "+%Y-%m-%d %T") "- ERROR on restoring target database"
-    rm -rf ${path_of_dump}
+    echo $(date "+%Y-%m-%d %T") "- ERROR on cloning database"
     exit ${ret}
 fi
 
-echo ""; echo $(date "+%Y-%m-%d %T") "- Deleting temporary files..."
-rm -rf ${path_of_dump}
-ret=$?
-if [ ${ret} -ne 0 ]
-then
-    echo $(date "+%Y-%m-%d %T") "- ERROR on deleting temporary files"
-    exit ${ret}
-fi
-
-
-exit 0
\ No newline at end of file
+exit 0
@@ -6,8 +6,13 @@ import click
 import os
 import logging
 import ast
+import threading
+import time
 from contextlib import contextmanager
 
+CHUNK_SIZE = 1024 * 1024
+PROGRESS_INTERVAL = 60
+
 
 class RedisDriver(object):
 
@@ -87,57 +92,50 @@ def test_return_code(return_code):
         return False
 
 
-def dump_src_database(host, redis_port, redis_pass,
-                      redis_time_out, dump_path,
-                      sys_user, sys_pass, remote_path):
+def ssh_client(host, sys_user, sys_pass):
+    client = paramiko.SSHClient()
+    client.load_system_host_keys()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    client.connect(host, username=sys_user, password=sys_pass)
+    return client
 
-    click.echo("Dumping source database...")
-    driver = RedisDriver(host, redis_port, redis_pass, redis_time_out)
 
-    with driver.redis() as client:
+def run_for_targets(function, cluster_info):
+    """ Calls function for every target at the same time, returning True
+    when all of them succeeded """
+    results = {}
+
+    def run(index, instance_info):
         try:
-            client.save()
+            results[index] = function(instance_info)
         except Exception, e:
-            click.echo("Error while requesting dump: {}".format(e))
-            return False
-
-    try:
-        transport = paramiko.Transport((host, 22))
-        transport.connect(username=sys_user, password=sys_pass)
-
-        sftp = paramiko.SFTPClient.from_transport(transport)
-        sftp.get(remote_path, dump_path)
-
-        sftp.close()
-        transport.close()
+            click.echo("Error on {}: {}".format(instance_info['host'], e))
+            results[index] = False
 
-        click.echo("Dump successful! :)")
-        return True
-    except Exception, e:
-        click.echo('ERROR while transporting dump file: {}'.format(e))
-        return False
+    threads = [
+        threading.Thread(target=run, args=(index, instance_info))
+        for index, instance_info in enumerate(cluster_info)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
 
+    return all(results.get(index) for index in range(len(cluster_info)))
 
-def restore_dst_database(dump_path, host, redis_port, redis_pass, sys_user, sys_pass, remote_path, redis_time_out):
 
-    click.echo("Restoring target database...")
-    exec_remote_command(server=host,
-                        username=sys_user,
-                        password=sys_pass,
+def stop_dst_database(instance_info):
+    exec_remote_command(server=instance_info['host'],
+                        username=instance_info['sys_user'],
+                        password=instance_info['sys_pass'],
                         command='/etc/init.d/redis stop')
+    return True
 
-    try:
-        transport = paramiko.Transport((host, 22))
-        transport.connect(username=sys_user, password=sys_pass)
-
-        sftp = paramiko.SFTPClient.from_transport(transport)
-        sftp.put(dump_path, remote_path)
 
-        sftp.close()
-        transport.close()
-    except Exception, e:
-        click.echo('ERROR while transporting dump file: {}'.format(e))
-        return False
+def start_dst_database(instance_info, redis_time_out):
+    host = instance_info['host']
+    sys_user = instance_info['sys_user']
+    sys_pass = instance_info['sys_pass']
 
     exec_remote_command(server=host,
                         username=sys_user,
@@ -154,7 +152,8 @@ def restore_dst_database(dump_path, host, redis_port, redis_pass, sys_user, sys_
                         password=sys_pass,
                         command="sed -i 's/#appendonly/appendonly/g' /data/redis.conf")
 
-    driver = RedisDriver(host, redis_port, redis_pass, redis_time_out)
+    driver = RedisDriver(host, instance_info['redis_port'],
+                         instance_info['redis_pass'], redis_time_out)
 
     with driver.redis() as client:
         try:
@@ -163,75 +162,109 @@ def restore_dst_database(dump_path, host, redis_port, redis_pass, sys_user, sys_
             click.echo("Error while requesting dump: {}".format(e))
             return False
 
-    click.echo("Restore successful! :)")
-
+    click.echo("Restore on {} successful! :)".format(host))
     return True
 
 
-def restore_dst_cluster(dump_path, cluster_info, redis_time_out):
+def stream_dump(host, sys_user, sys_pass, remote_path, cluster_info,
+                compress):
+    """
+    Streams the source dump file to every target at once, without
+    writing it on this server. With compress the dump travels gzipped.
+    """
+    if compress:
+        read_command = 'gzip -c {}'
+        write_command = 'gunzip -c > {}'
+    else:
+        read_command = 'cat {}'
+        write_command = 'cat > {}'
 
-    for instance_info in cluster_info:
-        sys_user = instance_info['sys_user']
-        sys_pass = instance_info['sys_pass']
-        remote_path = instance_info['remote_path']
-        redis_pass = instance_info['redis_pass']
-        redis_port = instance_info['redis_port']
-        host = instance_info['host']
+    clients = []
+    try:
+        src_client = ssh_client(host, sys_user, sys_pass)
+        clients.append(src_client)
+        src_channel = src_client.get_transport().open_session()
+        src_channel.exec_command(read_command.format(remote_path))
+
+        dst_channels = []
+        for instance_info in cluster_info:
+            dst_client = ssh_client(instance_info['host'],
+                                    instance_info['sys_user'],
+                                    instance_info['sys_pass'])
+            clients.append(dst_client)
+            dst_channel = dst_client.get_transport().open_session()
+            dst_channel.exec_command(
+                write_command.format(instance_info['remote_path']))
+            dst_channels.append(dst_channel)
+
+        copied = 0
+        reported_at = time.time()
+        while True:
+            data = src_channel.recv(CHUNK_SIZE)
+            if not data:
+                break
+
+            for dst_channel in dst_channels:
+                dst_channel.sendall(data)
+            copied += len(data)
+
+            if time.time() - reported_at >= PROGRESS_INTERVAL:
+                click.echo("{} bytes streamed".format(copied))
+                reported_at = time.time()
+
+        click.echo("{} bytes streamed to {} targets".format(
+            copied, len(dst_channels)))
+
+        if src_channel.recv_exit_status() != 0:
+            click.echo("ERROR while reading dump file from {}".format(host))
+            return False
 
-        click.echo("Restoring target database...")
-        exec_remote_command(server=host,
-                            username=sys_user,
-                            password=sys_pass,
-                            command='/etc/init.d/redis stop')
+        success = True
+        for instance_info, dst_channel in zip(cluster_info, dst_channels):
+            dst_channel.shutdown_write()
+            if dst_channel.recv_exit_status() != 0:
+                click.echo("ERROR while writing dump file on {}".format(
+                    instance_info['host']))
+                success = False
+        return success
+    except Exception, e:
+        click.echo('ERROR while transporting dump file: {}'.format(e))
+        return False
+    finally:
+        for client in clients:
+            client.close()
 
-    for instance_info in cluster_info:
-        sys_user = instance_info['sys_user']
-        sys_pass = instance_info['sys_pass']
-        remote_path = instance_info['remote_path']
-        redis_pass = instance_info['redis_pass']
-        redis_port = instance_info['redis_port']
-        host = instance_info['host']
 
-        try:
-            transport = paramiko.Transport((host, 22))
-            transport.connect(username=sys_user, password=sys_pass)
+def dump_src_database(host, redis_port, redis_pass, redis_time_out):
 
-            sftp = paramiko.SFTPClient.from_transport(transport)
-            sftp.put(dump_path, remote_path)
+    click.echo("Dumping source database...")
+    driver = RedisDriver(host, redis_port, redis_pass, redis_time_out)
 
-            sftp.close()
-            transport.close()
+    with driver.redis() as client:
+        try:
+            client.save()
         except Exception, e:
-            click.echo('ERROR while transporting dump file: {}'.format(e))
+            click.echo("Error while requesting dump: {}".format(e))
             return False
 
-        exec_remote_command(server=host,
-                            username=sys_user,
-                            password=sys_pass,
-                            command="sed -i 's/appendonly/#appendonly/g' /data/redis.conf")
-
-        exec_remote_command(server=host,
-                            username=sys_user,
-                            password=sys_pass,
-                            command='/etc/init.d/redis start')
+    click.echo("Dump successful! :)")
+    return True
 
-        exec_remote_command(server=host,
-                            username=sys_user,
-                            password=sys_pass,
-                            command="sed -i 's/#appendonly/appendonly/g' /data/redis.conf")
 
-        driver = RedisDriver(host, redis_port, redis_pass, redis_time_out)
+def restore_dst_cluster(src_host, src_sys_user, src_sys_pass, src_dump_path,
+                        cluster_info, redis_time_out, compress):
 
-        with driver.redis() as client:
-            try:
-                client.config_set("appendonly", "yes")
-            except Exception, e:
-                click.echo("Error while requesting dump: {}".format(e))
-                return False
+    click.echo("Restoring target databases...")
+    run_for_targets(stop_dst_database, cluster_info)
 
-        click.echo("Restore successful! :)")
+    if not stream_dump(src_host, src_sys_user, src_sys_pass, src_dump_path,
+                       cluster_info, compress):
+        return False
 
-    return True
+    return run_for_targets(
+        lambda instance_info: start_dst_database(instance_info, redis_time_out),
+        cluster_info
+    )
 
 
 @click.command()
@@ -252,12 +285,15 @@ def restore_dst_cluster(dump_path, cluster_info, redis_time_out):
 @click.option('--cluster_info',)
 @click.option('--verbose', is_flag=True)
 @click.option('--remove_dump', is_flag=True)
+@click.option('--compress', is_flag=True)
 def main(redis_time_out, src_pass, src_host,
          src_port, src_sys_user, src_sys_pass,
          src_dump_path, dst_pass, dst_host, dst_port, dst_sys_user,
          dst_sys_pass, dst_dump_path, local_dump_path,
-         verbose, remove_dump, cluster_info):
-    """Command line tool to dump a redis database and import on another"""
+         verbose, remove_dump, cluster_info, compress):
+    """Command line tool to dump a redis database and import on another.
+    The dump is streamed from the source to the targets, local_dump_path
+    and --remove_dump are kept for compatibility only."""
 
     if verbose:
         logging.basicConfig(
@@ -265,30 +301,22 @@ def main(redis_time_out, src_pass, src_host,
             format='%(asctime)s %(levelname)s %(message)s',
         )
 
-    if not dump_src_database(src_host, src_port, src_pass,
-                             redis_time_out, local_dump_path,
-                             src_sys_user, src_sys_pass, src_dump_path):
+    if not dump_src_database(src_host, src_port, src_pass, redis_time_out):
         click.echo("Dump unsuccessful! :(")
         return 1
 
     if cluster_info:
         cluster_info = ast.literal_eval(cluster_info)
-
-        if not restore_dst_cluster(local_dump_path, cluster_info, redis_time_out):
-            click.echo("Restore unsuccessful! :(")
-            return 1
     else:
-        if not restore_dst_database(local_dump_path, dst_host, dst_port, dst_pass,
-                                    dst_sys_user, dst_sys_pass, dst_dump_path, redis_time_out):
-            click.echo("Restore unsuccessful! :(")
-            return 1
-
-    if remove_dump:
-        try:
-            os.remove(local_dump_path)
-        except OSError:
-            click.echo("The file {} dos not exists.".format(local_dump_path))
-            pass
+        cluster_info = [{"sys_user": dst_sys_user, "sys_pass": dst_sys_pass,
+                         "remote_path": dst_dump_path, "host": dst_host,
+                         "redis_pass": dst_pass, "redis_port": dst_port}]
+
+    if not restore_dst_cluster(src_host, src_sys_user, src_sys_pass,
+                               src_dump_path, cluster_info, redis_time_out,
+                               compress):
+        click.echo("Restore unsuccessful! :(")
+        return 1
 
     return 0
 
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import sys
+import time
+import click
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def echo_progress(name, copied):
+    click.echo("{} - {}: {} bytes copied".format(
+        time.strftime("%Y-%m-%d %H:%M:%S"), name, copied), err=True)
+
+
+@click.command()
+@click.option('--name', default='stream')
+@click.option('--interval', default=60)
+def main(name, interval):
+    """Copies stdin to stdout, reporting the bytes copied on stderr"""
+
+    copied = 0
+    reported_at = time.time()
+    while True:
+        data = sys.stdin.read(CHUNK_SIZE)
+        if not data:
+            break
+
+        sys.stdout.write(data)
+        copied += len(data)
+
+        if time.time() - reported_at >= interval:
+            echo_progress(name, copied)
+            reported_at = time.time()
+
+    sys.stdout.flush()
+    echo_progress(name, copied)
+
+
+if __name__ == '__main__':
+    main()
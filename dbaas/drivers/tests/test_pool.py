@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import mock
+from django.test import TestCase
+from ..pool import ConnectionPool
+
+KEY = (1, '127.0.0.1:27017', 'credential', None)
+
+
+class ConnectionPoolTestCase(TestCase):
+
+    def setUp(self):
+        self.pool = ConnectionPool()
+        self.factory = mock.Mock(side_effect=lambda: object())
+        self.close = mock.Mock()
+
+    def checkout(self, key=KEY, health_check=None):
+        with self.pool.connection(key, self.factory, self.close,
+                                  health_check) as client:
+            return client
+
+    def test_reuses_released_connection(self):
+        first = self.checkout()
+        second = self.checkout()
+        self.assertIs(first, second)
+        self.assertEqual(self.factory.call_count, 1)
+        self.assertFalse(self.close.called)
+
+    def test_connections_are_not_shared_between_keys(self):
+        first = self.checkout()
+        second = self.checkout(key=(2, '127.0.0.1:27017', 'credential', None))
+        self.assertIsNot(first, second)
+
+    def test_connection_is_closed_on_error(self):
+        with self.assertRaises(ValueError):
+            with self.pool.connection(KEY, self.factory, self.close):
+                raise ValueError()
+        self.assertEqual(self.close.call_count, 1)
+        self.checkout()
+        self.assertEqual(self.factory.call_count, 2)
+
+    def test_connection_is_reset_on_release(self):
+        reset = mock.Mock()
+        with self.pool.connection(KEY, self.factory, self.close,
+                                  reset=reset) as client:
+            pass
+        reset.assert_called_once_with(client)
+        self.assertIs(client, self.checkout())
+
+    def test_connection_not_reset_is_closed(self):
+        reset = mock.Mock(side_effect=Exception('Lost connection'))
+        with self.pool.connection(KEY, self.factory, self.close,
+                                  reset=reset):
+            pass
+        self.assertEqual(self.close.call_count, 1)
+        self.checkout()
+        self.assertEqual(self.factory.call_count, 2)
+
+    def test_without_key_connection_is_not_pooled(self):
+        self.checkout(key=None)
+        self.checkout(key=None)
+        self.assertEqual(self.factory.call_count, 2)
+        self.assertEqual(self.close.call_count, 2)
+
+    def test_invalidate_closes_idle_connections(self):
+        self.checkout()
+        self.pool.invalidate(KEY[0])
+        self.assertEqual(self.close.call_count, 1)
+        self.checkout()
+        self.assertEqual(self.factory.call_count, 2)
+
+    def test_invalidate_closes_connection_in_use_when_released(self):
+        with self.pool.connection(KEY, self.factory, self.close):
+            self.pool.invalidate(KEY[0])
+            self.assertFalse(self.close.called)
+        self.assertEqual(self.close.call_count, 1)
+
+    @mock.patch.object(ConnectionPool, 'health_check_interval', -1)
+    def test_unhealthy_connection_is_replaced(self):
+        health_check = mock.Mock(side_effect=Exception('dead'))
+        first = self.checkout()
+        second = self.checkout(health_check=health_check)
+        self.assertIsNot(first, second)
+        self.assertEqual(self.close.call_count, 1)
+
+    @mock.patch.object(ConnectionPool, 'idle_timeout', -1)
+    def test_idle_connection_expires(self):
+        self.checkout()
+        self.checkout()
+        self.assertEqual(self.factory.call_count, 2)
+        self.assertEqual(self.close.call_count, 1)
+
+    @mock.patch.object(ConnectionPool, 'max_idle_per_key', 1)
+    def test_max_idle_per_key(self):
+        with self.pool.connection(KEY, self.factory, self.close):
+            with self.pool.connection(KEY, self.factory, self.close):
+                pass
+        self.assertEqual(self.factory.call_count, 2)
+        self.assertEqual(self.close.call_count, 1)
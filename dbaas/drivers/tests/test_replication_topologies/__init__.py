@@ -2,6 +2,7 @@
 from __future__ import absolute_import, unicode_literals
 from functools import wraps
 from django.test import TestCase
+from drivers.replication_topologies.base import ParallelSteps
 
 
 def skip_unless_not_abstract(method):
@@ -121,6 +122,9 @@ class AbstractReplicationTopologySettingsTestCase(TestCase):
     def _get_add_database_instances_steps_description(self):
         return "Add instances"
 
+    def _get_add_database_instances_first_steps_description(self):
+        return "Creating virtual machines"
+
     def _get_remove_readonly_instance_steps_description(self):
         return "Remove instance"
 
@@ -147,8 +151,10 @@ class AbstractReplicationTopologySettingsTestCase(TestCase):
 
     def _get_add_database_instances_settings(self):
         return [{
+            self._get_add_database_instances_first_steps_description():
+            self._get_add_database_instances_first_settings()
+        }, {
             self._get_add_database_instances_steps_description():
-            self._get_add_database_instances_first_settings() +
             self._get_add_database_instances_middle_settings() +
             self._get_add_database_instances_last_settings()
         }]
@@ -200,10 +206,9 @@ class AbstractReplicationTopologySettingsTestCase(TestCase):
 
     @skip_unless_not_abstract
     def test_add_database_instances_settings(self):
-        self.assertEqual(
-            self._get_add_database_instances_settings(),
-            self.replication_topology.get_add_database_instances_steps()
-        )
+        steps = self.replication_topology.get_add_database_instances_steps()
+        self.assertEqual(self._get_add_database_instances_settings(), steps)
+        self.assertIsInstance(steps[0].values()[0], ParallelSteps)
 
     @skip_unless_not_abstract
     def test_remove_readonly_instance_settings(self):
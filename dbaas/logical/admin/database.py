@@ -13,6 +13,7 @@ from django.shortcuts import render_to_response
 from django.template import RequestContext
 from django.http import HttpResponseRedirect
 from django.contrib.admin.util import flatten_fieldsets
+from django.contrib.admin.views.main import ChangeList
 from django.core.urlresolvers import reverse
 from django.conf.urls import patterns, url
 from django.contrib import messages
@@ -37,6 +38,65 @@ from logical.service.database import DatabaseService
 
 LOG = logging.getLogger(__name__)
 
+LAST_UPGRADE_SQL = """
+    SELECT MAX(upgrade.id) FROM maintenance_databaseupgrade upgrade
+    WHERE upgrade.database_id = logical_database.id
+    AND upgrade.source_plan_id = (
+        SELECT infra.plan_id FROM physical_databaseinfra infra
+        WHERE infra.id = logical_database.databaseinfra_id
+    )
+"""
+LAST_RESIZE_SQL = """
+    SELECT MAX(resize.id) FROM maintenance_databaseresize resize
+    WHERE resize.database_id = logical_database.id
+"""
+
+
+def load_list_display(databases):
+    """
+    Loads the last upgrade, the last resize and the offering of a page of
+    databases with one query each, instead of some queries for each row
+    """
+    from dbaas_cloudstack.models import DatabaseInfraOffering
+    from maintenance.models import DatabaseUpgrade, DatabaseResize
+
+    databases = list(databases)
+    if not databases:
+        return
+
+    upgrades = DatabaseUpgrade.objects.in_bulk([
+        database.last_upgrade_id for database in databases
+        if database.last_upgrade_id
+    ])
+    resizes = DatabaseResize.objects.in_bulk([
+        database.last_resize_id for database in databases
+        if database.last_resize_id
+    ])
+    offerings = dict(DatabaseInfraOffering.objects.filter(
+        databaseinfra__in=set(
+            database.databaseinfra_id for database in databases
+        )
+    ).values_list('databaseinfra_id', 'offering__name'))
+
+    for database in databases:
+        database.last_upgrade = upgrades.get(database.last_upgrade_id)
+        database.last_resize = resizes.get(database.last_resize_id)
+        database.offering_name = offerings.get(database.databaseinfra_id)
+
+
+class DatabaseChangeList(ChangeList):
+
+    def get_queryset(self, request):
+        queryset = super(DatabaseChangeList, self).get_queryset(request)
+        return queryset.extra(select={
+            'last_upgrade_id': LAST_UPGRADE_SQL,
+            'last_resize_id': LAST_RESIZE_SQL,
+        })
+
+    def get_results(self, request):
+        super(DatabaseChangeList, self).get_results(request)
+        load_list_display(self.result_list)
+
 
 class DatabaseAdmin(admin.DjangoServicesAdmin):
 
@@ -60,6 +120,11 @@ class DatabaseAdmin(admin.DjangoServicesAdmin):
         "created_dt_format"
     ]
     list_display_advanced = list_display_basic + ["quarantine_dt_format"]
+    list_select_related = (
+        "team", "environment", "project", "databaseinfra__disk_offering",
+        "databaseinfra__engine__engine_type",
+        "databaseinfra__plan__replication_topology",
+    )
     list_filter_basic = [
         "project", "databaseinfra__environment", "databaseinfra__engine",
         "databaseinfra__plan", "databaseinfra__engine__engine_type", "status",
@@ -147,6 +212,22 @@ class DatabaseAdmin(admin.DjangoServicesAdmin):
         return database.engine_type
     engine_type.admin_order_field = 'name'
 
+    def last_upgrade(self, database):
+        if hasattr(database, 'last_upgrade'):
+            return database.last_upgrade
+        upgrades = database.upgrades.filter(source_plan=database.infra.plan)
+        return upgrades.last()
+
+    def last_resize(self, database):
+        if hasattr(database, 'last_resize'):
+            return database.last_resize
+        return database.resizes.last()
+
+    def offering(self, database):
+        if hasattr(database, 'offering_name'):
+            return database.offering_name
+        return database.offering
+
     def engine_html(self, database):
         engine_info = str(database.engine)
 
@@ -154,13 +235,12 @@ class DatabaseAdmin(admin.DjangoServicesAdmin):
         if topology.details:
             engine_info += " - " + topology.details
 
-        upgrades = database.upgrades.filter(source_plan=database.infra.plan)
-        last_upgrade = upgrades.last()
+        last_upgrade = self.last_upgrade(database)
         if not(last_upgrade and last_upgrade.is_status_error):
             return engine_info
 
         upgrade_url = reverse('admin:maintenance_databaseupgrade_change', args=[last_upgrade.id])
-        task_url = reverse('admin:notification_taskhistory_change', args=[last_upgrade.task.id])
+        task_url = reverse('admin:notification_taskhistory_change', args=[last_upgrade.task_id])
         retry_url = database.get_upgrade_retry_url()
         upgrade_content = \
             "<a href='{}' target='_blank'>Last upgrade</a> has an <b>error</b>, " \
@@ -176,12 +256,13 @@ class DatabaseAdmin(admin.DjangoServicesAdmin):
     engine_html.admin_order_field = "Engine"
 
     def offering_html(self, database):
-        last_resize = database.resizes.last()
+        offering = self.offering(database)
+        last_resize = self.last_resize(database)
         if not(last_resize and last_resize.is_status_error):
-            return database.offering
+            return offering
 
         resize_url = reverse('admin:maintenance_databaseresize_change', args=[last_resize.id])
-        task_url = reverse('admin:notification_taskhistory_change', args=[last_resize.task.id])
+        task_url = reverse('admin:notification_taskhistory_change', args=[last_resize.task_id])
         retry_url = database.get_resize_retry_url()
         resize_content = \
             "<a href='{}' target='_blank'>Last resize</a> has an <b>error</b>, " \
@@ -190,7 +271,7 @@ class DatabaseAdmin(admin.DjangoServicesAdmin):
                 resize_url, task_url, retry_url
             )
         return show_info_popup(
-            database.offering, "Database Resize", resize_content,
+            offering, "Database Resize", resize_content,
             icon="icon-warning-sign", css_class="show-resize"
         )
     offering_html.short_description = _("offering")
@@ -204,6 +285,9 @@ class DatabaseAdmin(admin.DjangoServicesAdmin):
 
     get_capacity_html.short_description = "Capacity"
 
+    def get_changelist(self, request, **kwargs):
+        return DatabaseChangeList
+
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         """
         filter teams for the ones that the user is associated, unless the user has ther
@@ -323,6 +407,8 @@ class DatabaseAdmin(admin.DjangoServicesAdmin):
                 task_history.task_status = task_history.STATUS_WAITING
                 task_history.arguments = "Database name: {}".format(
                     form.cleaned_data['name'])
+                task_history.database_name = form.cleaned_data['name']
+                task_history.environment = form.cleaned_data['environment'].name
                 task_history.user = request.user
                 task_history.save()
 
@@ -482,6 +568,7 @@ class DatabaseAdmin(admin.DjangoServicesAdmin):
         task_history.task_name = "resize_database_retry"
         task_history.task_status = task_history.STATUS_WAITING
         task_history.arguments = "Retrying resize database {}".format(database)
+        task_history.set_database(database)
         task_history.user = request.user
         task_history.save()
 
@@ -581,6 +668,7 @@ class DatabaseAdmin(admin.DjangoServicesAdmin):
         task_history.task_name = "upgrade_mongodb_24_to_30"
         task_history.task_status = task_history.STATUS_WAITING
         task_history.arguments = "Upgrading MongoDB 2.4 to 3.0"
+        task_history.set_database(database)
         task_history.user = request.user
         task_history.save()
 
@@ -617,6 +705,7 @@ class DatabaseAdmin(admin.DjangoServicesAdmin):
         task_history.task_name = "upgrade_database_retry"
         task_history.task_status = task_history.STATUS_WAITING
         task_history.arguments = "Retrying upgrade database {}".format(database)
+        task_history.set_database(database)
         task_history.user = request.user
         task_history.save()
 
@@ -643,6 +732,7 @@ class DatabaseAdmin(admin.DjangoServicesAdmin):
         task_history.task_name = "upgrade_database"
         task_history.task_status = task_history.STATUS_WAITING
         task_history.arguments = "Upgrading database {}".format(database)
+        task_history.set_database(database)
         task_history.user = request.user
         task_history.save()
 
@@ -666,11 +756,9 @@ class DatabaseAdmin(admin.DjangoServicesAdmin):
 
         url = reverse('admin:notification_taskhistory_changelist')
 
-        tasks = TaskHistory.objects.filter(
-            arguments__contains=database.name,
-            task_status__in=[
-                'RUNNING', 'PENDING', 'WAITING'
-            ]
+        tasks = TaskHistory.database_tasks(
+            database.name, database.environment.name,
+            status=['RUNNING', 'PENDING', 'WAITING']
         )
 
         if tasks:
@@ -683,6 +771,7 @@ class DatabaseAdmin(admin.DjangoServicesAdmin):
         task_history.task_name = "add_database_instances"
         task_history.task_status = task_history.STATUS_WAITING
         task_history.arguments = "Adding instances on database {}".format(database)
+        task_history.set_database(database)
         task_history.user = request.user
         task_history.save()
 
@@ -406,6 +406,7 @@ class Database(BaseModel):
         task_history.task_name = "clone_database"
         task_history.task_status = task_history.STATUS_WAITING
         task_history.arguments = "Database name: {}".format(database.name)
+        task_history.set_database(database)
         task_history.user = user
         task_history.save()
 
@@ -424,6 +425,7 @@ class Database(BaseModel):
         task_history.arguments = "Restoring {} to an older version.".format(
             database.name
         )
+        task_history.set_database(database)
         task_history.user = user
         task_history.save()
 
@@ -441,6 +443,7 @@ class Database(BaseModel):
         task_history.task_name = "resize_database"
         task_history.task_status = task_history.STATUS_WAITING
         task_history.arguments = "Database name: {}".format(database.name)
+        task_history.set_database(database)
         task_history.user = user
         task_history.save()
 
@@ -579,6 +582,7 @@ class Database(BaseModel):
         task_history.task_name = "database_disk_resize"
         task_history.task_status = task_history.STATUS_WAITING
         task_history.arguments = "Database name: {}".format(database.name)
+        task_history.set_database(database)
         task_history.user = user
         task_history.save()
 
@@ -760,6 +764,7 @@ class Database(BaseModel):
         task_history.task_name = "destroy_database"
         task_history.task_status = task_history.STATUS_WAITING
         task_history.arguments = "Database name: {}".format(self.name)
+        task_history.set_database(self)
         task_history.user = user
         task_history.save()
 
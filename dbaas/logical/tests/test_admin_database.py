@@ -110,3 +110,52 @@ class AdminCreateDatabaseTestCase(TestCase):
 
         database = fake.database_created_list(database_name)
         self.assertIsNotNone(database)
+
+
+class AdminDatabaseChangeListTestCase(TestCase):
+
+    def setUp(self):
+        from maintenance.tests.factory import DatabaseResizeFactory
+        from maintenance.tests.factory import DatabaseUpgradeFactory
+        from maintenance.models import DatabaseResize, DatabaseUpgrade
+
+        self.database = factory.DatabaseFactory()
+        DatabaseResizeFactory(
+            database=self.database, status=DatabaseResize.SUCCESS
+        )
+        self.resize = DatabaseResizeFactory(
+            database=self.database, status=DatabaseResize.ERROR
+        )
+        self.upgrade = DatabaseUpgradeFactory(
+            database=self.database, source_plan=self.database.plan,
+            status=DatabaseUpgrade.ERROR
+        )
+        DatabaseUpgradeFactory(
+            database=self.database, status=DatabaseUpgrade.SUCCESS
+        )
+
+    def databases(self):
+        from ..admin.database import LAST_UPGRADE_SQL, LAST_RESIZE_SQL
+        return Database.objects.extra(select={
+            'last_upgrade_id': LAST_UPGRADE_SQL,
+            'last_resize_id': LAST_RESIZE_SQL,
+        })
+
+    def test_last_upgrade_and_resize(self):
+        from ..admin.database import load_list_display
+        databases = list(self.databases())
+        load_list_display(databases)
+
+        database = databases[0]
+        self.assertEqual(database.last_upgrade, self.upgrade)
+        self.assertEqual(database.last_resize, self.resize)
+        self.assertIsNone(database.offering_name)
+
+    def test_loads_page_in_fixed_queries(self):
+        from ..admin.database import load_list_display
+        for _ in range(5):
+            factory.DatabaseFactory()
+        databases = list(self.databases())
+
+        with self.assertNumQueries(3):
+            load_list_display(databases)
@@ -302,6 +302,7 @@ def _add_read_only_instances(request, database):
     task.task_name = "add_database_instances"
     task.task_status = TaskHistory.STATUS_WAITING
     task.arguments = "Adding instances on database {}".format(database)
+    task.set_database(database)
     task.user = request.user
     task.save()
 
@@ -404,6 +405,7 @@ def database_delete_host(request, database_id, host_id):
     task.arguments = "Removing instance {} on database {}".format(
         instance, database
     )
+    task.set_database(database)
     task.user = request.user
     task.save()
 
@@ -35,6 +35,160 @@ def _get_function(func_name):
     return func_list
 
 
+class _HostContext(object):
+
+    """ Objects used by the registered functions of a host, loaded for many
+    hosts at once by _load_host_contexts """
+
+    def __init__(self, host):
+        self.host = host
+        self.host_attr = None
+        self.instances = []
+        self.database = None
+        self.offering = None
+        self.log_configuration = None
+
+    @property
+    def databaseinfra(self):
+        return self.instances[0].databaseinfra
+
+
+def _load_host_contexts(host_ids):
+    from dbaas_cloudstack.models import HostAttr, DatabaseInfraOffering
+    from physical.models import Host, Instance
+    from logical.models import Database
+    from backup.models import LogConfiguration
+
+    contexts = dict(
+        (host.id, _HostContext(host))
+        for host in Host.objects.filter(id__in=host_ids)
+    )
+
+    for host_attr in HostAttr.objects.filter(host__in=contexts.keys()).order_by('id'):
+        context = contexts[host_attr.host_id]
+        if context.host_attr is None:
+            context.host_attr = host_attr
+
+    instances = Instance.objects.filter(
+        hostname__in=contexts.keys()
+    ).select_related(
+        'databaseinfra', 'databaseinfra__engine',
+        'databaseinfra__engine__engine_type', 'databaseinfra__plan',
+    ).order_by('id')
+    for instance in instances:
+        contexts[instance.hostname_id].instances.append(instance)
+
+    infra_ids = set(
+        context.databaseinfra.id
+        for context in contexts.values() if context.instances
+    )
+    databases = {}
+    for database in Database.objects.filter(databaseinfra__in=infra_ids):
+        databases.setdefault(database.databaseinfra_id, database)
+
+    offerings = dict(
+        (offering.databaseinfra_id, offering)
+        for offering in DatabaseInfraOffering.objects.filter(
+            databaseinfra__in=infra_ids
+        ).select_related('offering')
+    )
+
+    log_configurations = dict(
+        ((log_configuration.environment_id, log_configuration.engine_type_id),
+         log_configuration)
+        for log_configuration in LogConfiguration.objects.all()
+    )
+
+    for context in contexts.values():
+        if not context.instances:
+            continue
+        databaseinfra = context.databaseinfra
+        context.database = databases.get(databaseinfra.id)
+        context.offering = offerings.get(databaseinfra.id)
+        context.log_configuration = log_configurations.get(
+            (databaseinfra.environment_id,
+             databaseinfra.engine.engine_type_id)
+        )
+
+    return contexts
+
+
+def _there_is_backup_log_config(context):
+    if context.log_configuration is None:
+        return None
+
+    for instance in context.instances:
+        if instance.instance_type in (instance.MYSQL, instance.MONGODB, instance.REDIS):
+            return True
+    return False
+
+
+def _log_configuration_attr(attr):
+    def get_value(context):
+        if context.log_configuration is None:
+            return None
+        return getattr(context.log_configuration, attr)
+    return get_value
+
+
+# Versions of the registered functions computed from a _HostContext
+_CONTEXT_FUNCTIONS = {
+    'get_hostmane': lambda context: context.host.hostname,
+    'get_hostaddress': lambda context: context.host.address,
+    'get_infra_name': lambda context: context.databaseinfra.name,
+    'get_database_name': lambda context: context.database.name,
+    'get_infra_user': lambda context: context.databaseinfra.user,
+    'get_infra_password': lambda context: context.databaseinfra.password,
+    'get_host_user': lambda context: context.host_attr.vm_user,
+    'get_host_password': lambda context: context.host_attr.vm_password,
+    'get_engine_type_name': lambda context: context.databaseinfra.engine.name,
+    'get_max_database_size': lambda context: context.databaseinfra.plan.max_db_size,
+    'get_offering_size': lambda context: context.offering.offering.memory_size_mb,
+    'get_there_is_backup_log_config': _there_is_backup_log_config,
+    'get_log_configuration_mount_point_path': _log_configuration_attr('mount_point_path'),
+    'get_log_configuration_backup_log_export_path': _log_configuration_attr('filer_path'),
+    'get_log_configuration_database_log_path': _log_configuration_attr('log_path'),
+    'get_log_configuration_retention_backup_log_days': _log_configuration_attr('retention_days'),
+    'get_log_configuration_backup_log_script': _log_configuration_attr('backup_log_script'),
+    'get_log_configuration_config_backup_log_script': _log_configuration_attr('config_backup_log_script'),
+    'get_log_configuration_clean_backup_log_script': _log_configuration_attr('clean_backup_log_script'),
+    'get_log_configuration_cron_minute': _log_configuration_attr('cron_minute'),
+    'get_log_configuration_cron_hour': _log_configuration_attr('cron_hour'),
+}
+
+
+def _get_parameters(parameters, host_ids):
+    """
+    Returns {host id: {parameter name: value}} for the (parameter name,
+    function name) pairs, loading the objects of all hosts in bulk instead
+    of calling each registered function for each host.
+    """
+    contexts = _load_host_contexts(host_ids)
+
+    values = {}
+    for host_id in host_ids:
+        context = contexts.get(host_id)
+        host_values = values.setdefault(host_id, {})
+        for parameter_name, function_name in parameters:
+            function = _CONTEXT_FUNCTIONS.get(function_name)
+            if function is None or context is None:
+                registered_function = _get_function(function_name)
+                if registered_function is None:
+                    host_values[parameter_name] = None
+                else:
+                    host_values[parameter_name] = registered_function(host_id)
+                continue
+
+            try:
+                host_values[parameter_name] = function(context)
+            except (AttributeError, IndexError) as e:
+                LOG.warn("Error on {}. Host id: {} - error: {}".format(
+                    function_name, host_id, e))
+                host_values[parameter_name] = None
+
+    return values
+
+
 def get_hostmane(host_id):
     """Return HOST_NAME"""
     from physical.models import Host
@@ -1,17 +1,43 @@
-from util import exec_remote_command
 from datetime import datetime
 from dbaas.celery import app
 import models
 import logging
 from notification.models import TaskHistory
 from util import get_worker_name
-from util import build_context_script
 from util import get_dict_lines
-from django.core.exceptions import ObjectDoesNotExist
-from registered_functions.functools import _get_function
+from django.db import transaction
+from registered_functions.functools import _get_parameters
+from system.models import Configuration
+from util.parallel import ParallelCancelled
+from util.ssh import RemoteTarget, run_remote_commands
 
 LOG = logging.getLogger(__name__)
 
+MAINTENANCE_WAVE_SIZE = 50
+
+
+def _output_lines(result):
+    return get_dict_lines({'stdout': result.stdout, 'stderr': result.stderr})
+
+
+def _host_maintenance_status(hm, result):
+    """ Status and logs of hm from the RemoteHostResult of its host, the
+    rollback script ran when the main script failed """
+    if result.error:
+        return hm.ERROR, '{}'.format(result.error), None
+
+    if result.exit_status == 0:
+        return hm.SUCCESS, _output_lines(result), None
+
+    if result.rollback is None:
+        return hm.ERROR, _output_lines(result), None
+
+    if result.rollback.exit_status == 0:
+        status = hm.ROLLBACK_SUCCESS
+    else:
+        status = hm.ROLLBACK_ERROR
+    return status, _output_lines(result), _output_lines(result.rollback)
+
 
 @app.task(bind=True)
 def execute_scheduled_maintenance(self, maintenance_id):
@@ -32,81 +58,125 @@ def execute_scheduled_maintenance(self, maintenance_id):
     task_history.update_details(persist=True,
                                 details="Executing Maintenance: {}".format(maintenance))
 
-    for hm in models.HostMaintenance.objects.filter(maintenance=maintenance):
-        main_output = {}
-        hm.status = hm.RUNNING
-        hm.started_at = datetime.now()
-        hm.save()
+    host_maintenances = models.HostMaintenance.objects.filter(
+        maintenance=maintenance
+    ).select_related('host').prefetch_related('host__cs_host_attributes')
 
+    runnable = []
+    unavailable_hosts = []
+    unavailable_attrs = []
+    for hm in host_maintenances:
         if hm.host is None:
-            hm.status = hm.UNAVAILABLEHOST
-            hm.finished_at = datetime.now()
-            hm.save()
-            continue
-
-        host = hm.host
-        update_task = "\nRunning Maintenance on {}".format(host)
-
-        try:
-            cloudstack_host_attributes = host.cs_host_attributes.get()
-        except ObjectDoesNotExist as e:
-            LOG.warn(
-                "Host {} does not have cloudstack attrs...{}".format(hm.host, e))
-            hm.status = hm.UNAVAILABLECSHOSTATTR
-            hm.finished_at = datetime.now()
-            hm.save()
-            continue
-
-        param_dict = {}
-        for param in models.MaintenanceParameters.objects.filter(maintenance=maintenance):
-            param_function = _get_function(param.function_name)
-            param_dict[param.parameter_name] = param_function(host.id)
-
-        main_script = build_context_script(param_dict, maintenance.main_script)
-        exit_status = exec_remote_command(server=host.address,
-                                          username=cloudstack_host_attributes.vm_user,
-                                          password=cloudstack_host_attributes.vm_password,
-                                          command=main_script, output=main_output)
-
-        if exit_status == 0:
-            hm.status = hm.SUCCESS
+            unavailable_hosts.append(hm.id)
+        elif not hm.host.cs_host_attributes.all():
+            LOG.warn("Host {} does not have cloudstack attrs...".format(hm.host))
+            unavailable_attrs.append(hm.id)
         else:
-
-            if maintenance.rollback_script:
-                rollback_output = {}
-                hm.status = hm.ROLLBACK
-                hm.save()
-
-                rollback_script = build_context_script(
-                    param_dict, maintenance.rollback_script)
-                exit_status = exec_remote_command(server=host.address,
-                                                  username=cloudstack_host_attributes.vm_user,
-                                                  password=cloudstack_host_attributes.vm_password,
-                                                  command=rollback_script, output=rollback_output)
-
-                if exit_status == 0:
-                    hm.status = hm.ROLLBACK_SUCCESS
-                else:
-                    hm.status = hm.ROLLBACK_ERROR
-
-                hm.rollback_log = get_dict_lines(rollback_output)
-
-            else:
-                hm.status = hm.ERROR
-
-        update_task += "...status: {}".format(hm.status)
-
-        task_history.update_details(persist=True,
-                                    details=update_task)
-
-        hm.main_log = get_dict_lines(main_output)
-        hm.finished_at = datetime.now()
-        hm.save()
+            runnable.append(hm)
+
+    now = datetime.now()
+    models.HostMaintenance.objects.filter(id__in=unavailable_hosts).update(
+        status=models.HostMaintenance.UNAVAILABLEHOST, started_at=now,
+        finished_at=now
+    )
+    models.HostMaintenance.objects.filter(id__in=unavailable_attrs).update(
+        status=models.HostMaintenance.UNAVAILABLECSHOSTATTR, started_at=now,
+        finished_at=now
+    )
+
+    parameters = models.MaintenanceParameters.objects.filter(
+        maintenance=maintenance
+    ).values_list('parameter_name', 'function_name')
+    param_dicts = _get_parameters(
+        list(parameters), [hm.host_id for hm in runnable]
+    )
+
+    wave_size = Configuration.get_by_name_as_int(
+        'maintenance_wave_size', default=MAINTENANCE_WAVE_SIZE
+    )
+    if not wave_size or wave_size <= 0:
+        LOG.warning("Invalid maintenance_wave_size {}, using {}".format(
+            wave_size, MAINTENANCE_WAVE_SIZE
+        ))
+        wave_size = MAINTENANCE_WAVE_SIZE
+    max_failures = Configuration.get_by_name_as_int(
+        'maintenance_max_failures', default=None
+    )
+
+    failures = 0
+    for start in range(0, len(runnable), wave_size):
+        wave = runnable[start:start + wave_size]
+
+        if max_failures is not None and failures > max_failures:
+            models.HostMaintenance.objects.filter(
+                id__in=[hm.id for hm in runnable[start:]]
+            ).update(status=models.HostMaintenance.REVOKED)
+            break
+
+        models.HostMaintenance.objects.filter(
+            id__in=[hm.id for hm in wave]
+        ).update(status=models.HostMaintenance.RUNNING, started_at=datetime.now())
+
+        # Hosts of the wave not started once the budget is exceeded are
+        # cancelled
+        max_errors = None
+        if max_failures is not None:
+            max_errors = max_failures - failures
+        targets = [
+            RemoteTarget(
+                hm.host, hm.host.address,
+                hm.host.cs_host_attributes.all()[0].vm_user,
+                hm.host.cs_host_attributes.all()[0].vm_password,
+                context=param_dicts[hm.host_id]
+            )
+            for hm in wave
+        ]
+        results = run_remote_commands(
+            targets, maintenance.main_script,
+            rollback=maintenance.rollback_script,
+            max_workers=maintenance.maximum_workers, max_errors=max_errors
+        )
+
+        with transaction.atomic():
+            cancelled = [
+                hm.id for hm, result in zip(wave, results)
+                if isinstance(result.error, ParallelCancelled)
+            ]
+            models.HostMaintenance.objects.filter(id__in=cancelled).update(
+                status=models.HostMaintenance.REVOKED, started_at=None
+            )
+
+            for hm, result in zip(wave, results):
+                if isinstance(result.error, ParallelCancelled):
+                    continue
+
+                status, main_log, rollback_log = _host_maintenance_status(
+                    hm, result
+                )
+                if status != hm.SUCCESS:
+                    failures += 1
+
+                models.HostMaintenance.objects.filter(id=hm.id).update(
+                    status=status, main_log=main_log,
+                    rollback_log=rollback_log, finished_at=datetime.now()
+                )
+                task_history.update_details(
+                    details="\nRunning Maintenance on {}...status: {}".format(
+                        hm.host, status)
+                )
+
+        task_history.update_details(persist=True, details="")
 
     models.Maintenance.objects.filter(id=maintenance_id,
                                       ).update(status=maintenance.FINISHED, finished_at=datetime.now())
 
-    task_history.update_status_for(TaskHistory.STATUS_SUCCESS,
-                                   details='Maintenance executed succesfully')
+    if max_failures is not None and failures > max_failures:
+        task_history.update_status_for(
+            TaskHistory.STATUS_ERROR,
+            details='Maintenance stopped after {} failures'.format(failures)
+        )
+    else:
+        task_history.update_status_for(TaskHistory.STATUS_SUCCESS,
+                                       details='Maintenance executed succesfully')
 
     LOG.info("Maintenance: {} has FINISHED".format(maintenance,))
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+from django.test import TestCase
+from physical.tests.factory import InstanceFactory, HostFactory
+from ..registered_functions import functools
+
+
+class GetParametersTestCase(TestCase):
+
+    def setUp(self):
+        self.instance = InstanceFactory()
+        self.host = self.instance.hostname
+        self.parameters = [
+            ('HOST_NAME', 'get_hostmane'),
+            ('HOST_ADDRESS', 'get_hostaddress'),
+            ('DATABASE_INFRA_NAME', 'get_infra_name'),
+            ('DATABASE_INFRA_USER', 'get_infra_user'),
+            ('ENGINE_TYPE', 'get_engine_type_name'),
+            ('HOST_USER', 'get_host_user'),
+            ('THERE_IS_BACKUP_LOG_CONFIG', 'get_there_is_backup_log_config'),
+        ]
+
+    def test_same_values_as_registered_functions(self):
+        values = functools._get_parameters(self.parameters, [self.host.id])
+
+        for parameter_name, function_name in self.parameters:
+            function = functools._get_function(function_name)
+            self.assertEqual(
+                values[self.host.id][parameter_name], function(self.host.id)
+            )
+
+    def test_host_without_instances(self):
+        host = HostFactory()
+        values = functools._get_parameters(self.parameters, [host.id])
+
+        self.assertEqual(values[host.id]['HOST_NAME'], host.hostname)
+        self.assertIsNone(values[host.id]['DATABASE_INFRA_NAME'])
+        self.assertIsNone(values[host.id]['HOST_USER'])
+
+    def test_loads_hosts_in_bulk(self):
+        other_host = InstanceFactory(
+            databaseinfra=self.instance.databaseinfra
+        ).hostname
+
+        with self.assertNumQueries(6):
+            values = functools._get_parameters(
+                self.parameters, [self.host.id, other_host.id]
+            )
+        self.assertEqual(len(values), 2)
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+from datetime import datetime, timedelta
+from mock import patch, Mock
+from django.test import TestCase
+from dbaas_cloudstack.models import HostAttr
+from physical.tests.factory import HostFactory
+from util.ssh import RemoteCommandResult, run_remote_commands
+from .. import tasks
+from ..models import Maintenance, HostMaintenance
+
+
+class ExecuteScheduledMaintenanceTestCase(TestCase):
+
+    def setUp(self):
+        self.hosts = [
+            HostFactory(address='10.0.0.{}'.format(i)) for i in range(5)
+        ]
+        for host in self.hosts:
+            HostAttr.objects.create(host=host, vm_user='user', vm_password='pwd')
+
+        self.settings = {}
+        self.failing = set()
+        self.rollback_failing = set()
+
+        patches = [
+            patch('maintenance.tasks.get_worker_name', return_value='worker'),
+            patch(
+                'maintenance.tasks.Configuration.get_by_name_as_int',
+                side_effect=lambda name, default=None: self.settings.get(
+                    name, default
+                )
+            ),
+            patch('util.ssh.get_ssh_pool'),
+        ]
+        for patcher in patches:
+            get_ssh_pool = patcher.start()
+            self.addCleanup(patcher.stop)
+        get_ssh_pool.return_value.execute.side_effect = self.execute
+
+    def execute(self, address, username, password, command):
+        if command == 'rollback':
+            failing = self.rollback_failing
+        else:
+            failing = self.failing
+        exit_status = 1 if address in failing else 0
+        return RemoteCommandResult(exit_status, [command], [], 0.1)
+
+    def create_maintenance(self, hosts=None, rollback_script=None,
+                           maximum_workers=1):
+        hosts = hosts or self.hosts
+        with patch.object(
+            tasks.execute_scheduled_maintenance, 'apply_async',
+            return_value=Mock(task_id='task')
+        ):
+            return Maintenance.objects.create(
+                description='maintenance', main_script='main',
+                rollback_script=rollback_script,
+                maximum_workers=maximum_workers,
+                scheduled_for=datetime.now() + timedelta(days=1),
+                hostsid=','.join(str(host.id) for host in hosts)
+            )
+
+    def run_maintenance(self, maintenance):
+        tasks.execute_scheduled_maintenance.apply(args=[maintenance.id])
+
+    def statuses(self, maintenance):
+        return dict(HostMaintenance.objects.filter(
+            maintenance=maintenance
+        ).values_list('host_id', 'status'))
+
+    def test_hosts_run_in_waves(self):
+        self.settings['maintenance_wave_size'] = 2
+        maintenance = self.create_maintenance()
+
+        with patch(
+            'maintenance.tasks.run_remote_commands', wraps=run_remote_commands
+        ) as remote_commands:
+            self.run_maintenance(maintenance)
+
+        waves = [len(call[0][0]) for call in remote_commands.call_args_list]
+        self.assertEqual(waves, [2, 2, 1])
+        self.assertEqual(
+            set(self.statuses(maintenance).values()),
+            set([HostMaintenance.SUCCESS])
+        )
+        self.assertEqual(
+            Maintenance.objects.get(id=maintenance.id).status,
+            Maintenance.FINISHED
+        )
+
+    def test_invalid_wave_size_uses_default(self):
+        self.settings['maintenance_wave_size'] = 0
+        maintenance = self.create_maintenance()
+        self.run_maintenance(maintenance)
+
+        self.assertEqual(
+            set(self.statuses(maintenance).values()),
+            set([HostMaintenance.SUCCESS])
+        )
+
+    def test_hosts_not_started_are_revoked_after_budget(self):
+        self.settings['maintenance_max_failures'] = 0
+        self.failing = set(host.address for host in self.hosts)
+        maintenance = self.create_maintenance()
+        self.run_maintenance(maintenance)
+
+        statuses = self.statuses(maintenance)
+        self.assertEqual(statuses.pop(self.hosts[0].id), HostMaintenance.ERROR)
+        self.assertEqual(
+            set(statuses.values()), set([HostMaintenance.REVOKED])
+        )
+
+    def test_rollback_counts_as_failure(self):
+        self.settings['maintenance_max_failures'] = 0
+        self.failing = set([self.hosts[0].address])
+        maintenance = self.create_maintenance(
+            hosts=self.hosts[:2], rollback_script='rollback'
+        )
+        self.run_maintenance(maintenance)
+
+        statuses = self.statuses(maintenance)
+        self.assertEqual(
+            statuses[self.hosts[0].id], HostMaintenance.ROLLBACK_SUCCESS
+        )
+        self.assertEqual(statuses[self.hosts[1].id], HostMaintenance.REVOKED)
+
+    def test_rollback_error_is_logged(self):
+        self.failing = set([self.hosts[0].address])
+        self.rollback_failing = set([self.hosts[0].address])
+        maintenance = self.create_maintenance(
+            hosts=self.hosts[:1], rollback_script='rollback'
+        )
+        self.run_maintenance(maintenance)
+
+        host_maintenance = HostMaintenance.objects.get(
+            maintenance=maintenance
+        )
+        self.assertEqual(
+            host_maintenance.status, HostMaintenance.ROLLBACK_ERROR
+        )
+        self.assertIn('main', host_maintenance.main_log)
+        self.assertIn('rollback', host_maintenance.rollback_log)
+
+    def test_unavailable_hosts_are_marked_together(self):
+        without_attrs = HostFactory()
+        deleted = HostFactory()
+        maintenance = self.create_maintenance(
+            hosts=self.hosts[:2] + [without_attrs, deleted]
+        )
+        deleted.delete()
+
+        with patch.object(
+            HostMaintenance.objects, 'filter',
+            wraps=HostMaintenance.objects.filter
+        ) as host_filter:
+            self.run_maintenance(maintenance)
+
+        statuses = dict(HostMaintenance.objects.filter(
+            maintenance=maintenance
+        ).values_list('hostname', 'status'))
+        self.assertEqual(
+            statuses[without_attrs.hostname],
+            HostMaintenance.UNAVAILABLECSHOSTATTR
+        )
+        self.assertEqual(
+            statuses[deleted.hostname], HostMaintenance.UNAVAILABLEHOST
+        )
+        self.assertFalse(HostMaintenance.objects.filter(
+            maintenance=maintenance, finished_at__isnull=True
+        ).exists())
+
+        # Unavailable hosts, the running wave and its revoked hosts are one
+        # update each, every host ran is updated with its logs
+        self.assertEqual(host_filter.call_count, 1 + 2 + 1 + 1 + 2)
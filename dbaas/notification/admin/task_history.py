@@ -1,15 +1,64 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
 from django.utils.translation import ugettext_lazy as _
 import logging
 
-from ..models import TaskHistory
+from ..models import TaskHistory, TaskHistoryDetail
+from workflow.progress import get_progress
 from dbaas import constants
 from account.models import Team
 
 LOG = logging.getLogger(__name__)
 
+LAST_DETAIL_SQL = """
+    SELECT notification_taskhistorydetail.id
+    FROM notification_taskhistorydetail
+    WHERE notification_taskhistorydetail.task_id = notification_taskhistory.id
+    ORDER BY notification_taskhistorydetail.id DESC LIMIT 1
+"""
+
+
+def load_last_details(task_histories):
+    """
+    Sets last_detail on each task history of the page, from one query for
+    the last chunks and one for the details of the ones without chunks
+    """
+    chunk_ids = [
+        task_history.last_detail_id for task_history in task_histories
+        if task_history.last_detail_id
+    ]
+    chunks = dict(TaskHistoryDetail.objects.filter(
+        id__in=chunk_ids
+    ).values_list('id', 'text')) if chunk_ids else {}
+
+    without_chunks = [
+        task_history.id for task_history in task_histories
+        if not task_history.last_detail_id
+    ]
+    details = dict(TaskHistory.objects.filter(
+        id__in=without_chunks
+    ).values_list('id', 'details')) if without_chunks else {}
+
+    for task_history in task_histories:
+        if task_history.last_detail_id:
+            text = chunks.get(task_history.last_detail_id)
+        else:
+            text = details.get(task_history.id)
+        task_history.last_detail = (text or '').lstrip().split('\n')[-1]
+
+
+class TaskHistoryChangeList(ChangeList):
+
+    def get_queryset(self, request):
+        queryset = super(TaskHistoryChangeList, self).get_queryset(request)
+        return queryset.extra(select={'last_detail_id': LAST_DETAIL_SQL})
+
+    def get_results(self, request):
+        super(TaskHistoryChangeList, self).get_results(request)
+        load_last_details(self.result_list)
+
 
 class TaskHistoryAdmin(admin.ModelAdmin):
     perm_add_database_infra = constants.PERM_ADD_DATABASE_INFRA
@@ -34,19 +83,35 @@ class TaskHistoryAdmin(admin.ModelAdmin):
     friendly_task_name.short_description = "Task Name"
 
     def friendly_details(self, task_history):
-        if task_history.details:
-            return task_history.details.split("\n")[-1]
+        if task_history.is_running:
+            progress = get_progress(task_history.id)
+            if progress and 'description' in progress:
+                return "Step {} of {} - {}".format(
+                    progress['step'], progress['steps_total'],
+                    progress['description']
+                )
+
+        if hasattr(task_history, 'last_detail'):
+            last_line = [task_history.last_detail]
+        else:
+            last_line = task_history.tail_details(lines=1)
+        if last_line and last_line[0]:
+            return last_line[0]
         else:
             return "N/A"
 
     friendly_details.short_description = "Current Step"
 
     def friendly_details_read(self, task_history):
-        if task_history.details:
-            return task_history.details.lstrip()
+        details = task_history.read_details()
+        if details:
+            return details
 
     friendly_details_read.short_description = "Details"
 
+    def get_changelist(self, request, **kwargs):
+        return TaskHistoryChangeList
+
     def has_delete_permission(self, request, obj=None):  # note the obj=None
         return False
 
@@ -60,7 +125,7 @@ class TaskHistoryAdmin(admin.ModelAdmin):
         qs = None
 
         if request.user.has_perm(self.perm_add_database_infra):
-            qs = super(TaskHistoryAdmin, self).queryset(request)
+            qs = super(TaskHistoryAdmin, self).queryset(request).defer('details')
             return qs
 
         if request.GET.get('user'):
@@ -68,7 +133,7 @@ class TaskHistoryAdmin(admin.ModelAdmin):
             del query_dict_copy['user']
             request.GET = query_dict_copy
 
-        qs = super(TaskHistoryAdmin, self).queryset(request)
+        qs = super(TaskHistoryAdmin, self).queryset(request).defer('details')
         same_team_users = Team.users_at_same_team(request.user)
         return qs.filter(user__in=[user.username for user in same_team_users])
 
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+from south.utils import datetime_utils as datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        # Adding field 'TaskHistory.database_name'
+        db.add_column(u'notification_taskhistory', 'database_name',
+                      self.gf('django.db.models.fields.CharField')(max_length=100, null=True, blank=True),
+                      keep_default=False)
+
+        # Adding field 'TaskHistory.environment'
+        db.add_column(u'notification_taskhistory', 'environment',
+                      self.gf('django.db.models.fields.CharField')(max_length=100, null=True, blank=True),
+                      keep_default=False)
+
+        # Adding index on 'TaskHistory', fields ['database_name', 'environment', 'task_status']
+        db.create_index(u'notification_taskhistory', ['database_name', 'environment', 'task_status'])
+
+
+    def backwards(self, orm):
+        # Removing index on 'TaskHistory', fields ['database_name', 'environment', 'task_status']
+        db.delete_index(u'notification_taskhistory', ['database_name', 'environment', 'task_status'])
+
+        # Deleting field 'TaskHistory.database_name'
+        db.delete_column(u'notification_taskhistory', 'database_name')
+
+        # Deleting field 'TaskHistory.environment'
+        db.delete_column(u'notification_taskhistory', 'environment')
+
+
+    models = {
+        u'notification.taskhistorydetail': {
+            'Meta': {'object_name': 'TaskHistoryDetail', 'index_together': "[['task', 'chunk']]"},
+            'chunk': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'created_at': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'task': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'detail_chunks'", 'to': u"orm['notification.TaskHistory']"}),
+            'text': ('django.db.models.fields.TextField', [], {})
+        },
+        u'notification.taskhistory': {
+            'Meta': {'object_name': 'TaskHistory', 'index_together': "[['database_name', 'environment', 'task_status']]"},
+            'arguments': ('django.db.models.fields.TextField', [], {'null': 'True', 'blank': 'True'}),
+            'context': ('django.db.models.fields.TextField', [], {'null': 'True', 'blank': 'True'}),
+            'created_at': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'database_name': ('django.db.models.fields.CharField', [], {'max_length': '100', 'null': 'True', 'blank': 'True'}),
+            'db_id': ('django.db.models.fields.IntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'details': ('django.db.models.fields.TextField', [], {'null': 'True', 'blank': 'True'}),
+            'ended_at': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'environment': ('django.db.models.fields.CharField', [], {'max_length': '100', 'null': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'task_id': ('django.db.models.fields.CharField', [], {'max_length': '200', 'null': 'True', 'blank': 'True'}),
+            'task_name': ('django.db.models.fields.CharField', [], {'max_length': '200', 'null': 'True', 'blank': 'True'}),
+            'task_status': ('django.db.models.fields.CharField', [], {'default': "u'PENDING'", 'max_length': '100', 'db_index': 'True'}),
+            'updated_at': ('django.db.models.fields.DateTimeField', [], {'auto_now': 'True', 'blank': 'True'}),
+            'user': ('django.db.models.fields.CharField', [], {'max_length': '255', 'null': 'True', 'blank': 'True'})
+        }
+    }
+
+    complete_apps = ['notification']
\ No newline at end of file
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from south.utils import datetime_utils as datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        # Adding model 'DatabaseUsageAlert'
+        db.create_table(u'notification_databaseusagealert', (
+            (u'id', self.gf('django.db.models.fields.AutoField')(primary_key=True)),
+            ('db_id', self.gf('django.db.models.fields.IntegerField')(unique=True)),
+            ('percent', self.gf('django.db.models.fields.FloatField')()),
+            ('sent_at', self.gf('django.db.models.fields.DateTimeField')()),
+        ))
+        db.send_create_signal(u'notification', ['DatabaseUsageAlert'])
+
+
+    def backwards(self, orm):
+        # Deleting model 'DatabaseUsageAlert'
+        db.delete_table(u'notification_databaseusagealert')
+
+
+    models = {
+        u'notification.databaseusagealert': {
+            'Meta': {'object_name': 'DatabaseUsageAlert'},
+            'db_id': ('django.db.models.fields.IntegerField', [], {'unique': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'percent': ('django.db.models.fields.FloatField', [], {}),
+            'sent_at': ('django.db.models.fields.DateTimeField', [], {})
+        },
+        u'notification.taskhistorydetail': {
+            'Meta': {'object_name': 'TaskHistoryDetail', 'index_together': "[['task', 'chunk']]"},
+            'chunk': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'created_at': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'task': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'detail_chunks'", 'to': u"orm['notification.TaskHistory']"}),
+            'text': ('django.db.models.fields.TextField', [], {})
+        },
+        u'notification.taskhistory': {
+            'Meta': {'object_name': 'TaskHistory', 'index_together': "[['database_name', 'environment', 'task_status']]"},
+            'arguments': ('django.db.models.fields.TextField', [], {'null': 'True', 'blank': 'True'}),
+            'context': ('django.db.models.fields.TextField', [], {'null': 'True', 'blank': 'True'}),
+            'created_at': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'database_name': ('django.db.models.fields.CharField', [], {'max_length': '100', 'null': 'True', 'blank': 'True'}),
+            'db_id': ('django.db.models.fields.IntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'details': ('django.db.models.fields.TextField', [], {'null': 'True', 'blank': 'True'}),
+            'ended_at': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'environment': ('django.db.models.fields.CharField', [], {'max_length': '100', 'null': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'task_id': ('django.db.models.fields.CharField', [], {'max_length': '200', 'null': 'True', 'blank': 'True'}),
+            'task_name': ('django.db.models.fields.CharField', [], {'max_length': '200', 'null': 'True', 'blank': 'True'}),
+            'task_status': ('django.db.models.fields.CharField', [], {'default': "u'PENDING'", 'max_length': '100', 'db_index': 'True'}),
+            'updated_at': ('django.db.models.fields.DateTimeField', [], {'auto_now': 'True', 'blank': 'True'}),
+            'user': ('django.db.models.fields.CharField', [], {'max_length': '255', 'null': 'True', 'blank': 'True'})
+        }
+    }
+
+    complete_apps = ['notification']
\ No newline at end of file
@@ -4,6 +4,7 @@ import logging
 import time
 from datetime import datetime
 from django.db import models
+from django.db.models import Max
 from django.utils.translation import ugettext_lazy as _
 from django.utils import simplejson
 
@@ -11,11 +12,18 @@ from util.models import BaseModel
 
 LOG = logging.getLogger(__name__)
 
+DETAILS_FLUSH_LINES = 50
+DETAILS_FLUSH_INTERVAL = 5
+# The details field only keeps the end of the details, the whole text is
+# in the TaskHistoryDetail chunks
+DETAILS_TAIL_LENGTH = 4000
+
 
 class TaskHistory(BaseModel):
 
     class Meta:
         verbose_name_plural = "Task histories"
+        index_together = [['database_name', 'environment', 'task_status']]
 
     STATUS_PENDING = 'PENDING'
     STATUS_RUNNING = 'RUNNING'
@@ -27,6 +35,8 @@ class TaskHistory(BaseModel):
     _STATUS = [STATUS_PENDING, STATUS_RUNNING, STATUS_SUCCESS,
                STATUS_ERROR, STATUS_WARNING, STATUS_WAITING]
 
+    auto_flush_details = True
+
     task_id = models.CharField(
         _('Task ID'), max_length=200, null=True, blank=True, editable=False
     )
@@ -50,6 +60,14 @@ class TaskHistory(BaseModel):
     db_id = models.IntegerField(
         verbose_name=_("Database"), null=True, blank=True
     )
+    database_name = models.CharField(
+        verbose_name=_("Database name"), max_length=100, null=True,
+        blank=True, editable=False
+    )
+    environment = models.CharField(
+        verbose_name=_("Environment"), max_length=100, null=True,
+        blank=True, editable=False
+    )
 
     def __unicode__(self):
         return u"%s" % self.task_id
@@ -67,21 +85,25 @@ class TaskHistory(BaseModel):
         """
 
         if self.details:
-            self.details = "\n%s%s" % (self.details, details)
+            self.set_details_tail("\n%s%s" % (self.details, details))
         else:
-            self.details = details
+            self.set_details_tail(details)
 
-        if persist:
-            self.save()
+        self.append_details(details, flush=persist)
+
+    def set_details_tail(self, details):
+        self.details = details[-DETAILS_TAIL_LENGTH:]
 
     def add_detail(self, message, level=None):
         extra = ''
         if level > 0:
             extra = '{}> '.format('-' * level)
 
-        self.details = "{}\n".format(self.details) if self.details else ""
-        self.details = '{}{}{}'.format(self.details, extra, message)
-        self.save()
+        line = '{}{}'.format(extra, message)
+        if self.details:
+            line = '\n{}'.format(line)
+        self.set_details_tail('{}{}'.format(self.details or '', line))
+        self.append_details(line)
 
     def add_step(self, step, total, description):
         current_time = str(time.strftime("%m/%d/%Y %H:%M:%S"))
@@ -96,12 +118,108 @@ class TaskHistory(BaseModel):
             raise RuntimeError("Invalid task status")
 
         self.task_status = status
-        self.details = (self.details or " ") + "\n" + str(details)
+        self.set_details_tail((self.details or " ") + "\n" + str(details))
+        self.append_details("\n" + str(details))
         if status in [TaskHistory.STATUS_SUCCESS, TaskHistory.STATUS_ERROR, TaskHistory.STATUS_WARNING]:
             self.update_ended_at()
         else:
             self.save()
 
+    def save(self, *args, **kwargs):
+        super(TaskHistory, self).save(*args, **kwargs)
+        self.flush_details()
+
+    def append_details(self, text, flush=False):
+        """
+        Buffers text appended to the details. The buffer is written as one
+        TaskHistoryDetail chunk when it has task_history_flush_lines lines,
+        when task_history_flush_interval seconds passed since the last
+        write or when the task history is saved. With auto_flush_details
+        off only saving or calling flush_details writes the buffer.
+        """
+        from system.models import Configuration
+
+        if not hasattr(self, '_pending_details'):
+            self._pending_details = []
+            self._details_flushed_at = time.time()
+        self._pending_details.append(text)
+
+        if not flush and self.auto_flush_details:
+            flush_lines = Configuration.get_by_name_as_int(
+                'task_history_flush_lines', default=DETAILS_FLUSH_LINES
+            )
+            flush_interval = Configuration.get_by_name_as_int(
+                'task_history_flush_interval', default=DETAILS_FLUSH_INTERVAL
+            )
+            elapsed = time.time() - self._details_flushed_at
+            flush = (len(self._pending_details) >= flush_lines or
+                     elapsed >= flush_interval)
+
+        if flush:
+            self.flush_details()
+
+    def flush_details(self):
+        pending = getattr(self, '_pending_details', None)
+        if not pending or not self.id:
+            return
+
+        if not hasattr(self, '_last_detail_chunk'):
+            self._last_detail_chunk = self.detail_chunks.aggregate(
+                last=Max('chunk')
+            )['last'] or 0
+
+        # Chunks are read by id, chunk only numbers the ones this object
+        # wrote and may repeat with other objects of the same task history
+        TaskHistoryDetail.objects.create(
+            task=self, chunk=self._last_detail_chunk + 1,
+            text=''.join(pending)
+        )
+        self._last_detail_chunk += 1
+        self._pending_details = []
+        self._details_flushed_at = time.time()
+
+    def read_details(self, offset=0, limit=None):
+        """
+        Returns the details written by the chunks offset to offset + limit,
+        without loading the whole details. Task histories without chunks,
+        created before them, are read from the details field.
+        """
+        self.flush_details()
+        chunks = self.detail_chunks.order_by('id').values_list(
+            'text', flat=True
+        )
+        if limit is None:
+            chunks = chunks[offset:]
+        else:
+            chunks = chunks[offset:offset + limit]
+        details = ''.join(chunks)
+
+        if not details and not offset:
+            details = self.details or ''
+        return details.lstrip()
+
+    def tail_details(self, lines=10):
+        """ Returns the last lines of the details """
+        self.flush_details()
+        chunks = self.detail_chunks.order_by('-id').values_list(
+            'text', flat=True
+        )
+
+        details = ''
+        for chunk in chunks.iterator():
+            details = chunk + details
+            if details.count('\n') >= lines:
+                break
+        else:
+            if not details:
+                details = self.details or ''
+
+        return details.lstrip().split('\n')[-lines:]
+
+    def set_database(self, database):
+        self.database_name = database.name
+        self.environment = database.environment.name
+
     def update_dbid(self, db):
         self.db_id = db.id
         self.save()
@@ -137,6 +255,11 @@ class TaskHistory(BaseModel):
         arguments = factory_arguments_for_task(request.task, request.kwargs)
         task_history.arguments = ", ".join(arguments)
 
+        database_name, environment = cls.database_of_task(request.kwargs)
+        if database_name:
+            task_history.database_name = database_name
+            task_history.environment = environment
+
         if user:
             task_history.user = str(user.username)
 
@@ -144,6 +267,34 @@ class TaskHistory(BaseModel):
 
         return task_history
 
+    @staticmethod
+    def database_of_task(kwargs):
+        """
+        Returns the name and environment of the database a task works on,
+        from the task kwargs. The database of a clone is the origin one.
+        """
+        database = kwargs.get('database') or kwargs.get('origin_database')
+        if database:
+            return database.name, database.environment.name
+
+        name = kwargs.get('name')
+        environment = kwargs.get('environment')
+        if name and environment:
+            return name, getattr(environment, 'name', environment)
+
+        return None, None
+
+    @classmethod
+    def database_tasks(cls, database_name, environment=None,
+                       status=STATUS_RUNNING):
+        """ Tasks of a database, using the database_name index """
+        tasks = cls.objects.filter(database_name=database_name)
+        if environment:
+            tasks = tasks.filter(environment=environment)
+        if isinstance(status, (list, tuple)):
+            return tasks.filter(task_status__in=status)
+        return tasks.filter(task_status=status)
+
     @classmethod
     def running_tasks(cls):
         return cls.objects.filter(task_status=cls.STATUS_RUNNING)
@@ -155,3 +306,32 @@ class TaskHistory(BaseModel):
     @property
     def is_running(self):
         return self.task_status == self.STATUS_RUNNING
+
+
+class TaskHistoryDetail(models.Model):
+
+    """ Chunk of text appended to the details of a task history """
+
+    class Meta:
+        index_together = [['task', 'chunk']]
+
+    task = models.ForeignKey(TaskHistory, related_name='detail_chunks')
+    chunk = models.PositiveIntegerField()
+    text = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __unicode__(self):
+        return u"%s #%s" % (self.task, self.chunk)
+
+
+class DatabaseUsageAlert(models.Model):
+
+    """ Last usage notification sent for a database, it is not sent again
+    while the database stays over the threshold """
+
+    db_id = models.IntegerField(unique=True)
+    percent = models.FloatField()
+    sent_at = models.DateTimeField()
+
+    def __unicode__(self):
+        return u"%s: %.2f%%" % (self.db_id, self.percent)
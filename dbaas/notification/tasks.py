@@ -1,23 +1,27 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
 import datetime
+from collections import defaultdict
 from time import sleep
 from celery.utils.log import get_task_logger
 from celery.exceptions import SoftTimeLimitExceeded
-from django.db.models import Sum, Count
+from django.core import mail
+from django.db import transaction
 from dbaas.celery import app
-from account.models import Team
 from logical.models import Database
 from physical.models import Plan, DatabaseInfra, Instance
+from physical.capacity import capacity_report
 from util import email_notifications, get_worker_name, full_stack
 from util.decorators import only_one
+from util.parallel import run_in_parallel
 from util.providers import make_infra, clone_infra, destroy_infra, \
     get_database_upgrade_setting, get_resize_settings
 from simple_audit.models import AuditRequest
 from system.models import Configuration
-from .models import TaskHistory
+from .models import TaskHistory, DatabaseUsageAlert
 from workflow.workflow import steps_for_instances
 from maintenance.models import DatabaseUpgrade, DatabaseResize
+from tsuru.cache import invalidate_database
 
 LOG = get_task_logger(__name__)
 
@@ -213,116 +217,177 @@ def databaseinfra_notification(self, user=None):
         LOG.warning("database infra notification is disabled")
         return
 
-    # Sum capacity per databseinfra with parameter plan, environment and engine
-    infras = DatabaseInfra.objects.values(
-        'plan__name', 'environment__name', 'engine__engine_type__name',
-        'plan__provider'
-    ).annotate(capacity=Sum('capacity'))
-    for infra in infras:
+    for report in capacity_report():
+        if report.provider == Plan.CLOUDSTACK:
+            continue
+        if report.percent < threshold_infra_notification:
+            continue
+
+        LOG.info('Plan %s in environment %s with %s%% occupied' % (
+            report.plan, report.environment, report.percent))
+        LOG.info("Sending database infra notification...")
+        context = {}
+        context['plan'] = report.plan
+        context['environment'] = report.environment
+        context['used'] = report.used
+        context['capacity'] = report.capacity
+        context['percent'] = report.percent
+        email_notifications.databaseinfra_ending(context=context)
+
+    task_history.update_status_for(
+        TaskHistory.STATUS_SUCCESS,
+        details='Databaseinfra Notification successfully sent to dbaas admins!'
+    )
+    return
+
+
+class DatabaseUsage(object):
+
+    def __init__(self, database):
+        self.database = database
+        self.used = database.used_size_in_mb
+        self.capacity = database.total_size_in_mb
         try:
-            database = infra.databases.get()
-        except Database.MultipleObjectsReturned:
-            pass
-        else:
-            if database.is_in_quarantine:
-                continue
-            if not database.subscribe_to_email_events:
-                continue
+            self.percent = (self.used / self.capacity) * 100
+        except ZeroDivisionError:
+            # database has no total size
+            self.percent = 0.0
 
-        used = DatabaseInfra.objects.filter(
-            plan__name=infra['plan__name'], environment__name=infra['environment__name'],
-            engine__engine_type__name=infra['engine__engine_type__name']
-        ).aggregate(used=Count('databases'))
-        # calculate the percentage
-
-        percent = int(used['used'] * 100 / infra['capacity'])
-        if percent >= threshold_infra_notification and infra['plan__provider'] != Plan.CLOUDSTACK:
-            LOG.info('Plan %s in environment %s with %s%% occupied' % (
-                infra['plan__name'], infra['environment__name'], percent))
-            LOG.info("Sending database infra notification...")
-            context = {}
-            context['plan'] = infra['plan__name']
-            context['environment'] = infra['environment__name']
-            context['used'] = used['used']
-            context['capacity'] = infra['capacity']
-            context['percent'] = percent
-            email_notifications.databaseinfra_ending(context=context)
+    def __unicode__(self):
+        return "database %s => usage: %.2f" % (self.database, self.percent)
 
-        task_history.update_status_for(
-            TaskHistory.STATUS_SUCCESS,
-            details='Databaseinfra Notification successfully sent to dbaas admins!'
-        )
-    return
+    def __str__(self):
+        return self.__unicode__()
 
 
-def database_notification_for_team(team=None):
+def databases_usage(teams=None):
+    """ Usage of the subscribed databases of teams, of all teams when None,
+    from one query and grouped by team """
+    databases = Database.objects.filter(
+        is_in_quarantine=False, subscribe_to_email_events=True,
+        team__isnull=False
+    ).select_related(
+        'team', 'environment', 'databaseinfra__disk_offering',
+        'databaseinfra__engine__engine_type'
+    ).order_by('team', 'name')
+    if teams is not None:
+        databases = databases.filter(team__in=teams)
+
+    usage = defaultdict(list)
+    for database in databases:
+        usage[database.team].append(DatabaseUsage(database))
+    return usage
+
+
+def alerts_to_send(usage, interval):
+    """ Usages without an alert sent in the last interval """
+    sent_after = datetime.datetime.now() - interval
+    alerts = dict(DatabaseUsageAlert.objects.filter(
+        db_id__in=[database_usage.database.id for database_usage in usage]
+    ).values_list('db_id', 'sent_at'))
+    return [
+        database_usage for database_usage in usage
+        if alerts.get(database_usage.database.id, sent_after) <= sent_after
+    ]
+
+
+def record_alerts(usage):
+    now = datetime.datetime.now()
+    db_ids = [database_usage.database.id for database_usage in usage]
+    with transaction.atomic():
+        DatabaseUsageAlert.objects.filter(db_id__in=db_ids).delete()
+        DatabaseUsageAlert.objects.bulk_create([
+            DatabaseUsageAlert(
+                db_id=database_usage.database.id,
+                percent=database_usage.percent, sent_at=now
+            ) for database_usage in usage
+        ])
+
+
+def database_notification_for_teams(teams=None):
     """
-    Notifies teams of database usage.
+    Sends to each team one email with its databases over the usage
+    threshold, through a single smtp connection. A database is notified
+    again only after database_usage_alert_interval_days or after its usage
+    goes under the threshold.
     if threshold_database_notification <= 0, the notification is disabled.
     """
-    LOG.info("sending database notification for team %s" % team)
     threshold_database_notification = Configuration.get_by_name_as_int(
         "threshold_database_notification", default=0)
-    # if threshold_database_notification
     if threshold_database_notification <= 0:
         LOG.warning("database notification is disabled")
-        return
+        return {}
+    interval = datetime.timedelta(days=Configuration.get_by_name_as_int(
+        "database_usage_alert_interval_days", default=7))
 
-    databases = Database.objects.filter(
-        team=team, is_in_quarantine=False, subscribe_to_email_events=True
-    )
-    msgs = []
-    for database in databases:
-        used = database.used_size_in_mb
-        capacity = database.total_size_in_mb
-        try:
-            percent_usage = (used / capacity) * 100
-        except ZeroDivisionError:
-            # database has no total size
-            percent_usage = 0.0
-        msg = "database %s => usage: %.2f | threshold: %.2f" % (
-            database, percent_usage, threshold_database_notification)
-        LOG.info(msg)
-        msgs.append(msg)
-
-        if not team.email:
-            msgs.append(
-                "team %s has no email set and therefore no database usage notification will been sent" % team)
-        else:
-            if percent_usage >= threshold_database_notification:
-                LOG.info("Sending database notification...")
-                context = {}
-                context['database'] = database.name
-                context['team'] = team
-                context['measure_unity'] = "MB"
-                context['used'] = used
-                context['capacity'] = capacity
-                context['percent'] = "%.2f" % percent_usage
-                context['environment'] = database.environment.name
-                email_notifications.database_usage(context=context)
+    msgs = {}
+    over_threshold = []
+    connection = mail.get_connection()
+    try:
+        for team, usage in databases_usage(teams).items():
+            msgs[team] = []
+            for database_usage in usage:
+                msg = "%s | threshold: %.2f" % (
+                    database_usage, threshold_database_notification)
+                LOG.info(msg)
+                msgs[team].append(msg)
+
+            usage = [
+                database_usage for database_usage in usage
+                if database_usage.percent >= threshold_database_notification
+            ]
+            over_threshold.extend(usage)
+            if not usage:
+                continue
+
+            if not team.email:
+                msgs[team].append(
+                    "team %s has no email set and therefore no database usage notification will been sent" % team)
+                continue
+
+            usage = alerts_to_send(usage, interval)
+            if not usage:
+                continue
+
+            LOG.info("Sending database notification...")
+            email_notifications.database_usage_digest(
+                team, usage, connection=connection
+            )
+            record_alerts(usage)
+    finally:
+        connection.close()
+
+    # Databases back under the threshold are alerted as soon as they cross it
+    alerts = DatabaseUsageAlert.objects.exclude(db_id__in=[
+        database_usage.database.id for database_usage in over_threshold
+    ])
+    if teams is not None:
+        alerts = alerts.filter(db_id__in=Database.objects.filter(
+            team__in=teams
+        ).values('id'))
+    alerts.delete()
 
     return msgs
 
 
+def database_notification_for_team(team=None):
+    """
+    Notifies teams of database usage.
+    if threshold_database_notification <= 0, the notification is disabled.
+    """
+    LOG.info("sending database notification for team %s" % team)
+    return database_notification_for_teams([team]).get(team, [])
+
+
 @app.task(bind=True)
 @only_one(key="db_notification_key", timeout=180)
 def database_notification(self):
     """
-    Create tasks for database notification by team
+    Notifies every team of its databases usage
     if threshold_database_notification <= 0, the notification is disabled.
     """
-    # get all teams and for each one create a new task
     LOG.info("retrieving all teams and sendind database notification")
-    teams = Team.objects.all()
-    msgs = {}
-
-    for team in teams:
-        ###############################################
-        # create task
-        ###############################################
-
-        msgs[team] = database_notification_for_team(team=team)
-        ###############################################
+    msgs = database_notification_for_teams()
 
     try:
         LOG.info("Messages: ")
@@ -339,6 +404,29 @@ def database_notification(self):
     return
 
 
+def databaseinfras_snapshots(infras):
+    """ Collects a fresh snapshot of every infra in parallel, the periodic
+    tasks probing at the same time share each one """
+    max_workers = Configuration.get_by_name_as_int(
+        'infra_snapshot_max_workers', default=10)
+    timeout = Configuration.get_by_name_as_int(
+        'infra_snapshot_timeout', default=60)
+
+    return run_in_parallel(
+        lambda infra: infra.get_snapshot(force_refresh=True), infras,
+        max_workers=max_workers, timeout=timeout
+    )
+
+
+def snapshot_message(probe):
+    msg = "\nDatabaseInfra: {}, probe latency: {:.3f}s".format(
+        probe.item, probe.elapsed)
+    if probe.error:
+        msg = "{}, error: {}".format(msg, probe.error)
+    LOG.info(msg)
+    return msg
+
+
 @app.task(bind=True)
 @only_one(key="get_databases_status", timeout=180)
 def update_database_status(self):
@@ -347,24 +435,44 @@ def update_database_status(self):
         worker_name = get_worker_name()
         task_history = TaskHistory.register(
             request=self.request, user=None, worker_name=worker_name)
-        databases = Database.objects.all()
+
+        infras = DatabaseInfra.objects.filter(
+            databases__isnull=False
+        ).distinct().prefetch_related('databases')
+
         msgs = []
-        for database in databases:
-            if database.database_status and database.database_status.is_alive:
-                database.status = Database.ALIVE
+        changes = defaultdict(list)
+        for probe in databaseinfras_snapshots(infras):
+            msgs.append(snapshot_message(probe))
+            snapshot = probe.result
+
+            for database in probe.item.databases.all():
+                database_status = None
+                if snapshot:
+                    database_status = snapshot.get_database_status(
+                        database.name)
+
+                if database_status and database_status.is_alive:
+                    status = Database.ALIVE
+                    if snapshot.has_dead_instances:
+                        status = Database.ALERT
+                else:
+                    status = Database.DEAD
 
-                instances_status = database.databaseinfra.check_instances_status()
-                if instances_status == database.databaseinfra.ALERT:
-                    database.status = Database.ALERT
+                if database.status != status:
+                    changes[status].append(database)
 
-            else:
-                database.status = Database.DEAD
+                msg = "\nUpdating status for database: {}, status: {}".format(
+                    database, status)
+                msgs.append(msg)
+                LOG.info(msg)
 
-            database.save(update_fields=['status'])
-            msg = "\nUpdating status for database: {}, status: {}".format(
-                database, database.status)
-            msgs.append(msg)
-            LOG.info(msg)
+        for status, databases in changes.items():
+            Database.objects.filter(
+                id__in=[database.id for database in databases]
+            ).update(status=status)
+            for database in databases:
+                invalidate_database(database.name)
 
         task_history.update_status_for(TaskHistory.STATUS_SUCCESS, details="\n".join(
             value for value in msgs))
@@ -382,20 +490,37 @@ def update_database_used_size(self):
         worker_name = get_worker_name()
         task_history = TaskHistory.register(
             request=self.request, user=None, worker_name=worker_name)
-        databases = Database.objects.all()
+
+        infras = DatabaseInfra.objects.filter(
+            databases__isnull=False
+        ).distinct().prefetch_related('databases')
+
         msgs = []
-        for database in databases:
-            if database.database_status:
-                database.used_size_in_bytes = float(
-                    database.database_status.used_size_in_bytes)
-            else:
-                database.used_size_in_bytes = 0.0
+        for probe in databaseinfras_snapshots(infras):
+            msgs.append(snapshot_message(probe))
+            snapshot = probe.result
+
+            for database in probe.item.databases.all():
+                database_status = None
+                if snapshot:
+                    database_status = snapshot.get_database_status(
+                        database.name)
+
+                if database_status:
+                    used_size_in_bytes = float(
+                        database_status.used_size_in_bytes)
+                else:
+                    used_size_in_bytes = 0.0
+
+                if database.used_size_in_bytes != used_size_in_bytes:
+                    Database.objects.filter(id=database.id).update(
+                        used_size_in_bytes=used_size_in_bytes)
+                    invalidate_database(database.name)
 
-            database.save(update_fields=['used_size_in_bytes'])
-            msg = "\nUpdating used size in bytes for database: {}, used size: {}".format(
-                database, database.used_size_in_bytes)
-            msgs.append(msg)
-            LOG.info(msg)
+                msg = "\nUpdating used size in bytes for database: {}, used size: {}".format(
+                    database, used_size_in_bytes)
+                msgs.append(msg)
+                LOG.info(msg)
 
         task_history.update_status_for(TaskHistory.STATUS_SUCCESS, details="\n".join(
             value for value in msgs))
@@ -414,24 +539,32 @@ def update_instances_status(self):
         request=self.request, user=None, worker_name=worker_name)
 
     try:
-        infras = DatabaseInfra.objects.all()
+        infras = DatabaseInfra.objects.prefetch_related('instances')
         msgs = []
-        for databaseinfra in infras:
-            LOG.info("Retrieving all instances for {}".format(databaseinfra))
-
-            for instance in Instance.objects.filter(databaseinfra=databaseinfra):
-                if instance.check_status():
-                    instance.status = Instance.ALIVE
+        changes = defaultdict(list)
+        for probe in databaseinfras_snapshots(infras):
+            msgs.append(snapshot_message(probe))
+            snapshot = probe.result
+
+            for instance in probe.item.instances.all():
+                if snapshot and snapshot.get_instance_status(instance):
+                    status = Instance.ALIVE
                 else:
-                    instance.status = Instance.DEAD
+                    status = Instance.DEAD
 
-                instance.save(update_fields=['status'])
+                if instance.status != status:
+                    changes[status].append(instance.id)
 
                 msg = "\nUpdating instance status, instance: {}, status: {}".format(
-                    instance, instance.status)
+                    instance, status)
                 msgs.append(msg)
                 LOG.info(msg)
 
+        for status, instances_ids in changes.items():
+            Instance.objects.filter(
+                id__in=instances_ids
+            ).update(status=status)
+
         task_history.update_status_for(TaskHistory.STATUS_SUCCESS, details="\n".join(
             value for value in msgs))
     except Exception as e:
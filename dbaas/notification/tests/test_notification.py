@@ -5,6 +5,7 @@ from django.core import mail
 from account.tests.factory import TeamFactory
 from logical.tests.factory import DatabaseFactory
 from system.models import Configuration
+from notification.models import DatabaseUsageAlert
 from notification.tasks import database_notification_for_team
 
 
@@ -51,3 +52,32 @@ class NotificationTestCase(TestCase):
 
         database_notification_for_team(team=self.team)
         self.assertEqual(len(mail.outbox), 0)
+
+    def test_team_receives_one_digest(self):
+        database = DatabaseFactory(
+            team=self.team, databaseinfra=self.infra_big,
+            used_size_in_bytes=8 * 1024 * 1024
+        )
+
+        database_notification_for_team(team=self.team)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertIn(database.name, mail.outbox[0].body)
+        self.assertIn(self.database_big.name, mail.outbox[0].body)
+
+    def test_notification_is_not_sent_again(self):
+        database_notification_for_team(team=self.team)
+        database_notification_for_team(team=self.team)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertTrue(DatabaseUsageAlert.objects.filter(
+            db_id=self.database_big.id
+        ).exists())
+
+    def test_alert_is_removed_under_threshold(self):
+        database_notification_for_team(team=self.team)
+
+        self.database_big.used_size_in_bytes = 1024 * 1024
+        self.database_big.save()
+        database_notification_for_team(team=self.team)
+        self.assertFalse(DatabaseUsageAlert.objects.filter(
+            db_id=self.database_big.id
+        ).exists())
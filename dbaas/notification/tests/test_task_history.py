@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
 from django.test import TestCase
+from mock import patch, Mock
+from logical.tests.factory import DatabaseFactory
 from notification.models import TaskHistory
 from notification.tests.factory import TaskHistoryFactory
 
@@ -69,3 +71,132 @@ class TaskHistoryTestCase(TestCase):
     def test_is_not_running(self):
         self.task.task_status = TaskHistory.STATUS_SUCCESS
         self.assertFalse(self.task.is_running)
+
+    def test_details_are_written_in_chunks(self):
+        self.task.add_detail(message='Testing')
+        self.task.add_detail(message='Again, with new line', level=2)
+        self.assertEqual(self.task.detail_chunks.count(), 0)
+
+        self.task.save()
+        self.assertEqual(self.task.detail_chunks.count(), 1)
+        self.assertEqual(self.task.details, self.task.read_details())
+
+    @patch('notification.models.DETAILS_FLUSH_LINES', 2)
+    def test_details_are_flushed_by_line_count(self):
+        for line in range(5):
+            self.task.add_detail(message='Line {}'.format(line))
+        self.assertEqual(self.task.detail_chunks.count(), 2)
+
+        task = TaskHistory.objects.get(id=self.task.id)
+        self.assertEqual(task.read_details(), 'Line 0\nLine 1\nLine 2\nLine 3')
+        self.assertEqual(self.task.tail_details(lines=2), ['Line 3', 'Line 4'])
+
+    @patch('notification.models.DETAILS_TAIL_LENGTH', 10)
+    def test_details_field_keeps_only_the_tail(self):
+        self.task.add_detail(message='First line')
+        self.task.add_detail(message='Second line')
+        self.task.save()
+
+        self.assertEqual(self.task.details, 'econd line')
+        self.assertEqual(self.task.read_details(), 'First line\nSecond line')
+
+    def test_details_written_by_two_objects_keep_their_order(self):
+        self.task.add_detail(message='First')
+        self.task.save()
+        other = TaskHistory.objects.get(id=self.task.id)
+        other.add_detail(message='Second')
+        other.save()
+        self.task.add_detail(message='Third')
+        self.task.save()
+
+        self.assertEqual(
+            self.task.read_details(), 'First\nSecond\nThird'
+        )
+        self.assertEqual(self.task.tail_details(lines=1), ['Third'])
+
+    def test_read_details_without_chunks(self):
+        self.task.details = '\nFirst\nSecond'
+        TaskHistory.objects.filter(id=self.task.id).update(
+            details=self.task.details
+        )
+
+        task = TaskHistory.objects.get(id=self.task.id)
+        self.assertEqual(task.read_details(), 'First\nSecond')
+        self.assertEqual(task.tail_details(lines=1), ['Second'])
+
+    def test_register_sets_database_of_task(self):
+        database = DatabaseFactory()
+        request = Mock(
+            id='task_id', task='notification.tasks.destroy_database',
+            kwargs={'database': database, 'user': 'admin'}
+        )
+
+        task = TaskHistory.register(request=request)
+        self.assertEqual(task.database_name, database.name)
+        self.assertEqual(task.environment, database.environment.name)
+        self.assertIn(task, TaskHistory.database_tasks(
+            database.name, database.environment.name
+        ))
+
+    def test_database_of_create_task(self):
+        kwargs = {'name': 'new_database', 'environment': 'dev'}
+        self.assertEqual(
+            TaskHistory.database_of_task(kwargs), ('new_database', 'dev')
+        )
+        self.assertEqual(TaskHistory.database_of_task({}), (None, None))
+
+    def test_database_tasks_by_status(self):
+        database = DatabaseFactory()
+        self.task.set_database(database)
+        self.task.task_status = TaskHistory.STATUS_WAITING
+        self.task.save()
+
+        tasks = TaskHistory.database_tasks(database.name)
+        self.assertNotIn(self.task, tasks)
+
+        tasks = TaskHistory.database_tasks(
+            database.name, database.environment.name,
+            status=[TaskHistory.STATUS_RUNNING, TaskHistory.STATUS_WAITING]
+        )
+        self.assertIn(self.task, tasks)
+        self.assertNotIn(self.task, TaskHistory.database_tasks(
+            database.name, 'other_environment',
+            status=[TaskHistory.STATUS_WAITING]
+        ))
+
+
+class TaskHistoryChangeListTestCase(TestCase):
+
+    def setUp(self):
+        self.task = TaskHistoryFactory()
+        self.task.add_detail(message='First')
+        self.task.add_detail(message='Second', level=2)
+        self.task.save()
+
+        self.old_task = TaskHistoryFactory()
+        TaskHistory.objects.filter(id=self.old_task.id).update(
+            details='\nFirst\nLast'
+        )
+
+    def task_histories(self):
+        from ..admin.task_history import LAST_DETAIL_SQL
+        return list(TaskHistory.objects.defer('details').extra(
+            select={'last_detail_id': LAST_DETAIL_SQL}
+        ).order_by('id'))
+
+    def test_last_detail(self):
+        from ..admin.task_history import load_last_details
+        task_histories = self.task_histories()
+        load_last_details(task_histories)
+
+        self.assertEqual(task_histories[0].last_detail, '--> Second')
+        self.assertEqual(task_histories[1].last_detail, 'Last')
+
+    def test_loads_page_in_fixed_queries(self):
+        from ..admin.task_history import load_last_details
+        for _ in range(5):
+            TaskHistoryFactory().add_detail(message='Other', level=1)
+        task_histories = self.task_histories()
+
+        with self.assertNumQueries(2):
+            load_last_details(task_histories)
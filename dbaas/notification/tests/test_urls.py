@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
 from json import loads
+from mock import patch
 from django.test import TestCase
 from django.core.urlresolvers import reverse
 from notification.models import TaskHistory
 from notification.views import running_tasks_api, waiting_tasks_api
+from notification.views import task_progress_api
 from notification.tests.factory import TaskHistoryFactory
 
 
@@ -53,3 +55,9 @@ class UrlTest(TestCase):
         self.assertIn(str(task_waiting.id), tasks)
         self.assertEqual(tasks[str(task_waiting.id)], task_waiting.task_name)
         self.assertNotIn(str(task_pending.id), tasks)
+
+    @patch('notification.views.get_progress', return_value=None)
+    def test_progress_of_unknown_task_is_not_found(self, get_progress):
+        url = reverse(task_progress_api, kwargs={'task_id': 999999})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
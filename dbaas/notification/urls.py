@@ -7,4 +7,5 @@ urlpatterns = patterns(
     views,
     url(r"^tasks_running/$", views.running_tasks_api, name="notification:tasks_running"),
     url(r"^tasks_waiting/$", views.waiting_tasks_api, name="notification:tasks_waiting"),
+    url(r"^task_progress/(?P<task_id>\d+)/$", views.task_progress_api, name="notification:task_progress"),
 )
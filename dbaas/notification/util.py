@@ -45,6 +45,9 @@ def get_clone_args(origin_database, dest_database):
     port_dest = dest_instance.port
 
     path_of_dump = Configuration.get_by_name('database_clone_dir')
+    compress = Configuration.get_by_name_as_int(
+        'database_clone_compress', default=0
+    )
 
     if origin_database.databaseinfra.engine.engine_type.name != "redis":
         user_orig = origin_database.databaseinfra.user
@@ -54,6 +57,8 @@ def get_clone_args(origin_database, dest_database):
                 db_dest, user_dest, pass_dest, host_dest, str(int(port_dest)),
                 path_of_dump
                 ]
+        if compress:
+            args.append('compress')
     else:
 
         sys_credentials = get_credentials_for(
@@ -89,4 +94,7 @@ def get_clone_args(origin_database, dest_database):
                         cluster_info)
                     ]
 
+        if compress:
+            args.append('--compress')
+
     return args
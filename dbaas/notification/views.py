@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 from json import dumps
 from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
 from models import TaskHistory
+from workflow.progress import get_progress
 
 
 def running_tasks_api(self):
@@ -18,3 +20,13 @@ def waiting_tasks_api(self):
         task.id: task.task_name for task in tasks
     })
     return HttpResponse(response_json, content_type="application/json")
+
+
+def task_progress_api(self, task_id):
+    progress = get_progress(task_id)
+    if not progress:
+        task = get_object_or_404(
+            TaskHistory.objects.only('task_status'), id=task_id
+        )
+        progress = {'status': task.task_status}
+    return HttpResponse(dumps(progress), content_type="application/json")
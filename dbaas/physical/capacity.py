@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+from collections import OrderedDict
+from django.db.models import Count
+
+GROUP_BY = (
+    'plan__name', 'environment__name', 'engine__engine_type__name',
+    'plan__provider'
+)
+
+
+class CapacityReport(object):
+
+    """ How many databases a group of infras supports and how many it has """
+
+    def __init__(self, plan, environment, engine_type, provider):
+        self.plan = plan
+        self.environment = environment
+        self.engine_type = engine_type
+        self.provider = provider
+        self.infras = 0
+        self.capacity = 0
+        self.used = 0
+
+    @property
+    def available(self):
+        return self.capacity - self.used
+
+    @property
+    def percent(self):
+        if not self.capacity:
+            return 0
+        return int(self.used * 100 / self.capacity)
+
+    def add(self, capacity, used):
+        self.infras += 1
+        self.capacity += capacity
+        self.used += used
+
+    def __unicode__(self):
+        return "{} in {}: {} of {} ({}%)".format(
+            self.plan, self.environment, self.used, self.capacity,
+            self.percent
+        )
+
+    def __str__(self):
+        return self.__unicode__()
+
+
+def with_used(infras):
+    """ Annotates databases_used on each infra, instead of one
+    databases.count() for each one """
+    return infras.annotate(databases_used=Count('databases'))
+
+
+def capacity_report(infras=None):
+    """
+    Capacity of infras grouped by plan, environment and engine type, from
+    one query counting the databases of each infra
+    """
+    from physical.models import DatabaseInfra
+
+    if infras is None:
+        infras = DatabaseInfra.objects.all()
+
+    rows = with_used(infras).values(
+        'capacity', 'databases_used', *GROUP_BY
+    ).order_by(*GROUP_BY)
+
+    reports = OrderedDict()
+    for row in rows:
+        key = tuple(row[field] for field in GROUP_BY)
+        if key not in reports:
+            reports[key] = CapacityReport(*key)
+        reports[key].add(row['capacity'], row['databases_used'])
+    return list(reports.values())
@@ -5,7 +5,6 @@ import simple_audit
 from django.db.models.signals import pre_save, post_save, pre_delete
 from django.dispatch import receiver
 from django.core.exceptions import ValidationError
-from django.core.cache import cache
 from django.db import models, transaction
 from django.utils.html import format_html
 from django.utils.translation import ugettext_lazy as _
@@ -13,10 +12,13 @@ from django_extensions.db.fields.encrypted import EncryptedCharField
 from util.models import BaseModel
 from drivers import DatabaseInfraStatus
 from system.models import Configuration
+from util.shared_cache import SharedCache
 from .errors import NoDiskOfferingGreaterError, NoDiskOfferingLesserError
 
 LOG = logging.getLogger(__name__)
 
+INFRA_INFO_CACHE = SharedCache('infra_info')
+
 
 class Environment(BaseModel):
     name = models.CharField(
@@ -486,17 +488,31 @@ class DatabaseInfra(BaseModel):
         return datainfras
 
     @classmethod
-    def best_for(cls, plan, environment, name):
-        """ Choose the best DatabaseInfra for another database """
-        datainfras = list(
-            DatabaseInfra.get_active_for(plan=plan, environment=environment))
-        if not datainfras:
-            return None
-        datainfras.sort(key=lambda di: -di.available)
-        best_datainfra = datainfras[0]
-        if best_datainfra.available <= 0:
-            return None
-        return best_datainfra
+    def best_for(cls, plan, environment, name, strategy=None):
+        """
+        Choose the best DatabaseInfra for another database, following the
+        placement strategy set on infra_placement_strategy. The chosen infra
+        is locked until the end of the transaction, so call it in the same
+        transaction that creates the database to not oversubscribe it.
+        """
+        from .placement import available_infras, get_placement_strategy
+
+        strategy = strategy or get_placement_strategy()
+        datainfras = strategy.order(available_infras(plan, environment))
+        with transaction.atomic():
+            for datainfra in datainfras:
+                datainfra = DatabaseInfra.objects.select_for_update().get(
+                    pk=datainfra.pk
+                )
+                # Concurrent creates may have filled it after the ordering.
+                # Only a locking read sees the databases they committed, a
+                # plain one reads the snapshot of this transaction
+                used = len(datainfra.databases.select_for_update().values_list(
+                    'id', flat=True
+                ))
+                if datainfra.capacity - used > 0:
+                    return datainfra
+        return None
 
     def check_instances_status(self):
         alive_instances = self.instances.filter(status=Instance.ALIVE).count()
@@ -518,29 +534,43 @@ class DatabaseInfra(BaseModel):
     def get_info(self, force_refresh=False):
         if not self.pk:
             return None
-        key = "datainfra:info:%d" % self.pk
-        info = None
-
-        if not force_refresh:
-            # try use cache
-            info = cache.get(key)
-
-        if info is None:
-            try:
-                info = self.get_driver().info()
-                cache.set(key, info)
-            except:
-                # To make cache possible if the database hangs the connection
-                # with no reply
-                info = DatabaseInfraStatus(databaseinfra_model=self.__class__)
-                info.databases_status[self.databases.all()[0].name] = DatabaseInfraStatus(
-                    databaseinfra_model=self.__class__)
-                info.databases_status[
-                    self.databases.all()[0].name].is_alive = False
-
-                cache.set(key, info)
+
+        return INFRA_INFO_CACHE.get(
+            key="datainfra:info:%d" % self.pk,
+            loader=lambda: self.get_driver().info(),
+            fallback=self.__dead_info,
+            force_refresh=force_refresh
+        )
+
+    def __dead_info(self, error):
+        # To make cache possible if the database hangs the connection
+        # with no reply
+        info = DatabaseInfraStatus(databaseinfra_model=self.__class__)
+        database = self.databases.first()
+        if database:
+            database_status = DatabaseInfraStatus(
+                databaseinfra_model=self.__class__)
+            database_status.is_alive = False
+            info.databases_status[database.name] = database_status
         return info
 
+    def get_snapshot(self, force_refresh=False):
+        """ Info of databases and instances of this infra, shared by the
+        periodic status tasks. A fresh snapshot also refreshes get_info """
+        if not self.pk:
+            return None
+
+        return INFRA_INFO_CACHE.get(
+            key="datainfra:snapshot:%d" % self.pk,
+            loader=self.__load_snapshot,
+            force_refresh=force_refresh
+        )
+
+    def __load_snapshot(self):
+        snapshot = self.get_driver().snapshot()
+        INFRA_INFO_CACHE.set("datainfra:info:%d" % self.pk, snapshot)
+        return snapshot
+
     @property
     def disk_used_size_in_kb(self):
         greater_disk = None
@@ -795,6 +825,19 @@ def databaseinfra_pre_save(sender, **kwargs):
     """
     databaseinfra = kwargs.get('instance')
     LOG.debug("databaseinfra pre-save triggered")
+    if databaseinfra.pk:
+        saved_object = DatabaseInfra.objects.filter(pk=databaseinfra.pk).first()
+        if saved_object and (
+            saved_object.user != databaseinfra.user or
+            saved_object.password != databaseinfra.password or
+            saved_object.endpoint != databaseinfra.endpoint or
+            saved_object.endpoint_dns != databaseinfra.endpoint_dns
+        ):
+            from drivers.pool import connection_pool
+            LOG.info("Invalidating connections of databaseinfra %s" % (
+                databaseinfra))
+            connection_pool.invalidate(databaseinfra.pk)
+
     if not databaseinfra.plan:
         databaseinfra.plan = databaseinfra.engine.engine_type.default_plan
         LOG.warning("No plan specified, using default plan (%s) for engine %s" % (
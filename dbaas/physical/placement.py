@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import logging
+from collections import defaultdict
+from django.db.models import Count
+from django.utils.module_loading import import_by_path
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_PLACEMENT_STRATEGY = 'physical.placement.MostFreePlacement'
+
+# How many databases an infra still supports, computed by the database
+FREE_SQL = """
+    physical_databaseinfra.capacity - (
+        SELECT COUNT(*) FROM logical_database
+        WHERE logical_database.databaseinfra_id = physical_databaseinfra.id
+    )
+"""
+
+
+def available_infras(plan, environment):
+    """ Active infras of plan and environment with room for another
+    database, annotated with free """
+    from physical.models import DatabaseInfra
+
+    return DatabaseInfra.objects.filter(
+        plan=plan, environment=environment, instances__is_active=True
+    ).distinct().extra(
+        select={'free': FREE_SQL}, where=['({}) > 0'.format(FREE_SQL)]
+    )
+
+
+class PlacementStrategy(object):
+
+    """
+    Chooses where a new database goes. order receives the available infras
+    annotated with free and returns them from the best to the worst one.
+    """
+
+    def order(self, infras):
+        raise NotImplementedError
+
+
+class MostFreePlacement(PlacementStrategy):
+
+    """ Infras with more room first, databases are spread over infras """
+
+    def order(self, infras):
+        return infras.order_by('-free', 'id')
+
+
+class BinPackingPlacement(PlacementStrategy):
+
+    """ Fullest infras first, keeps the others free for bigger demands """
+
+    def order(self, infras):
+        return infras.order_by('free', 'id')
+
+
+class SpreadByHostPlacement(PlacementStrategy):
+
+    """
+    Infras whose busiest host has fewer databases first, so infras sharing
+    hosts are not filled together
+    """
+
+    def order(self, infras):
+        from physical.models import Instance
+
+        infras = list(infras.order_by('-free', 'id'))
+        if not infras:
+            return infras
+
+        instances = Instance.objects.filter(
+            databaseinfra__in=infras, is_active=True
+        ).values_list('databaseinfra', 'hostname')
+        hosts = defaultdict(set)
+        for infra_id, host_id in instances:
+            hosts[infra_id].add(host_id)
+
+        all_hosts = set().union(*hosts.values())
+        load = dict(Instance.objects.filter(
+            hostname__in=all_hosts, is_active=True
+        ).values('hostname').annotate(
+            databases=Count('databaseinfra__databases', distinct=True)
+        ).values_list('hostname', 'databases'))
+
+        def busiest_host(infra):
+            return max([load.get(host, 0) for host in hosts[infra.id]] or [0])
+
+        # sort is stable, infras with the same load keep the most free first
+        return sorted(infras, key=busiest_host)
+
+
+def get_placement_strategy():
+    from system.models import Configuration
+
+    class_path = Configuration.get_by_name('infra_placement_strategy')
+    try:
+        return import_by_path(class_path or DEFAULT_PLACEMENT_STRATEGY)()
+    except Exception as e:
+        LOG.error("Invalid placement strategy {}: {}".format(class_path, e))
+        return import_by_path(DEFAULT_PLACEMENT_STRATEGY)()
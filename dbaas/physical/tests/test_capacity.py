@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+from django.test import TestCase
+from logical.tests import factory as factory_logical
+from ..capacity import capacity_report, with_used
+from ..models import DatabaseInfra
+from . import factory
+
+
+class CapacityReportTestCase(TestCase):
+
+    def setUp(self):
+        self.plan = factory.PlanFactory()
+        self.environment = self.plan.environments.all()[0]
+        self.infra1 = factory.DatabaseInfraFactory(
+            plan=self.plan, environment=self.environment, capacity=4)
+        self.infra2 = factory.DatabaseInfraFactory(
+            plan=self.plan, environment=self.environment, capacity=6)
+        for _ in range(3):
+            factory_logical.DatabaseFactory(databaseinfra=self.infra1)
+        factory_logical.DatabaseFactory(databaseinfra=self.infra2)
+
+    def test_with_used(self):
+        infra = with_used(DatabaseInfra.objects.filter(id=self.infra1.id))[0]
+        self.assertEqual(infra.databases_used, 3)
+
+    def test_groups_infras(self):
+        reports = capacity_report(DatabaseInfra.objects.filter(
+            plan=self.plan
+        ))
+
+        self.assertEqual(len(reports), 1)
+        report = reports[0]
+        self.assertEqual(report.plan, self.plan.name)
+        self.assertEqual(report.environment, self.environment.name)
+        self.assertEqual(report.infras, 2)
+        self.assertEqual(report.capacity, 10)
+        self.assertEqual(report.used, 4)
+        self.assertEqual(report.available, 6)
+        self.assertEqual(report.percent, 40)
+
+    def test_in_one_query(self):
+        with self.assertNumQueries(1):
+            capacity_report()
@@ -1,11 +1,15 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals
+import threading
+import time
 import mock
-from django.test import TestCase
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
 from django.contrib.admin.sites import AdminSite
 from logical.tests import factory as factory_logical
 from ..admin.databaseinfra import DatabaseInfraAdmin
 from ..models import DatabaseInfra, Plan
+from ..placement import BinPackingPlacement, SpreadByHostPlacement
 from . import factory
 from drivers.fake import FakeDriver
 from django.core.cache import cache
@@ -113,6 +117,63 @@ class DatabaseInfraTestCase(TestCase):
         self.assertIsNone(
             DatabaseInfra.best_for(plan=plan, environment=environment, name="test"))
 
+    def test_best_for_with_bin_packing_returns_the_fullest_datainfra(self):
+        plan = factory.PlanFactory()
+        environment = plan.environments.all()[0]
+        datainfra1 = factory.DatabaseInfraFactory(
+            plan=plan, environment=environment, capacity=10)
+        factory.InstanceFactory(databaseinfra=datainfra1)
+        datainfra2 = factory.DatabaseInfraFactory(
+            plan=plan, environment=environment, capacity=2)
+        factory.InstanceFactory(databaseinfra=datainfra2)
+        factory_logical.DatabaseFactory(databaseinfra=datainfra2)
+
+        self.assertEqual(datainfra2, DatabaseInfra.best_for(
+            plan=plan, environment=environment, name="test",
+            strategy=BinPackingPlacement()))
+
+        factory_logical.DatabaseFactory(databaseinfra=datainfra2)
+        self.assertEqual(datainfra1, DatabaseInfra.best_for(
+            plan=plan, environment=environment, name="test",
+            strategy=BinPackingPlacement()))
+
+    def test_best_for_with_spread_by_host_avoids_busy_hosts(self):
+        plan = factory.PlanFactory()
+        environment = plan.environments.all()[0]
+        busy_host = factory.HostFactory()
+        datainfra1 = factory.DatabaseInfraFactory(
+            plan=plan, environment=environment, capacity=10)
+        factory.InstanceFactory(databaseinfra=datainfra1, hostname=busy_host)
+        datainfra2 = factory.DatabaseInfraFactory(
+            plan=plan, environment=environment, capacity=2)
+        factory.InstanceFactory(databaseinfra=datainfra2)
+
+        other_infra = factory.DatabaseInfraFactory(capacity=10)
+        factory.InstanceFactory(databaseinfra=other_infra, hostname=busy_host)
+        factory_logical.DatabaseFactory(databaseinfra=other_infra)
+
+        self.assertEqual(datainfra2, DatabaseInfra.best_for(
+            plan=plan, environment=environment, name="test",
+            strategy=SpreadByHostPlacement()))
+
+    def test_best_for_uses_configured_strategy(self):
+        from system.models import Configuration
+        plan = factory.PlanFactory()
+        environment = plan.environments.all()[0]
+        datainfra1 = factory.DatabaseInfraFactory(
+            plan=plan, environment=environment, capacity=10)
+        factory.InstanceFactory(databaseinfra=datainfra1)
+        datainfra2 = factory.DatabaseInfraFactory(
+            plan=plan, environment=environment, capacity=5)
+        factory.InstanceFactory(databaseinfra=datainfra2)
+
+        Configuration.objects.create(
+            name='infra_placement_strategy',
+            value='physical.placement.BinPackingPlacement'
+        )
+        self.assertEqual(datainfra2, DatabaseInfra.best_for(
+            plan=plan, environment=environment, name="test"))
+
     @mock.patch.object(FakeDriver, 'info')
     def test_get_info_use_caching(self, info):
         info.return_value = 'hahaha'
@@ -135,6 +196,24 @@ class DatabaseInfraTestCase(TestCase):
         self.assertIsNotNone(datainfra.get_info(force_refresh=True))
         self.assertEqual(2, info.call_count)
 
+    @mock.patch.object(FakeDriver, 'info')
+    def test_get_info_of_dead_infra_without_databases(self, info):
+        info.side_effect = Exception('Connection refused')
+        datainfra = factory.DatabaseInfraFactory()
+        self.assertEqual({}, datainfra.get_info().databases_status)
+
+    @mock.patch.object(FakeDriver, 'snapshot')
+    def test_get_snapshot_use_caching_and_refresh_info(self, snapshot):
+        snapshot.return_value = 'hahaha'
+        datainfra = factory.DatabaseInfraFactory()
+        self.assertEqual('hahaha', datainfra.get_snapshot())
+
+        # get another instance to ensure is not a local cache
+        datainfra = DatabaseInfra.objects.get(pk=datainfra.pk)
+        self.assertEqual('hahaha', datainfra.get_snapshot())
+        self.assertEqual('hahaha', datainfra.get_info())
+        snapshot.assert_called_once_with()
+
     def test_read_only_fields_editing(self):
         infra_factory = factory.DatabaseInfraFactory()
         infra_model = DatabaseInfra.objects.get(pk=infra_factory.pk)
@@ -160,3 +239,42 @@ class DatabaseInfraTestCase(TestCase):
             EDITING_CLOUDSTACK_READ_ONLY_FIELDS, admin_read_only
         )
         self.assertEqual(tuple(), admin_read_only)
+
+
+class DatabaseInfraConcurrentPlacementTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.plan = factory.PlanFactory()
+        self.environment = self.plan.environments.all()[0]
+        self.datainfra = factory.DatabaseInfraFactory(
+            plan=self.plan, environment=self.environment, capacity=1)
+        factory.InstanceFactory(databaseinfra=self.datainfra)
+
+    def best_for_in_another_transaction(self, result):
+        try:
+            with transaction.atomic():
+                result.append(DatabaseInfra.best_for(
+                    plan=self.plan, environment=self.environment,
+                    name="second"
+                ))
+        finally:
+            connection.close()
+
+    def test_concurrent_creates_do_not_oversubscribe(self):
+        result = []
+        second = threading.Thread(
+            target=self.best_for_in_another_transaction, args=(result,)
+        )
+
+        with transaction.atomic():
+            chosen = DatabaseInfra.best_for(
+                plan=self.plan, environment=self.environment, name="first")
+            self.assertEqual(chosen, self.datainfra)
+            factory_logical.DatabaseFactory(databaseinfra=chosen)
+
+            # The second create waits on the infra lock until this commits
+            second.start()
+            time.sleep(1)
+
+        second.join()
+        self.assertEqual(result, [None])
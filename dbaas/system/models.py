@@ -2,8 +2,10 @@
 from __future__ import absolute_import, unicode_literals
 import logging
 import simple_audit
-from django.core.cache import cache
-from django.db import models
+import os
+import threading
+import time
+from django.db import models, transaction
 from django.utils.translation import ugettext_lazy as _
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
@@ -11,9 +13,233 @@ from util.models import BaseModel
 import datetime
 
 
-CACHE_MISS = object()
 LOG = logging.getLogger(__name__)
 
+CONFIGURATION_VERSION_KEY = 'configuration:version'
+CONFIGURATION_CHANNEL = 'configuration:changed'
+# Configuration row bumped in the same transaction of every change, so a
+# snapshot knows which version its values are
+CONFIGURATION_VERSION_NAME = 'configuration_version'
+# Configuration lookups must not hang while Redis is unreachable
+REDIS_TIMEOUT = 0.5
+# Safety net when a change notification is lost
+VERSION_CHECK_INTERVAL = 1
+# Snapshots are reloaded after this age when Redis is unreachable, and a
+# published version not committed by then is taken as rolled back
+SNAPSHOT_MAX_AGE = 60
+LISTENER_RETRY_INTERVAL = 5
+PARSE_ERROR = object()
+CACHE_MISS = object()
+
+
+class ConfigurationSnapshot(object):
+
+    """
+    Every configuration value of the process, loaded with one query.
+    Typed values are parsed once and kept while the snapshot is used.
+    """
+
+    def __init__(self, values):
+        self.values = values
+        self.version = _parse_version(values.get(CONFIGURATION_VERSION_NAME))
+        self.pid = os.getpid()
+        self.loaded_at = time.time()
+        self.checked_at = self.loaded_at
+        self.stale = False
+        self.parsed = {}
+        # Published version the values do not have yet, the change is not
+        # committed or was rolled back
+        self.waiting_version = None
+        self.waiting_since = None
+
+    def is_fresh(self, version, now):
+        if version is None:
+            return now - self.loaded_at < SNAPSHOT_MAX_AGE
+        if self.version >= version:
+            return True
+        return (version == self.waiting_version and
+                now - self.waiting_since >= SNAPSHOT_MAX_AGE)
+
+    def wait_for(self, version, previous):
+        if version is None or self.version >= version:
+            return
+        self.waiting_version = version
+        self.waiting_since = self.loaded_at
+        if previous is not None and previous.waiting_version == version:
+            self.waiting_since = previous.waiting_since
+
+    def get(self, name):
+        return self.values.get(name)
+
+    def parse(self, name, kind, parser):
+        key = (name, kind)
+        value = self.parsed.get(key, CACHE_MISS)
+        if value is CACHE_MISS:
+            try:
+                value = parser(self.values.get(name))
+            except Exception:
+                value = PARSE_ERROR
+            self.parsed[key] = value
+        return value
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+_listener_pid = None
+_client = None
+
+
+def _parse_version(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _redis_client():
+    global _client
+    if _client is None:
+        import redis
+        from dbaas.settings import (
+            REDIS_HOST, REDIS_PORT, REDIS_DB, REDIS_PASSWORD
+        )
+        _client = redis.Redis(
+            host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB,
+            password=REDIS_PASSWORD, socket_timeout=REDIS_TIMEOUT,
+            socket_connect_timeout=REDIS_TIMEOUT
+        )
+    return _client
+
+
+def _read_version():
+    from redis.exceptions import RedisError
+    try:
+        return int(_redis_client().get(CONFIGURATION_VERSION_KEY) or 0)
+    except RedisError as e:
+        LOG.debug("Could not read configuration version: %s", e)
+        return None
+
+
+def _listen_changes():
+    from util.decorators import REDIS_CLIENT
+
+    while True:
+        try:
+            # Blocks waiting for messages, without the timeout of lookups
+            pubsub = REDIS_CLIENT.pubsub()
+            pubsub.subscribe(CONFIGURATION_CHANNEL)
+            for message in pubsub.listen():
+                if message['type'] == 'message':
+                    invalidate_configuration_snapshot()
+        except Exception as e:
+            LOG.debug("Configuration listener stopped: %s", e)
+        time.sleep(LISTENER_RETRY_INTERVAL)
+
+
+def _start_listener():
+    global _listener_pid
+    pid = os.getpid()
+    if _listener_pid == pid:
+        return
+
+    _listener_pid = pid
+    listener = threading.Thread(target=_listen_changes)
+    listener.daemon = True
+    listener.start()
+
+
+def _load_snapshot():
+    try:
+        values = dict(Configuration.objects.values_list('name', 'value'))
+    except Exception as e:
+        LOG.warning("ops.. could not retrieve configurations: %s" % e)
+        return None
+
+    snapshot = ConfigurationSnapshot(values)
+    LOG.debug("Configuration snapshot version %s loaded", snapshot.version)
+    return snapshot
+
+
+def get_configuration_snapshot():
+    """
+    Returns the configuration snapshot of this process. Changes are
+    published to every process by Redis, the snapshot is reloaded when it
+    is notified or when the version shared in Redis is newer than the
+    version committed with its values.
+    """
+    global _snapshot
+    snapshot = _snapshot
+    now = time.time()
+    pid = os.getpid()
+    if (snapshot is not None and not snapshot.stale and
+            snapshot.pid == pid and
+            now - snapshot.checked_at < VERSION_CHECK_INTERVAL):
+        return snapshot
+
+    _start_listener()
+    version = _read_version()
+
+    with _snapshot_lock:
+        snapshot = _snapshot
+        if snapshot is not None and snapshot.pid != pid:
+            snapshot = None
+
+        if (snapshot is not None and not snapshot.stale and
+                snapshot.is_fresh(version, now)):
+            snapshot.checked_at = now
+            return snapshot
+
+        loaded = _load_snapshot()
+        if loaded is None:
+            if snapshot is None:
+                return ConfigurationSnapshot({})
+            snapshot.checked_at = now
+            return snapshot
+
+        loaded.wait_for(version, snapshot)
+        _snapshot = loaded
+        return loaded
+
+
+def invalidate_configuration_snapshot():
+    snapshot = _snapshot
+    if snapshot is not None:
+        snapshot.stale = True
+
+
+def bump_configuration_version():
+    """
+    Increments the version row in the transaction of the change, it is
+    visible to other processes only when the change is committed
+    """
+    with transaction.atomic():
+        row, created = Configuration.objects.select_for_update(
+        ).get_or_create(
+            name=CONFIGURATION_VERSION_NAME, defaults={
+                'value': '1',
+                'description': 'Bumped on every configuration change',
+            }
+        )
+        if created:
+            return 1
+
+        version = _parse_version(row.value) + 1
+        Configuration.objects.filter(pk=row.pk).update(value=str(version))
+        return version
+
+
+def publish_configuration_change(version):
+    """ Shares the version of a change and notifies every process """
+    from redis.exceptions import RedisError
+
+    invalidate_configuration_snapshot()
+    try:
+        client = _redis_client()
+        client.set(CONFIGURATION_VERSION_KEY, version)
+        client.publish(CONFIGURATION_CHANNEL, 'changed')
+    except RedisError as e:
+        LOG.warning("Could not publish configuration change: %s", e)
+
 
 class Configuration(BaseModel):
 
@@ -25,9 +251,7 @@ class Configuration(BaseModel):
         verbose_name=_("Description"), null=True, blank=True)
 
     def clear_cache(self):
-        key = self.get_cache_key(self.name)
-        cache.delete(key)
-        # cache.clear()
+        publish_configuration_change(bump_configuration_version())
 
     @classmethod
     def get_cache_key(cls, configuration_name):
@@ -36,54 +260,45 @@ class Configuration(BaseModel):
     @classmethod
     def get_by_name_as_list(cls, name, token=','):
         """returns a list splited by name for the given name"""
-        config = Configuration.get_by_name(name) or []
-        if config:
-            return [item.strip() for item in config.split(token)]
-        else:
-            return config
+        def parser(config):
+            if config:
+                return [item.strip() for item in config.split(token)]
+            return []
+
+        value = get_configuration_snapshot().parse(
+            name, ('list', token), parser
+        )
+        return list(value)
 
     @classmethod
     def get_by_name_as_int(cls, name, default=None):
         """returns variable as int"""
-        try:
-            return int(Configuration.get_by_name(name))
-        except:
+        value = get_configuration_snapshot().parse(name, 'int', int)
+        if value is PARSE_ERROR:
             return default
+        return value
 
     @classmethod
     def get_by_name_as_float(cls, name, default=None):
-        try:
-            return float(Configuration.get_by_name(name))
-        except:
+        value = get_configuration_snapshot().parse(name, 'float', float)
+        if value is PARSE_ERROR:
             return default
+        return value
 
     @classmethod
     def get_by_name(cls, name):
-        key = cls.get_cache_key(name)
-        value = cache.get(key, CACHE_MISS)
-        if value is CACHE_MISS:
-            value = Configuration.__get_by_name(name)
-            cache.set(key, value)
+        value = get_configuration_snapshot().get(name)
+        if value is None:
+            LOG.debug("configuration %s not found" % name)
         return value
 
-    @classmethod
-    def __get_by_name(cls, name):
-        try:
-            value = Configuration.objects.get(name=name).value
-            LOG.debug("Configuration '%s': '%s'", name, value)
-            return value
-        except Configuration.DoesNotExist:
-            LOG.warning("configuration %s not found" % name)
-            return None
-        except Exception, e:
-            LOG.warning(
-                "ops.. could not retrieve configuration value for %s: %s" % (name, e))
-            return None
-
 
 @receiver([post_save, post_delete], sender=Configuration)
 def clear_configuration_cache(sender, **kwargs):
     configuration = kwargs.get("instance")
+    if configuration.name == CONFIGURATION_VERSION_NAME:
+        return
+
     LOG.info('Clearing configuration for name=%s', configuration.name)
     configuration.clear_cache()
 
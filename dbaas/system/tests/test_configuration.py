@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals
+import mock
 from django.test import TestCase
 from django.db import IntegrityError
 # from . import factory
+from .. import models
 from ..models import Configuration
 
 
@@ -21,3 +23,102 @@ class ConfigurationTest(TestCase):
         Tests get empty list when variable name does not exists
         """
         self.assertEquals(Configuration.get_by_name_as_list("abc"), [])
+
+
+class ConfigurationSnapshotTest(TestCase):
+
+    def setUp(self):
+        patches = [
+            mock.patch('system.models._start_listener'),
+            mock.patch(
+                'system.models.publish_configuration_change',
+                side_effect=lambda version: (
+                    models.invalidate_configuration_snapshot()
+                )
+            ),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        models._snapshot = None
+        Configuration.objects.create(name='timeout', value='10')
+        Configuration.objects.create(name='envs', value='dev, qa')
+
+    def tearDown(self):
+        models._snapshot = None
+
+    @mock.patch('system.models._read_version', return_value=1)
+    def test_loads_every_configuration_at_once(self, read_version):
+        with self.assertNumQueries(1):
+            self.assertEqual(Configuration.get_by_name_as_int('timeout'), 10)
+            self.assertEqual(
+                Configuration.get_by_name_as_list('envs'), ['dev', 'qa']
+            )
+            self.assertIsNone(Configuration.get_by_name('abc'))
+            self.assertEqual(
+                Configuration.get_by_name_as_int('abc', default=5), 5
+            )
+
+    @mock.patch('system.models._read_version', return_value=1)
+    def test_save_reloads_snapshot(self, read_version):
+        self.assertEqual(Configuration.get_by_name_as_int('timeout'), 10)
+
+        configuration = Configuration.objects.get(name='timeout')
+        configuration.value = '20'
+        configuration.save()
+        self.assertEqual(Configuration.get_by_name_as_int('timeout'), 20)
+
+    def commit_change(self, name, value):
+        """ A change of another process, without its notification """
+        Configuration.objects.filter(name=name).update(value=value)
+        return models.bump_configuration_version()
+
+    @mock.patch('system.models._read_version', return_value=1)
+    def test_bumps_version_on_change(self, read_version):
+        self.assertEqual(models.get_configuration_snapshot().version, 2)
+
+        Configuration.objects.create(name='retries', value='3')
+        self.assertEqual(models.get_configuration_snapshot().version, 3)
+
+    @mock.patch('system.models._read_version', return_value=2)
+    def test_reloads_when_shared_version_changes(self, read_version):
+        self.assertEqual(Configuration.get_by_name('timeout'), '10')
+        version = self.commit_change('timeout', '30')
+
+        models._snapshot.checked_at = 0
+        self.assertEqual(Configuration.get_by_name('timeout'), '10')
+
+        read_version.return_value = version
+        models._snapshot.checked_at = 0
+        self.assertEqual(Configuration.get_by_name('timeout'), '30')
+
+    @mock.patch('system.models._read_version', return_value=3)
+    def test_reloads_until_published_version_is_committed(self,
+                                                          read_version):
+        self.assertEqual(Configuration.get_by_name('timeout'), '10')
+        self.assertEqual(models._snapshot.waiting_version, 3)
+
+        self.commit_change('timeout', '30')
+        models._snapshot.checked_at = 0
+        self.assertEqual(Configuration.get_by_name('timeout'), '30')
+        self.assertIsNone(models._snapshot.waiting_version)
+
+    @mock.patch('system.models._read_version', return_value=3)
+    def test_gives_up_on_rolled_back_version(self, read_version):
+        self.assertEqual(Configuration.get_by_name('timeout'), '10')
+        snapshot = models._snapshot
+
+        snapshot.checked_at = 0
+        Configuration.get_by_name('timeout')
+        self.assertIsNot(models._snapshot, snapshot)
+        self.assertEqual(
+            models._snapshot.waiting_since, snapshot.waiting_since
+        )
+
+        snapshot = models._snapshot
+        snapshot.checked_at = 0
+        snapshot.waiting_since -= models.SNAPSHOT_MAX_AGE
+        with self.assertNumQueries(0):
+            Configuration.get_by_name('timeout')
+        self.assertIs(models._snapshot, snapshot)
@@ -1,8 +1,11 @@
 from django.conf.urls import patterns, url
-from .views import CeleryHealthCheckView
+from .views import CeleryHealthCheckView, InfraInfoCacheStatsView
 
 
 urlpatterns = patterns('',
                        url(r"^celery/healthcheck.html",
                            CeleryHealthCheckView, name="celery-healthcheck"),
+                       url(r"^cache/infra_info/stats/$",
+                           InfraInfoCacheStatsView,
+                           name="infra-info-cache-stats"),
                        )
@@ -1,6 +1,13 @@
 from django.http import HttpResponse
+from util import as_json
 from models import CeleryHealthCheck
 
 
 def CeleryHealthCheckView(request):
     return HttpResponse(CeleryHealthCheck.get_healthcheck_string())
+
+
+@as_json
+def InfraInfoCacheStatsView(request):
+    from physical.models import INFRA_INFO_CACHE
+    return INFRA_INFO_CACHE.stats()
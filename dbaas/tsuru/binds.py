@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import logging
+from collections import Counter
+from django.db import connection, transaction
+from django.db import IntegrityError, OperationalError
+from dbaas_aclapi.models import DatabaseBind
+from dbaas_aclapi.models import DESTROYING, CREATED, CREATING
+
+LOG = logging.getLogger(__name__)
+
+MYSQL_DEADLOCK = 1213
+DEADLOCK_RETRIES = 3
+
+
+class BindError(Exception):
+
+    """ A bind can not be changed, nothing was changed by the request """
+    pass
+
+
+def _lock_binds(database, bind_addresses):
+    binds = DatabaseBind.objects.select_for_update().filter(
+        database=database, bind_address__in=bind_addresses
+    )
+    return dict((bind.bind_address, bind) for bind in binds)
+
+
+def _retry_on_deadlock(function, *args):
+    """ Runs the transaction of function again when MySQL chooses it as
+    the victim of a deadlock with a concurrent request. Inside an outer
+    transaction, rolled back by the deadlock, the error is raised. """
+    for attempt in range(1, DEADLOCK_RETRIES + 1):
+        try:
+            return function(*args)
+        except OperationalError as e:
+            if (e.args[0] != MYSQL_DEADLOCK or attempt == DEADLOCK_RETRIES or
+                    connection.in_atomic_block):
+                raise
+            LOG.warning("Deadlock changing binds, attempt {} of {}".format(
+                attempt, DEADLOCK_RETRIES
+            ))
+
+
+def bind_unit_networks(database, unit_networks):
+    """
+    Adds one bind request for each unit network, in one transaction.
+    Units on the same network share its DatabaseBind, so each network is
+    changed once. Returns the binds created, which still need their acls.
+    """
+    return _retry_on_deadlock(
+        _bind_unit_networks, database, Counter(unit_networks)
+    )
+
+
+def _bind_unit_networks(database, requested):
+    created = []
+    existing = []
+
+    with transaction.atomic():
+        # Inserting before locking avoids the gap locks select_for_update
+        # takes for missing binds, the same network bound by concurrent
+        # requests would deadlock on them
+        for bind_address in sorted(requested):
+            try:
+                with transaction.atomic():
+                    created.append(DatabaseBind.objects.create(
+                        database=database, bind_address=bind_address,
+                        binds_requested=requested[bind_address]
+                    ))
+            except IntegrityError as e:
+                LOG.info("IntegrityError: {}".format(e))
+                existing.append(bind_address)
+
+        binds = _lock_binds(database, existing) if existing else {}
+        for bind_address in existing:
+            bind = binds[bind_address]
+            count = requested[bind_address]
+            if bind.bind_status not in [CREATED, CREATING]:
+                raise BindError(
+                    "We are destroying your binds to {}. Please wait.".format(
+                        database.name
+                    )
+                )
+
+            bind.binds_requested += count
+            bind.save()
+
+    return created
+
+
+def unbind_unit_networks(database, unit_networks):
+    """
+    Removes one bind request for each unit network, in one transaction.
+    Returns the binds without requests, whose acls must be removed.
+    """
+    return _retry_on_deadlock(
+        _unbind_unit_networks, database, Counter(unit_networks)
+    )
+
+
+def _unbind_unit_networks(database, requested):
+    destroyed = []
+
+    with transaction.atomic():
+        binds = _lock_binds(database, requested.keys())
+        for bind_address, count in requested.items():
+            bind = binds.get(bind_address)
+            if bind is None:
+                raise BindError("DatabaseBind does not exist")
+
+            if bind.bind_status == CREATING:
+                raise BindError(
+                    "Bind for {} has not yet been created!".format(
+                        bind_address
+                    )
+                )
+
+            if bind.bind_status == DESTROYING:
+                continue
+
+            bind.binds_requested = max(bind.binds_requested - count, 0)
+            if bind.binds_requested == 0:
+                bind.bind_status = DESTROYING
+                destroyed.append(bind)
+            bind.save()
+
+    return destroyed
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import hashlib
+import json
+import logging
+from rest_framework import status
+from rest_framework.response import Response
+from util.shared_cache import SharedCache
+
+LOG = logging.getLogger(__name__)
+
+# Entries are removed by the post_save signals of Database, Plan and
+# TaskHistory, timeouts only bound changes made without signals
+PLANS_CACHE = SharedCache('tsuru_plans', timeout=60, stale_timeout=0)
+STATUS_CACHE = SharedCache('tsuru_status', timeout=5, stale_timeout=0)
+INFO_CACHE = SharedCache('tsuru_info', timeout=30, stale_timeout=0)
+
+
+def database_key(environment, database_name):
+    return '{}:{}'.format(environment, database_name)
+
+
+def build_etag(data, http_status):
+    content = json.dumps([http_status, data], sort_keys=True)
+    return '"{}"'.format(hashlib.md5(content).hexdigest())
+
+
+def etag_matches(request, etag):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if not if_none_match:
+        return False
+
+    etags = [value.strip() for value in if_none_match.split(',')]
+    return etag in etags or '*' in etags
+
+
+def cached_response(request, cache, key, loader):
+    """
+    Returns the response cached for key, loader returns the data and the
+    http status of the response when it is not cached. When If-None-Match
+    has the ETag of the cached response a 304 without body is returned.
+    """
+    def load():
+        data, http_status = loader()
+        return {
+            'data': data,
+            'status': http_status,
+            'etag': build_etag(data, http_status),
+        }
+
+    entry = cache.get(key, load)
+    if etag_matches(request, entry['etag']):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(entry['data'], status=entry['status'])
+
+    response['ETag'] = entry['etag']
+    return response
+
+
+def _environments(*environments):
+    from system.models import Configuration
+
+    names = set(Configuration.get_by_name_as_list('dev_envs'))
+    names.update(Configuration.get_by_name_as_list('prod_envs'))
+    names.update(environment for environment in environments if environment)
+    return names
+
+
+def invalidate_database_status(database_name, *environments):
+    """ Prod databases are found from any prod environment, so every
+    configured environment is invalidated """
+    for environment in _environments(*environments):
+        STATUS_CACHE.delete(database_key(environment, database_name))
+
+
+def invalidate_database(database_name, *environments):
+    for environment in _environments(*environments):
+        key = database_key(environment, database_name)
+        STATUS_CACHE.delete(key)
+        INFO_CACHE.delete(key)
+
+
+def invalidate_plans(*environments):
+    for environment in _environments(*environments):
+        PLANS_CACHE.delete(environment)
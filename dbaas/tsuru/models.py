@@ -5,8 +5,14 @@ import logging
 from django.db import models
 from django.core.exceptions import ValidationError
 from django.utils.translation import ugettext_lazy as _
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from util.models import BaseModel
+from logical.models import Database
+from notification.models import TaskHistory
+from physical.models import Plan
+from .cache import invalidate_database, invalidate_database_status
+from .cache import invalidate_plans
 
 LOG = logging.getLogger(__name__)
 
@@ -24,3 +30,23 @@ class Bind(BaseModel):
         return "%s" % self.service_name
 
 simple_audit.register(Bind)
+
+
+@receiver(post_save, sender=Database)
+@receiver(post_delete, sender=Database)
+def database_changed(sender, instance, **kwargs):
+    invalidate_database(instance.name, instance.environment.name)
+
+
+@receiver(post_save, sender=TaskHistory)
+def task_history_changed(sender, instance, **kwargs):
+    if instance.database_name:
+        invalidate_database_status(
+            instance.database_name, instance.environment
+        )
+
+
+@receiver(post_save, sender=Plan)
+@receiver(m2m_changed, sender=Plan.environments.through)
+def plan_changed(sender, instance, **kwargs):
+    invalidate_plans()
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import logging
+import threading
+import time
+from networkapiclient import Ip, Network
+from util import get_credentials_for
+from util.shared_cache import SharedCache
+
+LOG = logging.getLogger(__name__)
+
+LOCAL_TIMEOUT = 60
+
+# Networks of unit ips barely change, ips not found are retried after
+# negative_timeout and a known network is kept while NetworkAPI fails
+NETWORK_CACHE = SharedCache(
+    'unit_network', timeout=60 * 60, stale_timeout=10 * 60,
+    negative_timeout=60, keep_stale_on_error=True
+)
+
+_local_networks = {}
+_local_lock = threading.Lock()
+
+
+class UnitNetworkNotFound(Exception):
+
+    """ The network of a unit ip could not be resolved by NetworkAPI """
+    pass
+
+
+def network_cidr(network):
+    return '{}.{}.{}.{}/{}'.format(
+        network['oct1'], network['oct2'], network['oct3'], network['oct4'],
+        network['block']
+    )
+
+
+class UnitNetworkResolver(object):
+
+    """
+    Resolves the network, in CIDR notation, of tsuru unit ips using the
+    NetworkAPI of environment. Networks are cached by the process for
+    unit_network_local_cache_timeout seconds and shared by every process
+    through NETWORK_CACHE. Errors are cached as not found for the
+    unit_network_cache_negative_timeout seconds.
+    """
+
+    def __init__(self, environment):
+        self.environment = environment
+        self._credentials = None
+
+    @property
+    def credentials(self):
+        if self._credentials is None:
+            from dbaas_credentials.models import CredentialType
+            self._credentials = get_credentials_for(
+                environment=self.environment,
+                credential_type=CredentialType.NETWORKAPI
+            )
+        return self._credentials
+
+    @property
+    def local_timeout(self):
+        from system.models import Configuration
+        return Configuration.get_by_name_as_int(
+            'unit_network_local_cache_timeout', default=LOCAL_TIMEOUT
+        )
+
+    def __key(self, ip):
+        return '{}:{}'.format(self.environment.name, ip)
+
+    def __load(self, ip, credentials):
+        ip_client = Ip.Ip(
+            credentials.endpoint, credentials.user, credentials.password
+        )
+        ips = ip_client.get_ipv4_or_ipv6(ip)['ips']
+        if type(ips) != list:
+            ips = [ips]
+
+        network_client = Network.Network(
+            credentials.endpoint, credentials.user, credentials.password
+        )
+        network = network_client.get_network_ipv4(ips[0]['networkipv4'])
+        return network_cidr(network['network'])
+
+    def __not_found(self, ip, error):
+        LOG.warn("Could not resolve network of {}: {}".format(ip, error))
+        return None
+
+    def __local_get(self, key):
+        with _local_lock:
+            expires_at, network = _local_networks.get(key, (0, None))
+            if expires_at > time.time():
+                return network
+            _local_networks.pop(key, None)
+
+    def __local_set(self, key, network):
+        with _local_lock:
+            _local_networks[key] = (time.time() + self.local_timeout, network)
+
+    def resolve(self, ip):
+        key = self.__key(ip)
+        network = self.__local_get(key)
+        if network:
+            return network
+
+        credentials = self.credentials
+        network = NETWORK_CACHE.get(
+            key, loader=lambda: self.__load(ip, credentials),
+            fallback=lambda error: self.__not_found(ip, error)
+        )
+        if not network:
+            raise UnitNetworkNotFound(
+                "Network of {} not found on NetworkAPI".format(ip)
+            )
+
+        self.__local_set(key, network)
+        return network
+
+    def resolve_many(self, ips, max_workers=None):
+        """
+        Resolves the network of each ip, the ips not cached are resolved
+        in parallel. Returns a dict of ip to network and a dict of ip to
+        the error resolving it.
+        """
+        from system.models import Configuration
+        from util.parallel import run_in_parallel, DEFAULT_MAX_WORKERS
+
+        if max_workers is None:
+            max_workers = Configuration.get_by_name_as_int(
+                'unit_network_max_workers', default=DEFAULT_MAX_WORKERS
+            )
+
+        # Credentials are read once, before the threads are started
+        self.credentials
+        networks, errors = {}, {}
+        for result in run_in_parallel(
+            self.resolve, sorted(set(ips)), max_workers=max_workers
+        ):
+            if result.error:
+                errors[result.item] = result.error
+            else:
+                networks[result.item] = result.result
+        return networks, errors
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import logging
+from dbaas.celery import app
+from dbaas_aclapi.tasks import bind_address_on_database
+from dbaas_aclapi.tasks import unbind_address_on_database
+
+LOG = logging.getLogger(__name__)
+
+
+@app.task(bind=True)
+def bind_addresses_on_database(self, database_binds, user=None):
+    """ Creates the acls of many binds of one database in a single job,
+    instead of one job for each unit bind """
+    for database_bind in database_binds:
+        LOG.info("Binding {}".format(database_bind))
+        bind_address_on_database.apply(
+            kwargs={'database_bind': database_bind, 'user': user}
+        )
+
+
+@app.task(bind=True)
+def unbind_addresses_on_database(self, database_binds, user=None):
+    """ Removes the acls of many binds of one database in a single job """
+    for database_bind in database_binds:
+        LOG.info("Unbinding {}".format(database_bind))
+        unbind_address_on_database.apply(
+            kwargs={'database_bind': database_bind, 'user': user}
+        )
@@ -0,0 +1,101 @@
+from __future__ import absolute_import
+from mock import Mock, patch
+from django.db import OperationalError
+from django.test import TestCase
+from dbaas_aclapi.models import DatabaseBind, CREATED, CREATING, DESTROYING
+from logical.tests.factory import DatabaseFactory
+from notification.tests.factory import DatabaseBindFactory
+from tsuru.binds import bind_unit_networks, unbind_unit_networks, BindError
+from tsuru.binds import _retry_on_deadlock, MYSQL_DEADLOCK
+
+
+class BindUnitNetworksTestCase(TestCase):
+
+    def setUp(self):
+        self.database = DatabaseFactory()
+
+    def test_creates_one_bind_by_network(self):
+        created = bind_unit_networks(
+            self.database, ['10.0.1.0/24', '10.0.1.0/24', '10.0.2.0/24']
+        )
+
+        self.assertEqual(len(created), 2)
+        bind = DatabaseBind.objects.get(
+            database=self.database, bind_address='10.0.1.0/24'
+        )
+        self.assertEqual(bind.binds_requested, 2)
+
+    def test_increments_existing_bind(self):
+        bind = DatabaseBindFactory(
+            database=self.database, bind_address='10.0.1.0/24',
+            bind_status=CREATED, binds_requested=1
+        )
+
+        created = bind_unit_networks(self.database, ['10.0.1.0/24'] * 3)
+        self.assertEqual(created, [])
+        self.assertEqual(
+            DatabaseBind.objects.get(id=bind.id).binds_requested, 4
+        )
+
+    def test_nothing_changes_when_bind_is_destroying(self):
+        DatabaseBindFactory(
+            database=self.database, bind_address='10.0.1.0/24',
+            bind_status=DESTROYING
+        )
+
+        self.assertRaises(
+            BindError, bind_unit_networks, self.database,
+            ['10.0.2.0/24', '10.0.1.0/24']
+        )
+        self.assertFalse(DatabaseBind.objects.filter(
+            bind_address='10.0.2.0/24'
+        ).exists())
+
+
+class UnbindUnitNetworksTestCase(TestCase):
+
+    def setUp(self):
+        self.database = DatabaseFactory()
+        self.bind = DatabaseBindFactory(
+            database=self.database, bind_address='10.0.1.0/24',
+            bind_status=CREATED, binds_requested=3
+        )
+
+    def test_destroys_bind_without_requests(self):
+        destroyed = unbind_unit_networks(self.database, ['10.0.1.0/24'] * 3)
+
+        self.assertEqual(destroyed, [self.bind])
+        bind = DatabaseBind.objects.get(id=self.bind.id)
+        self.assertEqual(bind.binds_requested, 0)
+        self.assertEqual(bind.bind_status, DESTROYING)
+
+    def test_decrements_bind(self):
+        destroyed = unbind_unit_networks(self.database, ['10.0.1.0/24'])
+        self.assertEqual(destroyed, [])
+        self.assertEqual(
+            DatabaseBind.objects.get(id=self.bind.id).binds_requested, 2
+        )
+
+    def test_bind_being_created(self):
+        self.bind.bind_status = CREATING
+        self.bind.save()
+
+        self.assertRaises(
+            BindError, unbind_unit_networks, self.database, ['10.0.1.0/24']
+        )
+
+
+@patch('tsuru.binds.connection', Mock(in_atomic_block=False))
+class RetryOnDeadlockTestCase(TestCase):
+
+    def test_retries_deadlock(self):
+        function = Mock(side_effect=[
+            OperationalError(MYSQL_DEADLOCK, 'Deadlock found'), 'binds'
+        ])
+        self.assertEqual(_retry_on_deadlock(function, 'database'), 'binds')
+        self.assertEqual(function.call_count, 2)
+
+    def test_other_errors_are_raised(self):
+        function = Mock(side_effect=OperationalError(2006, 'Gone away'))
+        self.assertRaises(OperationalError, _retry_on_deadlock, function)
+        self.assertEqual(function.call_count, 1)
@@ -0,0 +1,73 @@
+from __future__ import absolute_import
+import mock
+from django.test import TestCase
+from rest_framework import status
+from notification.tests.factory import TaskHistoryFactory
+from util.shared_cache import SharedCache
+from util.tests.test_shared_cache import FakeRedis
+from tsuru.cache import cached_response, database_key
+
+
+class CachedResponseTestCase(TestCase):
+
+    def setUp(self):
+        self.cache = SharedCache('test', client=FakeRedis())
+        self.loader = mock.Mock(
+            return_value=({'used_size_in_bytes': '10'}, status.HTTP_200_OK)
+        )
+
+    def request(self, etag=None):
+        request = mock.Mock()
+        request.META = {}
+        if etag:
+            request.META['HTTP_IF_NONE_MATCH'] = etag
+        return request
+
+    def test_caches_response(self):
+        first = cached_response(self.request(), self.cache, 'key', self.loader)
+        second = cached_response(self.request(), self.cache, 'key', self.loader)
+
+        self.assertEqual(self.loader.call_count, 1)
+        self.assertEqual(first.data, {'used_size_in_bytes': '10'})
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_not_modified(self):
+        etag = cached_response(
+            self.request(), self.cache, 'key', self.loader
+        )['ETag']
+
+        response = cached_response(
+            self.request('"other", {}'.format(etag)), self.cache, 'key',
+            self.loader
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertIsNone(response.data)
+
+    def test_status_changes_etag(self):
+        etag = cached_response(
+            self.request(), self.cache, 'key', self.loader
+        )['ETag']
+
+        self.cache.delete('key')
+        self.loader.return_value = (None, status.HTTP_202_ACCEPTED)
+        response = cached_response(
+            self.request(etag), self.cache, 'key', self.loader
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class InvalidationTestCase(TestCase):
+
+    @mock.patch('tsuru.cache.STATUS_CACHE')
+    def test_task_history_invalidates_status(self, status_cache):
+        TaskHistoryFactory(database_name='test_database', environment='dev')
+        status_cache.delete.assert_any_call(
+            database_key('dev', 'test_database')
+        )
+
+    @mock.patch('tsuru.cache.STATUS_CACHE')
+    def test_task_history_without_database(self, status_cache):
+        TaskHistoryFactory()
+        self.assertFalse(status_cache.delete.called)
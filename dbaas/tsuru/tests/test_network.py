@@ -0,0 +1,76 @@
+from __future__ import absolute_import
+import mock
+from django.test import TestCase
+from util.shared_cache import SharedCache
+from util.tests.test_shared_cache import FakeRedis
+from tsuru import network
+from tsuru.network import UnitNetworkResolver, UnitNetworkNotFound
+
+
+NETWORK = {
+    'network': {
+        'oct1': '10', 'oct2': '0', 'oct3': '1', 'oct4': '0', 'block': '24'
+    }
+}
+
+
+class UnitNetworkResolverTestCase(TestCase):
+
+    def setUp(self):
+        network._local_networks.clear()
+        self.cache = SharedCache(
+            'test', timeout=60, negative_timeout=60, client=FakeRedis()
+        )
+        self.environment = mock.Mock()
+        self.environment.name = 'dev'
+
+        patches = [
+            mock.patch('tsuru.network.NETWORK_CACHE', self.cache),
+            mock.patch('tsuru.network.get_credentials_for'),
+            mock.patch('tsuru.network.Ip.Ip'),
+            mock.patch('tsuru.network.Network.Network'),
+        ]
+        for patcher in patches:
+            self.addCleanup(patcher.stop)
+        _, _, ip_client, network_client = [p.start() for p in patches]
+
+        self.get_ip = ip_client.return_value.get_ipv4_or_ipv6
+        self.get_ip.return_value = {'ips': {'networkipv4': '1'}}
+        self.get_network = network_client.return_value.get_network_ipv4
+        self.get_network.return_value = NETWORK
+
+    def test_resolves_network(self):
+        resolver = UnitNetworkResolver(self.environment)
+        self.assertEqual(resolver.resolve('10.0.1.5'), '10.0.1.0/24')
+        self.get_network.assert_called_once_with('1')
+
+    def test_caches_network(self):
+        UnitNetworkResolver(self.environment).resolve('10.0.1.5')
+        UnitNetworkResolver(self.environment).resolve('10.0.1.5')
+        self.assertEqual(self.get_ip.call_count, 1)
+
+        network._local_networks.clear()
+        UnitNetworkResolver(self.environment).resolve('10.0.1.5')
+        self.assertEqual(self.get_ip.call_count, 1)
+
+    def test_caches_not_found(self):
+        self.get_ip.side_effect = Exception('IP not found')
+        resolver = UnitNetworkResolver(self.environment)
+
+        self.assertRaises(UnitNetworkNotFound, resolver.resolve, '10.0.1.5')
+        self.assertRaises(UnitNetworkNotFound, resolver.resolve, '10.0.1.5')
+        self.assertEqual(self.get_ip.call_count, 1)
+
+    def test_resolve_many(self):
+        self.get_ip.side_effect = lambda ip: (
+            {'ips': [{'networkipv4': '1'}]} if ip != 'unknown' else {}
+        )
+        resolver = UnitNetworkResolver(self.environment)
+
+        networks, errors = resolver.resolve_many(
+            ['10.0.1.5', '10.0.1.6', '10.0.1.5', 'unknown'], max_workers=2
+        )
+        self.assertEqual(
+            networks, {'10.0.1.5': '10.0.1.0/24', '10.0.1.6': '10.0.1.0/24'}
+        )
+        self.assertIsInstance(errors['unknown'], UnitNetworkNotFound)
@@ -2,7 +2,8 @@
 from django.conf.urls import *
 from django.conf import settings
 from views import (ListPlans, GetServiceStatus, GetServiceInfo, ServiceAdd,
-                   ServiceAppBind, ServiceUnitBind, ServiceRemove)
+                   ServiceAppBind, ServiceUnitBind, ServiceUnitBinds,
+                   ServiceRemove)
 
 urlpatterns = patterns('tsuru.views',
                        url(r'^resources/plans$', ListPlans.as_view()),
@@ -15,6 +16,8 @@ urlpatterns = patterns('tsuru.views',
                            ServiceRemove.as_view()),
                        url(r'^resources/(?P<database_name>\w+)/bind$',
                            ServiceUnitBind.as_view()),
+                       url(r'^resources/(?P<database_name>\w+)/binds$',
+                           ServiceUnitBinds.as_view()),
                        url(r'^resources/(?P<database_name>\w+)/bind-app$',
                            ServiceAppBind.as_view()),
                        )
@@ -12,22 +12,22 @@ from notification.models import TaskHistory
 from notification.tasks import create_database
 from dbaas_aclapi.tasks import bind_address_on_database
 from dbaas_aclapi.tasks import unbind_address_on_database
-from dbaas_aclapi.models import DatabaseBind
-from dbaas_aclapi.models import DESTROYING, CREATED, CREATING
 from dbaas_credentials.models import CredentialType
 from django.core.exceptions import MultipleObjectsReturned
-from django.db import transaction
-from django.db import IntegrityError
-from django.db.models import Q
 from django.core.exceptions import ObjectDoesNotExist
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.renderers import JSONRenderer, JSONPRenderer
 from rest_framework.response import Response
 import requests
-from networkapiclient import Ip, Network
 from logical.validators import database_name_evironment_constraint
 from system import models
+from tsuru.cache import cached_response, database_key
+from tsuru.cache import PLANS_CACHE, STATUS_CACHE, INFO_CACHE
+from tsuru.network import UnitNetworkResolver
+from tsuru.binds import bind_unit_networks, unbind_unit_networks, BindError
+from tsuru.tasks import bind_addresses_on_database
+from tsuru.tasks import unbind_addresses_on_database
 
 
 LOG = logging.getLogger(__name__)
@@ -38,14 +38,20 @@ class ListPlans(APIView):
     model = Plan
 
     def get(self, request, format=None):
+        env = get_url_env(request)
+        return cached_response(
+            request, PLANS_CACHE, env, lambda: self.load_plans(env)
+        )
+
+    def load_plans(self, env):
         hard_plans = Plan.objects.filter(
-            environments__name=get_url_env(request)
+            environments__name=env
         ).values(
             'name', 'description', 'environments__name'
         ).extra(
             where=['is_active=True', 'provider={}'.format(Plan.CLOUDSTACK)]
         )
-        return Response(get_plans_dict(hard_plans))
+        return get_plans_dict(hard_plans), status.HTTP_200_OK
 
 
 class GetServiceStatus(APIView):
@@ -54,6 +60,12 @@ class GetServiceStatus(APIView):
 
     def get(self, request, database_name, format=None):
         env = get_url_env(request)
+        return cached_response(
+            request, STATUS_CACHE, database_key(env, database_name),
+            lambda: self.load_status(database_name, env)
+        )
+
+    def load_status(self, database_name, env):
         LOG.info("Database name {}. Environment {}".format(
             database_name, env)
         )
@@ -67,9 +79,8 @@ class GetServiceStatus(APIView):
             )
 
         LOG.info("Status = {}".format(database_status))
-        task = TaskHistory.objects.filter(
-            Q(arguments__contains=database_name) &
-            Q(arguments__contains=env), task_status="RUNNING"
+        task = TaskHistory.database_tasks(
+            database_name, env
         ).order_by("created_at")
 
         LOG.info("Task {}".format(task))
@@ -81,7 +92,7 @@ class GetServiceStatus(APIView):
         else:
             database_status = status.HTTP_202_ACCEPTED
 
-        return Response(status=database_status)
+        return None, database_status
 
 
 class GetServiceInfo(APIView):
@@ -90,6 +101,12 @@ class GetServiceInfo(APIView):
 
     def get(self, request, database_name, format=None):
         env = get_url_env(request)
+        return cached_response(
+            request, INFO_CACHE, database_key(env, database_name),
+            lambda: self.load_info(database_name, env)
+        )
+
+    def load_info(self, database_name, env):
         try:
             database = get_database(database_name, env)
             info = {'used_size_in_bytes': str(database.used_size_in_bytes)}
@@ -103,7 +120,7 @@ class GetServiceInfo(APIView):
 
         LOG.info("Info = {}".format(info))
 
-        return Response(info)
+        return info, status.HTTP_200_OK
 
 
 class ServiceAppBind(APIView):
@@ -202,45 +219,15 @@ class ServiceUnitBind(APIView):
         if type(unit_network) == Response:
             return unit_network
 
-        created = False
-        transaction.set_autocommit(False)
-        database_bind = DatabaseBind(
-            database=database, bind_address=unit_network, binds_requested=1
-        )
-
         try:
-            database_bind.save()
-            created = True
-        except IntegrityError as e:
-            LOG.info("IntegrityError: {}".format(e))
-
-            try:
-                db_bind = DatabaseBind.objects.get(database=database,
-                                                   bind_address=unit_network)
-
-                bind = DatabaseBind.objects.select_for_update().filter(
-                    id=db_bind.id)[0]
-                if bind.bind_status in [CREATED, CREATING]:
-                    bind.binds_requested += 1
-                    bind.save()
-                else:
-                    raise Exception("Binds are beeing destroyed!")
-            except Exception as e:
-                LOG.debug("DatabaseBind is under destruction! {}".format(e))
-                msg = "We are destroying your binds to {}. Please wait.".format(
-                    database_name
-                )
-                return log_and_response(
-                    msg=msg, e=e,
-                    http_status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-
-        finally:
-            LOG.debug("Finishing transaction!")
-            transaction.commit()
-            transaction.set_autocommit(True)
+            created = bind_unit_networks(database, [unit_network])
+        except BindError as e:
+            return log_and_response(
+                msg=str(e), e=e,
+                http_status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
 
-        if created:
+        for database_bind in created:
             bind_address_on_database.delay(
                 database_bind=database_bind,
                 user=request.user
@@ -262,53 +249,108 @@ class ServiceUnitBind(APIView):
         if type(unit_network) == Response:
             return unit_network
 
-        transaction.set_autocommit(False)
-
         try:
-            db_bind = DatabaseBind.objects.get(
-                database=database, bind_address=unit_network
+            destroyed = unbind_unit_networks(database, [unit_network])
+        except BindError as e:
+            return log_and_response(
+                msg=str(e), e=e,
+                http_status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-            database_bind = DatabaseBind.objects.select_for_update().filter(
-                id=db_bind.id
-            )[0]
+        for database_bind in destroyed:
+            unbind_address_on_database.delay(
+                database_bind=database_bind, user=request.user
+            )
 
-            if database_bind.bind_status == CREATING:
-                raise Exception(
-                    "Bind for {} has not yet been created!".format(
-                        unit_network
-                    )
-                )
+        return Response(status.HTTP_204_NO_CONTENT)
+
+
+class ServiceUnitBinds(APIView):
 
-            if database_bind.bind_status != DESTROYING:
-                if database_bind.binds_requested > 0:
-                    database_bind.binds_requested -= 1
+    """
+    Binds or unbinds every unit host of an app in one call. Hosts are
+    grouped by network, the binds are changed in one transaction and the
+    acls of the database are changed by a single job.
+    """
 
-                if database_bind.binds_requested == 0:
-                    database_bind.bind_status = DESTROYING
+    renderer_classes = (JSONRenderer, JSONPRenderer)
+    model = Database
 
-                database_bind.save()
-        except (IndexError, ObjectDoesNotExist) as e:
-            msg = "DatabaseBind does not exist"
+    def resolve_unit_networks(self, request, database_name):
+        env = get_url_env(request)
+
+        database = check_database_status(database_name, env)
+        if type(database) != Database:
+            return database, None
+
+        data = request.DATA
+        LOG.debug("Request DATA {}".format(data))
+
+        unit_hosts = get_unit_hosts(data)
+        if not unit_hosts:
             return log_and_response(
-                msg=msg, e=e, http_status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                msg="No unit-hosts informed.",
+                http_status=status.HTTP_400_BAD_REQUEST
+            ), None
+
+        response = check_acl_service(database)
+        if response is not None:
+            return response, None
+
+        resolver = UnitNetworkResolver(database.environment)
+        networks, errors = resolver.resolve_many(unit_hosts)
+        if errors:
+            msg = "We are experiencing errors with the network api, please try again later"
+            return log_and_response(
+                msg=msg, e=errors.values()[0],
+                http_status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            ), None
+
+        return database, [networks[unit_host] for unit_host in unit_hosts]
+
+    def post(self, request, database_name, format=None):
+        database, unit_networks = self.resolve_unit_networks(
+            request, database_name
+        )
+        if type(database) != Database:
+            return database
+
+        try:
+            created = bind_unit_networks(database, unit_networks)
+        except BindError as e:
+            return log_and_response(
+                msg=str(e), e=e,
+                http_status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-        except Exception as e:
-            msg = "Bind for {} has not yet been created!".format(unit_network)
+
+        if created:
+            bind_addresses_on_database.delay(
+                database_binds=created, user=request.user
+            )
+
+        return Response(None, status.HTTP_201_CREATED)
+
+    def delete(self, request, database_name, format=None):
+        database, unit_networks = self.resolve_unit_networks(
+            request, database_name
+        )
+        if type(database) != Database:
+            return database
+
+        try:
+            destroyed = unbind_unit_networks(database, unit_networks)
+        except BindError as e:
             return log_and_response(
-                msg=msg, e=e, http_status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                msg=str(e), e=e,
+                http_status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-        finally:
-            LOG.debug("Finishing transaction!")
-            transaction.commit()
-            transaction.set_autocommit(True)
 
-        if database_bind.binds_requested == 0:
-            unbind_address_on_database.delay(
-                database_bind=database_bind, user=request.user
+        if destroyed:
+            unbind_addresses_on_database.delay(
+                database_binds=destroyed, user=request.user
             )
 
-        return Response(status.HTTP_204_NO_CONTENT)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class ServiceAdd(APIView):
@@ -468,6 +510,12 @@ class ServiceRemove(APIView):
         return Response(status.HTTP_204_NO_CONTENT)
 
 
+def get_unit_hosts(data):
+    if hasattr(data, 'getlist'):
+        return data.getlist('unit-hosts')
+    return data.get('unit-hosts') or []
+
+
 def get_plans_dict(hard_plans):
     plans = []
     for hard_plan in hard_plans:
@@ -491,10 +539,7 @@ def log_and_response(msg, http_status, e="Conditional Error."):
 
 
 def check_database_status(database_name, env):
-    task = TaskHistory.objects.filter(
-        arguments__contains="Database: {}, Environment: {}".format(
-            database_name, env
-        ), task_status="RUNNING")
+    task = TaskHistory.database_tasks(database_name, env)
 
     LOG.info("Task {}".format(task))
     if task:
@@ -529,31 +574,7 @@ def check_database_status(database_name, env):
 
 
 def get_network_from_ip(ip, database_environment):
-    net_api_credentials = get_credentials_for(
-        environment=database_environment,
-        credential_type=CredentialType.NETWORKAPI
-    )
-
-    ip_client = Ip.Ip(
-        net_api_credentials.endpoint, net_api_credentials.user,
-        net_api_credentials.password
-    )
-
-    ips = ip_client.get_ipv4_or_ipv6(ip)
-    ips = ips['ips']
-    if type(ips) != list:
-        ips = [ips]
-
-    net_ip = ips[0]
-    network_client = Network.Network(
-        net_api_credentials.endpoint, net_api_credentials.user,
-        net_api_credentials.password
-    )
-
-    network = network_client.get_network_ipv4(net_ip['networkipv4'])
-    network = network['network']
-
-    return network['oct1'] + '.' + network['oct2'] + '.' + network['oct3'] + '.' + network['oct4'] + '/' + network['block']
+    return UnitNetworkResolver(database_environment).resolve(ip)
 
 
 def get_database(name, env):
@@ -570,7 +591,7 @@ def get_database(name, env):
     return database
 
 
-def check_acl_service_and_get_unit_network(database, data):
+def check_acl_service(database):
     acl_credential = get_credentials_for(
         environment=database.environment,
         credential_type=CredentialType.ACLAPI
@@ -604,6 +625,12 @@ def check_acl_service_and_get_unit_network(database, data):
     except Exception as e:
         LOG.warn(e)
 
+
+def check_acl_service_and_get_unit_network(database, data):
+    response = check_acl_service(database)
+    if response is not None:
+        return response
+
     try:
         return get_network_from_ip(
             data.get('unit-host'), database.environment
@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals
-from time import sleep
 import paramiko
 import socket
 import re
@@ -10,8 +9,10 @@ from django.http import HttpResponse
 import json
 import logging
 import subprocess
-import signal
 import os
+import signal
+import threading
+from collections import deque
 import traceback
 import sys
 from billiard import current_process
@@ -24,14 +25,7 @@ LOG = logging.getLogger(__name__)
 # have questions about this variable
 DEFAULT_OUTPUT_BUFFER_SIZE = 16384
 PROCESS_TIMEOUT = 4 * 60 * 60  # 4 horas
-
-
-class AlarmException(Exception):
-    pass
-
-
-def alarm_handler(signum, frame):
-    raise AlarmException
+MAX_OUTPUT_SIZE = 1024 * 1024
 
 
 def slugify(string):
@@ -55,7 +49,14 @@ def as_json(f):
 
 
 def call_script(script_name, working_dir=None, split_lines=True, args=[],
-                envs={}, shell=False, python_bin=None):
+                envs={}, shell=False, python_bin=None, timeout=PROCESS_TIMEOUT,
+                output_callback=None, max_output_size=MAX_OUTPUT_SIZE):
+    """
+    Runs script_name reading its output while it runs. Each output line is
+    passed to output_callback, when given, as soon as it is written. Only
+    the last max_output_size characters of the output are returned and
+    the script is killed after timeout seconds.
+    """
 
     args_copy = []
     for arg in args:
@@ -83,12 +84,6 @@ def call_script(script_name, working_dir=None, split_lines=True, args=[],
         if envs:
             envs_with_path.update(envs)
 
-        # For future, if scripts have lot of output can be better
-        # create a temporary file for stdout. Scripts with lot
-        # of output and subprocess.PIPE
-        # can lock because this method not consume stdout without script finish
-        # execute.
-
         LOG.info("Args: {}".format(args))
 
         if python_bin:
@@ -106,20 +101,46 @@ def call_script(script_name, working_dir=None, split_lines=True, args=[],
             cwd=working_dir,
             env=envs_with_path,
             universal_newlines=True,
-            shell=shell)
+            shell=shell,
+            preexec_fn=os.setsid)
 
-        if not shell:
-            signal.signal(signal.SIGALRM, alarm_handler)
-            signal.alarm(PROCESS_TIMEOUT)
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except OSError:
+                pass
+
+        timer = threading.Timer(timeout, kill)
+        timer.daemon = True
+        timer.start()
+
+        lines = deque()
+        size = 0
         try:
+            for line in iter(process.stdout.readline, ''):
+                if output_callback:
+                    try:
+                        output_callback(line.rstrip('\n'))
+                    except Exception:
+                        LOG.warning('Could not handle output line',
+                                    exc_info=True)
+
+                lines.append(line)
+                size += len(line)
+                while size > max_output_size and len(lines) > 1:
+                    size -= len(lines.popleft())
             process.wait()
-            signal.alarm(0)  # Disable the alarm
-        except AlarmException:
+        finally:
+            timer.cancel()
+
+        if timed_out.is_set():
             LOG.error("Timeout %s exceeded for process id %s" %
-                      (PROCESS_TIMEOUT, process.pid))
-            process.kill()
+                      (timeout, process.pid))
 
-        output = process.stdout.read()
+        output = ''.join(lines)
         return_code = process.returncode
 
         LOG.debug("output: {} \n return_code: {}".format(output, return_code))
@@ -139,23 +160,24 @@ def call_script(script_name, working_dir=None, split_lines=True, args=[],
 
 
 def check_nslookup(dns_to_check, dns_server, retries=90, wait=10):
-    try:
-        LOG.info("Cheking dns...")
-        for attempt in range(0, retries):
-            LOG.info("Cheking dns... attempt number %s..." % str(attempt + 1))
+    from util.wait import wait_until
 
-            result = subprocess.Popen("nslookup %s %s" % (
-                dns_to_check, dns_server), stdout=subprocess.PIPE, shell=True)
-            (output, err) = result.communicate()
-            indexes = [i for i, x in enumerate(output.split('\n')) if re.match(
-                r'\W*' + "Address" + r'\W*', x)]
+    def dns_is_available():
+        result = subprocess.Popen("nslookup %s %s" % (
+            dns_to_check, dns_server), stdout=subprocess.PIPE, shell=True)
+        (output, err) = result.communicate()
+        indexes = [i for i, x in enumerate(output.split('\n')) if re.match(
+            r'\W*' + "Address" + r'\W*', x)]
 
-            LOG.info("Nslookup output: %s" % output)
+        LOG.info("Nslookup output: %s" % output)
+        return len(indexes) == 2
 
-            if len(indexes) == 2:
-                LOG.info("%s is available!" % dns_to_check)
-                return True
-            sleep(wait)
+    try:
+        LOG.info("Cheking dns...")
+        if wait_until(dns_is_available, timeout=retries * wait,
+                      max_interval=wait, name='nslookup'):
+            LOG.info("%s is available!" % dns_to_check)
+            return True
 
         return False
     except Exception as e:
@@ -222,24 +244,17 @@ def get_mongodb_key_file(infra):
 
 
 def exec_remote_command(server, username, password, command, output={}):
+    from util.ssh import get_ssh_pool
 
     try:
         LOG.info(
             "Executing command [%s] on remote server %s" % (command, server))
-        client = paramiko.SSHClient()
-        client.load_system_host_keys()
-        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        client.connect(server, username=username, password=password)
-
-        stdin, stdout, stderr = client.exec_command(command)
-        log_stdout = stdout.readlines()
-        log_stderr = stderr.readlines()
-        exit_status = stdout.channel.recv_exit_status()
-        LOG.info("Comand return code: %s, stdout: %s, stderr %s" %
-                 (exit_status, log_stdout, log_stderr))
-        output['stdout'] = log_stdout
-        output['stderr'] = log_stderr
-        return exit_status
+        result = get_ssh_pool().execute(server, username, password, command)
+        LOG.info("Comand return code: %s, stdout: %s, stderr %s, elapsed %.2fs" %
+                 (result.exit_status, result.stdout, result.stderr, result.elapsed))
+        output['stdout'] = result.stdout
+        output['stderr'] = result.stderr
+        return result.exit_status
     except (paramiko.ssh_exception.BadHostKeyException,
             paramiko.ssh_exception.AuthenticationException,
             paramiko.ssh_exception.SSHException,
@@ -250,38 +265,37 @@ def exec_remote_command(server, username, password, command, output={}):
 
 
 def check_ssh(server, username, password, retries=30, wait=30, interval=40):
+    from util.wait import wait_until
+
     username = username
     password = password
     ssh = paramiko.SSHClient()
     ssh.load_system_host_keys()
     ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
 
-    LOG.info("Waiting %s seconds to check %s ssh connection..." %
-             (wait, server))
-    sleep(wait)
-
-    for attempt in range(retries):
-        try:
-
-            LOG.info("Login attempt number %i on %s " % (attempt + 1, server))
-
-            ssh.connect(server, port=22, username=username,
-                        password=password, timeout=None, allow_agent=True,
-                        look_for_keys=True, compress=False)
-            return True
-
-        except (paramiko.ssh_exception.BadHostKeyException,
-                paramiko.ssh_exception.AuthenticationException,
-                paramiko.ssh_exception.SSHException,
-                socket.error) as e:
-
-            if attempt == retries - 1:
-                LOG.error("Maximum number of login attempts : %s ." % (e))
-                return False
+    def ssh_is_available():
+        LOG.info("Login attempt on %s " % server)
+        ssh.connect(server, port=22, username=username,
+                    password=password, timeout=interval, allow_agent=True,
+                    look_for_keys=True, compress=False)
+        return True
 
-            LOG.warning("We caught an exception: %s ." % (e))
-            LOG.info("Wating %i seconds to try again..." % (interval))
-            sleep(interval)
+    LOG.info("Waiting up to %s seconds for %s ssh connection..." %
+             (wait + retries * interval, server))
+    try:
+        return wait_until(
+            ssh_is_available, timeout=wait + retries * interval,
+            initial_interval=5, max_interval=interval, name='ssh',
+            retry_on=(paramiko.ssh_exception.BadHostKeyException,
+                      paramiko.ssh_exception.AuthenticationException,
+                      paramiko.ssh_exception.SSHException,
+                      socket.error)
+        )
+    except (paramiko.ssh_exception.SSHException, socket.error) as e:
+        LOG.error("Maximum number of login attempts : %s ." % (e))
+        return False
+    finally:
+        ssh.close()
 
 
 def get_vm_name(prefix, sufix, vm_number):
@@ -99,6 +99,25 @@ def database_usage(context={}):
                        fail_silently=False, attachments=None, context=context)
 
 
+def database_usage_digest(team, databases, connection=None):
+    """ One email with every database of team over the usage threshold """
+    LOG.info("Notifying usage of {} databases to team {}".format(
+        len(databases), team
+    ))
+    subject = _("[DBAAS] Databases are almost full")
+    template = "database_usage_digest"
+    context = {
+        'team': team,
+        'databases': databases,
+        'measure_unity': "MB",
+        'domain': get_domain(),
+    }
+
+    send_mail_template(subject, template, email_from(), email_to(team),
+                       fail_silently=False, attachments=None, context=context,
+                       connection=connection)
+
+
 def database_analyzing(context={}):
     LOG.info("Notifying Database alayzing with context %s" % context)
     subject = _("[DBAAS] Database overestimated")
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import logging
+import threading
+import time
+from collections import namedtuple
+from django.db import connection
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 10
+# Calls abandoned by timeout still running before new items wait for them
+MAX_ABANDONED_CALLS = 10
+POLL_INTERVAL = 0.5
+
+
+class ParallelTimeout(Exception):
+
+    """ Raised when a call does not finish before its deadline """
+    pass
+
+
+class ParallelCancelled(Exception):
+
+    """ Reported for items not started because a previous call failed """
+    pass
+
+
+ParallelResult = namedtuple(
+    'ParallelResult', ['item', 'result', 'error', 'elapsed']
+)
+
+
+class _Call(threading.Thread):
+
+    def __init__(self, function, item, finished):
+        super(_Call, self).__init__()
+        self.daemon = True
+        self.function = function
+        self.item = item
+        self.finished = finished
+        self.result = None
+        self.error = None
+        self.started_at = None
+        self.ended_at = None
+
+    def run(self):
+        self.started_at = time.time()
+        try:
+            self.result = self.function(self.item)
+        except Exception as e:
+            LOG.warning(
+                "Error running {} for {}: {}".format(
+                    getattr(
+                        self.function, '__name__', repr(self.function)
+                    ), self.item, e
+                ), exc_info=True
+            )
+            self.error = e
+        finally:
+            # Each thread has its own database connection
+            connection.close()
+            self.ended_at = time.time()
+            self.finished.set()
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.ended_at or time.time()) - self.started_at
+
+    @property
+    def is_finished(self):
+        return self.ended_at is not None
+
+
+def run_in_parallel(function, items, max_workers=DEFAULT_MAX_WORKERS,
+                    timeout=None, stop_on_error=False,
+                    max_abandoned=MAX_ABANDONED_CALLS, max_errors=None):
+    """
+    Calls function(item) for every item, at most max_workers at a time.
+    A call running for more than timeout seconds is abandoned and reported
+    with a ParallelTimeout error, releasing its slot for the next item.
+    An abandoned call keeps its thread and database connection until it
+    returns, so while more than max_abandoned of them are alive no item is
+    started; items still waiting for a slot after timeout seconds are
+    reported with a ParallelTimeout error too.
+    With stop_on_error, items not started when a call fails are reported
+    with a ParallelCancelled error, max_errors does the same once more than
+    max_errors calls failed.
+    Returns a ParallelResult for each item, in the same order as items.
+    """
+    items = list(items)
+    max_workers = max(1, max_workers or 1)
+    if stop_on_error:
+        max_errors = 0
+    errors = 0
+    finished = threading.Event()
+    results = [None] * len(items)
+    pending = list(enumerate(items))
+    running = {}
+    abandoned = []
+    blocked_since = None
+
+    while pending or running:
+        abandoned = [call for call in abandoned if not call.is_finished]
+        slots = max_workers - len(running)
+        slots -= max(0, len(abandoned) - max_abandoned)
+        if pending and slots <= 0 and not running:
+            blocked_since = blocked_since or time.time()
+            if timeout and time.time() - blocked_since > timeout:
+                LOG.warning("{} abandoned calls still running, giving up "
+                            "{} items".format(len(abandoned), len(pending)))
+                for pending_index, item in pending:
+                    results[pending_index] = ParallelResult(
+                        item, None,
+                        ParallelTimeout("No worker released in {}s".format(
+                            timeout
+                        )), 0.0
+                    )
+                pending = []
+                break
+        else:
+            blocked_since = None
+
+        while pending and slots > 0:
+            index, item = pending.pop(0)
+            call = _Call(function, item, finished)
+            running[index] = call
+            call.start()
+            slots -= 1
+
+        finished.wait(POLL_INTERVAL)
+        finished.clear()
+
+        for index, call in running.items():
+            if call.is_finished:
+                results[index] = ParallelResult(
+                    call.item, call.result, call.error, call.elapsed
+                )
+            elif timeout and call.elapsed > timeout:
+                LOG.warning("Timeout {}s exceeded for {}".format(
+                    timeout, call.item
+                ))
+                results[index] = ParallelResult(
+                    call.item, None,
+                    ParallelTimeout(
+                        "Timeout {}s exceeded".format(timeout)
+                    ),
+                    call.elapsed
+                )
+                abandoned.append(call)
+            else:
+                continue
+            del running[index]
+
+            if results[index].error:
+                errors += 1
+            if max_errors is not None and errors > max_errors and pending:
+                for pending_index, item in pending:
+                    results[pending_index] = ParallelResult(
+                        item, None,
+                        ParallelCancelled("A previous call failed"), 0.0
+                    )
+                pending = []
+
+    return results
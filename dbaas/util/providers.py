@@ -1,14 +1,15 @@
 import logging
 import re
+from django.db import transaction
 from util import build_dict
 from util import slugify
 from util import get_credentials_for
-from util import get_replication_topology_instance
 from dbaas_credentials.models import CredentialType
 from physical.models import DatabaseInfra
 from logical.models import Database
 from workflow.workflow import stop_workflow
 from workflow.workflow import start_workflow
+from workflow.plan import get_topology_plan
 
 LOG = logging.getLogger(__name__)
 
@@ -18,21 +19,22 @@ def make_infra(
     subscribe_to_email_events=True, task=None, is_protected=False
 ):
     if not plan.provider == plan.CLOUDSTACK:
-        dbinfra = DatabaseInfra.best_for(
-            plan=plan, environment=environment, name=name
-        )
-
-        if dbinfra:
-            database = Database.provision(databaseinfra=dbinfra, name=name)
-            database.team = team
-            database.description = description
-            database.project = project
-            database.subscribe_to_email_events = subscribe_to_email_events
-            database.save()
-
-            return build_dict(
-                databaseinfra=dbinfra, database=database, created=True
+        with transaction.atomic():
+            dbinfra = DatabaseInfra.best_for(
+                plan=plan, environment=environment, name=name
             )
+
+            if dbinfra:
+                database = Database.provision(databaseinfra=dbinfra, name=name)
+                database.team = team
+                database.description = description
+                database.project = project
+                database.subscribe_to_email_events = subscribe_to_email_events
+                database.save()
+
+                return build_dict(
+                    databaseinfra=dbinfra, database=database, created=True
+                )
         return build_dict(databaseinfra=None, created=False)
 
     workflow_dict = build_dict(
@@ -54,20 +56,21 @@ def clone_infra(
         subscribe_to_email_events, task=None, clone=None
 ):
     if not plan.provider == plan.CLOUDSTACK:
-        infra = DatabaseInfra.best_for(
-            plan=plan, environment=environment, name=name)
-
-        if infra:
-            database = Database.provision(databaseinfra=infra, name=name)
-            database.team = team
-            database.description = description
-            database.project = project
-            database.save()
-
-            return build_dict(
-                databaseinfra=infra, database=database, created=True,
-                subscribe_to_email_events=subscribe_to_email_events
-            )
+        with transaction.atomic():
+            infra = DatabaseInfra.best_for(
+                plan=plan, environment=environment, name=name)
+
+            if infra:
+                database = Database.provision(databaseinfra=infra, name=name)
+                database.team = team
+                database.description = description
+                database.project = project
+                database.save()
+
+                return build_dict(
+                    databaseinfra=infra, database=database, created=True,
+                    subscribe_to_email_events=subscribe_to_email_events
+                )
 
         return build_dict(
             databaseinfra=None, created=False,
@@ -88,6 +91,7 @@ def clone_infra(
         description=description,
         clone=clone,
         subscribe_to_email_events=subscribe_to_email_events,
+        task=task,
     )
 
     start_workflow(workflow_dict=workflow_dict, task=task)
@@ -158,31 +162,31 @@ def get_vm_qt(plan):
 
 
 def get_deploy_settings(class_path):
-    return get_replication_topology_instance(class_path).get_deploy_steps()
+    return get_topology_plan(class_path, 'get_deploy_steps').paths
 
 
 def get_clone_settings(class_path):
-    return get_replication_topology_instance(class_path).get_clone_steps()
+    return get_topology_plan(class_path, 'get_clone_steps').paths
 
 
 def get_resize_settings(class_path):
-    return get_replication_topology_instance(class_path).get_resize_steps()
+    return get_topology_plan(class_path, 'get_resize_steps')
 
 
 def get_restore_snapshot_settings(class_path):
-    return get_replication_topology_instance(class_path).get_restore_snapshot_steps()
+    return get_topology_plan(class_path, 'get_restore_snapshot_steps').paths
 
 
 def get_database_upgrade_setting(class_path):
-    return get_replication_topology_instance(class_path).get_upgrade_steps()
+    return get_topology_plan(class_path, 'get_upgrade_steps')
 
 
 def get_add_database_instances_steps(class_path):
-    return get_replication_topology_instance(class_path).get_add_database_instances_steps()
+    return get_topology_plan(class_path, 'get_add_database_instances_steps')
 
 
 def get_remove_readonly_instance_steps(class_path):
-    return get_replication_topology_instance(class_path).get_remove_readonly_instance_steps()
+    return get_topology_plan(class_path, 'get_remove_readonly_instance_steps')
 
 
 def get_engine_credentials(engine, environment):
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import cPickle as pickle
+import logging
+import threading
+import time
+import uuid
+from django.core.cache import cache
+from django.db import connection
+from redis.exceptions import RedisError
+
+LOG = logging.getLogger(__name__)
+
+WAIT_INTERVAL = 0.1
+
+
+class SharedCache(object):
+
+    """
+    Cache shared by every gunicorn and celery process through Redis. When
+    Redis can not be reached it falls back to the local django cache.
+
+    An expired entry is still served for stale_timeout seconds while one
+    background thread, in the whole fleet, reloads it. Concurrent misses of
+    a key wait for the process that is loading it instead of loading it
+    again. Values built by the fallback after a loader error are cached for
+    negative_timeout seconds only. With keep_stale_on_error, a failed
+    background reload keeps serving the stale entry instead, the fallback
+    is then only used when nothing is cached.
+
+    Timeouts are read from the <name>_cache_timeout,
+    <name>_cache_stale_timeout and <name>_cache_negative_timeout
+    configurations.
+    """
+
+    STATS = ('hits', 'stale_hits', 'misses', 'refreshes', 'errors')
+
+    def __init__(self, name, timeout=60, stale_timeout=300,
+                 negative_timeout=10, lock_timeout=60, wait_timeout=10,
+                 keep_stale_on_error=False, client=None):
+        self.name = name
+        self.default_timeout = timeout
+        self.default_stale_timeout = stale_timeout
+        self.default_negative_timeout = negative_timeout
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.keep_stale_on_error = keep_stale_on_error
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from util.decorators import REDIS_CLIENT
+            self._client = REDIS_CLIENT
+        return self._client
+
+    def __setting(self, name, default):
+        from system.models import Configuration
+        return Configuration.get_by_name_as_int(
+            '{}_cache_{}'.format(self.name, name), default=default
+        )
+
+    @property
+    def timeout(self):
+        return self.__setting('timeout', self.default_timeout)
+
+    @property
+    def stale_timeout(self):
+        return self.__setting('stale_timeout', self.default_stale_timeout)
+
+    @property
+    def negative_timeout(self):
+        return self.__setting(
+            'negative_timeout', self.default_negative_timeout)
+
+    def __key(self, key):
+        return 'shared_cache:{}:{}'.format(self.name, key)
+
+    def __lock_key(self, key):
+        return '{}:lock'.format(self.__key(key))
+
+    @property
+    def __stats_key(self):
+        return 'shared_cache:{}:stats'.format(self.name)
+
+    def __read(self, key):
+        try:
+            data = self.client.get(self.__key(key))
+        except RedisError as e:
+            LOG.warning('Shared cache unavailable, using local cache: %s', e)
+            return cache.get(self.__key(key))
+
+        if data is None:
+            return None
+        return pickle.loads(data)
+
+    def __write(self, key, entry, ttl):
+        try:
+            self.client.set(
+                self.__key(key), pickle.dumps(entry, protocol=2), ex=ttl
+            )
+        except RedisError as e:
+            LOG.warning('Shared cache unavailable, using local cache: %s', e)
+            cache.set(self.__key(key), entry, ttl)
+
+    def __lock(self, key):
+        token = uuid.uuid4().hex
+        try:
+            acquired = self.client.set(
+                self.__lock_key(key), token, ex=self.lock_timeout, nx=True
+            )
+        except RedisError:
+            acquired = cache.add(self.__lock_key(key), token, self.lock_timeout)
+        return token if acquired else None
+
+    def __unlock(self, key, token):
+        try:
+            if self.client.get(self.__lock_key(key)) == token:
+                self.client.delete(self.__lock_key(key))
+        except RedisError:
+            if cache.get(self.__lock_key(key)) == token:
+                cache.delete(self.__lock_key(key))
+
+    def __count(self, stat):
+        try:
+            self.client.hincrby(self.__stats_key, stat, 1)
+        except RedisError:
+            pass
+
+    def stats(self):
+        """ Returns the hit, stale hit, miss, refresh and error counters """
+        try:
+            counters = self.client.hgetall(self.__stats_key)
+        except RedisError:
+            counters = {}
+        return dict(
+            (stat, int(counters.get(stat, 0))) for stat in self.STATS
+        )
+
+    def set(self, key, value, negative=False):
+        now = time.time()
+        if negative:
+            timeout = self.negative_timeout
+            ttl = timeout
+        else:
+            timeout = self.timeout
+            ttl = timeout + self.stale_timeout
+
+        entry = {
+            'value': value,
+            'created_at': now,
+            'expires_at': now + timeout,
+        }
+        self.__write(key, entry, ttl)
+
+    def delete(self, key):
+        try:
+            self.client.delete(self.__key(key))
+        except RedisError:
+            cache.delete(self.__key(key))
+
+    def get(self, key, loader, fallback=None, force_refresh=False):
+        """
+        Returns the value cached for key, calling loader() to build it.
+        When loader raises, fallback(error) builds the value instead.
+        """
+        if not force_refresh:
+            entry = self.__read(key)
+            if entry is not None:
+                if entry['expires_at'] > time.time():
+                    self.__count('hits')
+                else:
+                    self.__count('stale_hits')
+                    self.__refresh_in_background(key, loader, fallback)
+                return entry['value']
+
+        self.__count('misses')
+        return self.__load(key, loader, fallback)
+
+    def __refresh(self, key, loader, fallback):
+        try:
+            value = loader()
+        except Exception as e:
+            self.__count('errors')
+            if fallback is None:
+                raise
+            LOG.warning('Could not load %s: %s', key, e)
+            value = fallback(e)
+            self.set(key, value, negative=True)
+            return value
+
+        self.set(key, value)
+        return value
+
+    def __load(self, key, loader, fallback):
+        started_at = time.time()
+        token = self.__lock(key)
+        if token:
+            try:
+                return self.__refresh(key, loader, fallback)
+            finally:
+                self.__unlock(key, token)
+
+        # Another process is loading this key, wait for its result
+        while time.time() - started_at < self.wait_timeout:
+            time.sleep(WAIT_INTERVAL)
+            entry = self.__read(key)
+            if entry is not None and entry['created_at'] >= started_at:
+                return entry['value']
+
+        LOG.warning('Timeout waiting %s to be loaded, loading it', key)
+        return self.__refresh(key, loader, fallback)
+
+    def __refresh_in_background(self, key, loader, fallback):
+        token = self.__lock(key)
+        if not token:
+            return
+
+        if self.keep_stale_on_error:
+            # Without fallback an error keeps the stale entry cached
+            fallback = None
+
+        def refresh():
+            try:
+                self.__count('refreshes')
+                self.__refresh(key, loader, fallback)
+            except Exception:
+                LOG.warning('Could not refresh %s', key, exc_info=True)
+            finally:
+                self.__unlock(key, token)
+                connection.close()
+
+        thread = threading.Thread(target=refresh)
+        thread.daemon = True
+        thread.start()
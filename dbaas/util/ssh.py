@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import logging
+import os
+import socket
+import threading
+import time
+from collections import namedtuple
+import paramiko
+
+LOG = logging.getLogger(__name__)
+
+SSH_MAX_CONNECTIONS = 50
+SSH_MAX_CHANNELS = 8
+SSH_IDLE_TIMEOUT = 5 * 60
+SSH_KEEPALIVE = 30
+SSH_CONNECT_TIMEOUT = 60
+
+RemoteCommandResult = namedtuple(
+    'RemoteCommandResult', ['exit_status', 'stdout', 'stderr', 'elapsed']
+)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class SSHConnection(object):
+
+    def __init__(self, server, username, password, keepalive):
+        self.server = server
+        self.client = paramiko.SSHClient()
+        self.client.load_system_host_keys()
+        self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        self.client.connect(
+            server, username=username, password=password,
+            timeout=SSH_CONNECT_TIMEOUT
+        )
+        self.client.get_transport().set_keepalive(keepalive)
+        self.channels = 0
+        self.last_used = time.time()
+
+    @property
+    def is_active(self):
+        transport = self.client.get_transport()
+        return transport is not None and transport.is_active()
+
+    def close(self):
+        try:
+            self.client.close()
+        except Exception:
+            LOG.debug('Could not close ssh connection to %s', self.server,
+                      exc_info=True)
+
+
+class SSHPool(object):
+
+    """
+    Keeps ssh connections opened by host and user. Each command runs on
+    a new channel of a pooled connection, so up to max_channels commands
+    share one connection. At most max_connections connections are opened
+    and connections idle for idle_timeout seconds are closed.
+    """
+
+    def __init__(self, max_connections=SSH_MAX_CONNECTIONS,
+                 max_channels=SSH_MAX_CHANNELS, idle_timeout=SSH_IDLE_TIMEOUT,
+                 keepalive=SSH_KEEPALIVE):
+        self.max_connections = max_connections
+        self.max_channels = max_channels
+        self.idle_timeout = idle_timeout
+        self.keepalive = keepalive
+        self.connections = {}
+        self.opening = 0
+        self.condition = threading.Condition()
+
+    def __len__(self):
+        with self.condition:
+            return sum(len(conns) for conns in self.connections.values())
+
+    def __remove(self, key, connection):
+        connections = self.connections.get(key, [])
+        if connection in connections:
+            connections.remove(connection)
+        if not connections:
+            self.connections.pop(key, None)
+        connection.close()
+
+    def __expire(self):
+        now = time.time()
+        for key, connections in self.connections.items():
+            for connection in list(connections):
+                if connection.channels:
+                    continue
+                if (now - connection.last_used >= self.idle_timeout or
+                        not connection.is_active):
+                    self.__remove(key, connection)
+
+    def __evict_idle(self):
+        idle = [
+            (connection.last_used, key, connection)
+            for key, connections in self.connections.items()
+            for connection in connections
+            if not connection.channels
+        ]
+        if not idle:
+            return False
+
+        _, key, connection = min(idle)
+        self.__remove(key, connection)
+        return True
+
+    def __acquire(self, server, username, password):
+        key = (server, username, password)
+        with self.condition:
+            while True:
+                self.__expire()
+                for connection in self.connections.get(key, []):
+                    if (connection.channels < self.max_channels and
+                            connection.is_active):
+                        connection.channels += 1
+                        return key, connection
+
+                opened = len(self) + self.opening
+                if opened < self.max_connections or self.__evict_idle():
+                    self.opening += 1
+                    break
+                self.condition.wait(1)
+
+        try:
+            connection = SSHConnection(
+                server, username, password, self.keepalive
+            )
+        except:
+            with self.condition:
+                self.opening -= 1
+                self.condition.notify_all()
+            raise
+
+        with self.condition:
+            self.opening -= 1
+            connection.channels = 1
+            self.connections.setdefault(key, []).append(connection)
+        return key, connection
+
+    def __release(self, key, connection, broken=False):
+        with self.condition:
+            connection.channels -= 1
+            connection.last_used = time.time()
+            if broken or not connection.is_active:
+                connection.channels = 0
+                self.__remove(key, connection)
+            self.condition.notify_all()
+
+    def __open_session(self, server, username, password):
+        key, connection = self.__acquire(server, username, password)
+        try:
+            return key, connection, connection.client.get_transport().open_session()
+        except (paramiko.ssh_exception.SSHException, socket.error):
+            # The pooled connection was dropped by the server, reconnect
+            self.__release(key, connection, broken=True)
+
+        key, connection = self.__acquire(server, username, password)
+        try:
+            return key, connection, connection.client.get_transport().open_session()
+        except:
+            self.__release(key, connection, broken=True)
+            raise
+
+    def execute(self, server, username, password, command):
+        started_at = time.time()
+        key, connection, channel = self.__open_session(
+            server, username, password
+        )
+        try:
+            channel.exec_command(command)
+            stdout = channel.makefile('rb').readlines()
+            stderr = channel.makefile_stderr('rb').readlines()
+            exit_status = channel.recv_exit_status()
+        except:
+            self.__release(key, connection, broken=True)
+            raise
+        finally:
+            channel.close()
+
+        self.__release(key, connection)
+        return RemoteCommandResult(
+            exit_status, stdout, stderr, time.time() - started_at
+        )
+
+    def close(self):
+        with self.condition:
+            for key, connections in self.connections.items():
+                for connection in list(connections):
+                    self.__remove(key, connection)
+
+
+def get_ssh_pool():
+    """ Returns the ssh pool of the current process, connections are not
+    shared with forked processes """
+    pid = os.getpid()
+    with _pools_lock:
+        if pid not in _pools:
+            from system.models import Configuration
+            _pools.clear()
+            _pools[pid] = SSHPool(
+                max_connections=Configuration.get_by_name_as_int(
+                    'ssh_pool_max_connections', default=SSH_MAX_CONNECTIONS),
+                idle_timeout=Configuration.get_by_name_as_int(
+                    'ssh_pool_idle_timeout', default=SSH_IDLE_TIMEOUT),
+            )
+        return _pools[pid]
+
+
+class RemoteTarget(object):
+
+    """ A host where run_remote_commands runs a command, context is used
+    to render the command template for this host """
+
+    def __init__(self, host, address, username, password, context=None):
+        self.host = host
+        self.address = address
+        self.username = username
+        self.password = password
+        self.context = context
+
+    @classmethod
+    def for_host(cls, host, context=None):
+        from dbaas_cloudstack.models import HostAttr
+        host_attr = HostAttr.objects.get(host=host)
+        return cls(
+            host, host.address, host_attr.vm_user, host_attr.vm_password,
+            context=context
+        )
+
+    def __unicode__(self):
+        return '{}'.format(self.address)
+
+    def __str__(self):
+        return self.__unicode__()
+
+
+class RemoteCommandError(Exception):
+
+    """ A command returned an error code, counted against the errors
+    allowed by run_remote_commands """
+
+    def __init__(self, result, rollback=None):
+        self.result = result
+        self.rollback = rollback
+        super(RemoteCommandError, self).__init__(
+            'Command returned {}'.format(result.exit_status)
+        )
+
+
+RemoteHostResult = namedtuple(
+    'RemoteHostResult',
+    ['target', 'exit_status', 'stdout', 'stderr', 'elapsed', 'error',
+     'rollback']
+)
+
+
+def run_remote_commands(targets, command, max_workers=None, reverse=False,
+                        stop_on_error=False, max_errors=None, rollback=None):
+    """
+    Runs command on every target, at most max_workers hosts at a time.
+    command is a script template rendered with the context of each target,
+    or a function of the target returning the command. When the command
+    fails on a host, rollback, rendered the same way, runs on it right
+    after and its RemoteCommandResult is the rollback of the host result.
+
+    With reverse the targets start in the reverse order. Once more than
+    max_errors commands failed no other host starts, with stop_on_error
+    after the first one; the targets not run are reported with a
+    ParallelCancelled error.
+    Returns a RemoteHostResult for each target, in the order of targets.
+    """
+    from system.models import Configuration
+    from util import build_context_script
+    from util.parallel import run_in_parallel, DEFAULT_MAX_WORKERS
+
+    targets = list(targets)
+    if max_workers is None:
+        max_workers = Configuration.get_by_name_as_int(
+            'remote_exec_max_workers', default=DEFAULT_MAX_WORKERS
+        )
+    if stop_on_error:
+        max_errors = 0
+
+    def render(script, target):
+        if callable(script):
+            return script(target)
+        if target.context is not None:
+            return build_context_script(target.context, script)
+        return script
+
+    def execute(script, target):
+        target_command = render(script, target)
+        LOG.info("Executing command [%s] on remote server %s" % (
+            target_command, target))
+        result = get_ssh_pool().execute(
+            target.address, target.username, target.password, target_command
+        )
+        LOG.info("Comand on %s return code: %s, stdout: %s, stderr %s" % (
+            target, result.exit_status, result.stdout, result.stderr))
+        return result
+
+    def run(index):
+        target = targets[index]
+        result = execute(command, target)
+        if result.exit_status == 0:
+            return result, None
+
+        rollback_result = None
+        if rollback:
+            rollback_result = execute(rollback, target)
+        if max_errors is not None:
+            raise RemoteCommandError(result, rollback_result)
+        return result, rollback_result
+
+    order = range(len(targets))
+    if reverse:
+        order.reverse()
+
+    results = [None] * len(targets)
+    for parallel_result in run_in_parallel(
+        run, order, max_workers=max_workers, max_errors=max_errors
+    ):
+        index, error = parallel_result.item, parallel_result.error
+        result = rollback_result = None
+        if isinstance(error, RemoteCommandError):
+            result, rollback_result, error = error.result, error.rollback, None
+        elif error is None:
+            result, rollback_result = parallel_result.result
+
+        if result is None:
+            results[index] = RemoteHostResult(
+                targets[index], None, [], [], parallel_result.elapsed, error,
+                None
+            )
+        else:
+            results[index] = RemoteHostResult(
+                targets[index], result.exit_status, result.stdout,
+                result.stderr, result.elapsed, error, rollback_result
+            )
+
+    return results
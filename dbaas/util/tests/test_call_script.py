@@ -0,0 +1,51 @@
+from __future__ import absolute_import
+import os
+import shutil
+import stat
+import tempfile
+from django.test import TestCase
+from util import call_script
+
+
+class CallScriptTestCase(TestCase):
+
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp() + '/'
+
+    def tearDown(self):
+        shutil.rmtree(self.working_dir)
+
+    def write_script(self, content):
+        path = os.path.join(self.working_dir, 'script.sh')
+        with open(path, 'w') as script:
+            script.write('#!/bin/bash\n' + content)
+        os.chmod(path, stat.S_IRWXU)
+        return 'script.sh'
+
+    def test_streams_output_lines(self):
+        script = self.write_script('echo first\necho second\nexit 3\n')
+        lines = []
+        return_code, output = call_script(
+            script, working_dir=self.working_dir, output_callback=lines.append
+        )
+        self.assertEqual(return_code, 3)
+        self.assertEqual(output, ['first', 'second'])
+        self.assertEqual(lines, ['first', 'second'])
+
+    def test_large_output_does_not_block(self):
+        script = self.write_script('seq 1 100000\n')
+        return_code, output = call_script(
+            script, working_dir=self.working_dir, split_lines=False,
+            max_output_size=100
+        )
+        self.assertEqual(return_code, 0)
+        self.assertTrue(len(output) <= 100)
+        self.assertTrue(output.endswith('100000\n'))
+
+    def test_kills_script_after_timeout(self):
+        script = self.write_script('echo started\nsleep 30\n')
+        return_code, output = call_script(
+            script, working_dir=self.working_dir, timeout=0.5
+        )
+        self.assertNotEqual(return_code, 0)
+        self.assertEqual(output, ['started'])
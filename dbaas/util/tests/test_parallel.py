@@ -0,0 +1,80 @@
+from __future__ import absolute_import
+import time
+from functools import partial
+from django.test import TestCase
+from util.parallel import run_in_parallel, ParallelTimeout, ParallelCancelled
+
+
+def double(value):
+    return value * 2
+
+
+def fail_on_odd(value):
+    if value % 2:
+        raise ValueError(value)
+    return value
+
+
+def sleep_for(value):
+    time.sleep(value)
+    return value
+
+
+class RunInParallelTestCase(TestCase):
+
+    def test_results_keep_items_order(self):
+        results = run_in_parallel(double, [3, 1, 2], max_workers=2)
+        self.assertEqual([r.item for r in results], [3, 1, 2])
+        self.assertEqual([r.result for r in results], [6, 2, 4])
+
+    def test_errors_are_collected_per_item(self):
+        results = run_in_parallel(fail_on_odd, [1, 2])
+        self.assertIsInstance(results[0].error, ValueError)
+        self.assertIsNone(results[0].result)
+        self.assertIsNone(results[1].error)
+        self.assertEqual(results[1].result, 2)
+
+    def test_calls_run_concurrently(self):
+        started_at = time.time()
+        run_in_parallel(sleep_for, [1, 1, 1], max_workers=3)
+        self.assertLess(time.time() - started_at, 2.5)
+
+    def test_slow_call_is_abandoned_after_timeout(self):
+        results = run_in_parallel(sleep_for, [0, 5], timeout=1)
+        self.assertIsNone(results[0].error)
+        self.assertIsInstance(results[1].error, ParallelTimeout)
+        self.assertLess(results[1].elapsed, 5)
+
+    def test_empty_items(self):
+        self.assertEqual(run_in_parallel(double, []), [])
+
+    def test_stop_on_error_cancels_pending_items(self):
+        results = run_in_parallel(
+            fail_on_odd, [1, 2, 4], max_workers=1, stop_on_error=True
+        )
+        self.assertIsInstance(results[0].error, ValueError)
+        self.assertIsInstance(results[1].error, ParallelCancelled)
+        self.assertIsInstance(results[2].error, ParallelCancelled)
+
+    def test_abandoned_calls_hold_their_slots_over_the_limit(self):
+        started_at = time.time()
+        results = run_in_parallel(
+            sleep_for, [2, 0], max_workers=1, timeout=0.5, max_abandoned=0
+        )
+        self.assertIsInstance(results[0].error, ParallelTimeout)
+        self.assertIsInstance(results[1].error, ParallelTimeout)
+        self.assertLess(time.time() - started_at, 2)
+
+    def test_error_of_callable_without_name(self):
+        results = run_in_parallel(partial(fail_on_odd), [1])
+        self.assertIsInstance(results[0].error, ValueError)
+
+    def test_max_errors_cancels_pending_items(self):
+        results = run_in_parallel(
+            fail_on_odd, [1, 2, 3, 4, 6], max_workers=1, max_errors=1
+        )
+        self.assertIsInstance(results[0].error, ValueError)
+        self.assertIsNone(results[1].error)
+        self.assertIsInstance(results[2].error, ValueError)
+        self.assertIsInstance(results[3].error, ParallelCancelled)
+        self.assertIsInstance(results[4].error, ParallelCancelled)
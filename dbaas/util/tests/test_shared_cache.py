@@ -0,0 +1,114 @@
+from __future__ import absolute_import
+import time
+import mock
+from django.test import TestCase
+from django.core.cache import cache
+from redis.exceptions import ConnectionError
+from util.shared_cache import SharedCache
+
+
+class FakeRedis(object):
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, name):
+        return self.data.get(name)
+
+    def set(self, name, value, ex=None, nx=False):
+        if nx and name in self.data:
+            return None
+        self.data[name] = value
+        return True
+
+    def delete(self, name):
+        self.data.pop(name, None)
+
+    def hincrby(self, name, key, amount):
+        counters = self.data.setdefault(name, {})
+        counters[key] = counters.get(key, 0) + amount
+
+    def hgetall(self, name):
+        return self.data.get(name, {})
+
+
+class SharedCacheTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.loader = mock.Mock(return_value='info')
+
+    def test_loads_once_and_serves_hits(self):
+        shared_cache = SharedCache('test', client=FakeRedis())
+        self.assertEqual('info', shared_cache.get('key', self.loader))
+        self.assertEqual('info', shared_cache.get('key', self.loader))
+        self.assertEqual(self.loader.call_count, 1)
+
+        stats = shared_cache.stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 1)
+
+    def test_force_refresh_calls_loader(self):
+        shared_cache = SharedCache('test', client=FakeRedis())
+        shared_cache.get('key', self.loader)
+        shared_cache.get('key', self.loader, force_refresh=True)
+        self.assertEqual(self.loader.call_count, 2)
+
+    def test_serves_stale_entry_while_refreshing(self):
+        shared_cache = SharedCache('test', timeout=0, client=FakeRedis())
+        shared_cache.get('key', self.loader)
+
+        self.loader.return_value = 'new info'
+        self.assertEqual('info', shared_cache.get('key', self.loader))
+        time.sleep(0.5)
+        self.assertEqual(self.loader.call_count, 2)
+        self.assertEqual(shared_cache.stats()['stale_hits'], 1)
+        self.assertEqual(shared_cache.stats()['refreshes'], 1)
+
+    def test_refresh_error_keeps_stale_entry(self):
+        shared_cache = SharedCache(
+            'test', timeout=0, keep_stale_on_error=True, client=FakeRedis()
+        )
+        shared_cache.get('key', self.loader)
+
+        self.loader.side_effect = Exception('dead infra')
+        fallback = mock.Mock(return_value='dead')
+        self.assertEqual('info', shared_cache.get('key', self.loader, fallback))
+        time.sleep(0.5)
+
+        self.assertEqual('info', shared_cache.get('key', self.loader, fallback))
+        time.sleep(0.5)
+        self.assertFalse(fallback.called)
+        self.assertEqual(shared_cache.stats()['errors'], 2)
+
+    def test_refresh_error_uses_fallback(self):
+        shared_cache = SharedCache('test', timeout=0, client=FakeRedis())
+        shared_cache.get('key', self.loader)
+
+        self.loader.side_effect = Exception('dead infra')
+        fallback = mock.Mock(return_value='dead')
+        self.assertEqual('info', shared_cache.get('key', self.loader, fallback))
+        time.sleep(0.5)
+
+        self.assertTrue(fallback.called)
+        self.assertEqual('dead', shared_cache.get('key', self.loader, fallback))
+
+    def test_loader_error_uses_fallback(self):
+        shared_cache = SharedCache('test', client=FakeRedis())
+        self.loader.side_effect = Exception('dead infra')
+        fallback = mock.Mock(return_value='dead')
+
+        self.assertEqual('dead', shared_cache.get('key', self.loader, fallback))
+        self.assertEqual('dead', shared_cache.get('key', self.loader, fallback))
+        self.assertEqual(self.loader.call_count, 1)
+        self.assertEqual(shared_cache.stats()['errors'], 1)
+
+    def test_uses_local_cache_without_redis(self):
+        client = mock.Mock()
+        for method in ('get', 'set', 'delete', 'hincrby', 'hgetall'):
+            getattr(client, method).side_effect = ConnectionError()
+        shared_cache = SharedCache('test', client=client)
+
+        self.assertEqual('info', shared_cache.get('key', self.loader))
+        self.assertEqual('info', shared_cache.get('key', self.loader))
+        self.assertEqual(self.loader.call_count, 1)
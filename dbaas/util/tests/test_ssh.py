@@ -0,0 +1,130 @@
+from __future__ import absolute_import
+import mock
+from django.test import TestCase
+from util.parallel import ParallelCancelled
+from util.ssh import SSHPool, RemoteTarget, RemoteCommandResult
+from util.ssh import run_remote_commands
+
+
+def fake_ssh_client():
+    client = mock.Mock()
+    transport = client.get_transport.return_value
+    transport.is_active.return_value = True
+    channel = transport.open_session.return_value
+    channel.makefile.return_value.readlines.return_value = ['ok\n']
+    channel.makefile_stderr.return_value.readlines.return_value = []
+    channel.recv_exit_status.return_value = 0
+    return client
+
+
+@mock.patch('util.ssh.paramiko.SSHClient', side_effect=fake_ssh_client)
+class SSHPoolTestCase(TestCase):
+
+    def test_reuses_connection_of_host(self, ssh_client):
+        pool = SSHPool()
+        first = pool.execute('10.0.0.1', 'user', 'pass', 'ls')
+        second = pool.execute('10.0.0.1', 'user', 'pass', 'ls')
+
+        self.assertEqual(first.exit_status, 0)
+        self.assertEqual(second.stdout, ['ok\n'])
+        self.assertEqual(ssh_client.call_count, 1)
+        self.assertEqual(len(pool), 1)
+
+    def test_connections_by_host(self, ssh_client):
+        pool = SSHPool()
+        pool.execute('10.0.0.1', 'user', 'pass', 'ls')
+        pool.execute('10.0.0.2', 'user', 'pass', 'ls')
+        self.assertEqual(ssh_client.call_count, 2)
+
+    def test_reconnects_dropped_connection(self, ssh_client):
+        pool = SSHPool()
+        pool.execute('10.0.0.1', 'user', 'pass', 'ls')
+
+        dropped = pool.connections.values()[0][0]
+        dropped.client.get_transport.return_value.is_active.return_value = False
+
+        pool.execute('10.0.0.1', 'user', 'pass', 'ls')
+        self.assertEqual(ssh_client.call_count, 2)
+        self.assertTrue(dropped.client.close.called)
+        self.assertEqual(len(pool), 1)
+
+    def test_closes_idle_connections(self, ssh_client):
+        pool = SSHPool(idle_timeout=0)
+        pool.execute('10.0.0.1', 'user', 'pass', 'ls')
+        pool.execute('10.0.0.2', 'user', 'pass', 'ls')
+        self.assertEqual(len(pool), 1)
+
+    def test_evicts_idle_connection_over_limit(self, ssh_client):
+        pool = SSHPool(max_connections=1)
+        pool.execute('10.0.0.1', 'user', 'pass', 'ls')
+        pool.execute('10.0.0.2', 'user', 'pass', 'ls')
+        self.assertEqual(len(pool), 1)
+        self.assertEqual(pool.connections.keys()[0][0], '10.0.0.2')
+
+
+class RunRemoteCommandsTestCase(TestCase):
+
+    def setUp(self):
+        self.executed = []
+        patcher = mock.patch('util.ssh.get_ssh_pool')
+        self.addCleanup(patcher.stop)
+        pool = patcher.start().return_value
+        pool.execute.side_effect = self.execute
+
+    def execute(self, address, username, password, command):
+        self.executed.append((address, command))
+        exit_status = 1 if address == 'failing' else 0
+        return RemoteCommandResult(exit_status, ['out\n'], [], 0.1)
+
+    def target(self, address):
+        return RemoteTarget(
+            None, address, 'user', 'pass', context={'name': address}
+        )
+
+    def test_renders_command_for_each_target(self):
+        results = run_remote_commands(
+            [self.target('a'), self.target('b')], 'echo {{ name }}',
+            max_workers=2
+        )
+        self.assertEqual([r.exit_status for r in results], [0, 0])
+        self.assertEqual([r.stdout for r in results], [['out\n']] * 2)
+        self.assertItemsEqual(
+            self.executed, [('a', 'echo a'), ('b', 'echo b')]
+        )
+
+    def test_reverse_order(self):
+        targets = [self.target('a'), self.target('b')]
+        run_remote_commands(targets, 'ls', max_workers=1, reverse=True)
+        self.assertEqual([address for address, _ in self.executed],
+                         ['b', 'a'])
+
+    def test_stop_on_error(self):
+        targets = [self.target('failing'), self.target('a'), self.target('b')]
+        results = run_remote_commands(
+            targets, 'ls', max_workers=1, stop_on_error=True
+        )
+        self.assertEqual(results[0].exit_status, 1)
+        self.assertIsNone(results[0].error)
+        self.assertIsInstance(results[1].error, ParallelCancelled)
+        self.assertIsInstance(results[2].error, ParallelCancelled)
+        self.assertEqual(self.executed, [('failing', 'ls')])
+
+    def test_max_errors(self):
+        targets = [self.target('failing'), self.target('a'),
+                   self.target('failing'), self.target('b')]
+        results = run_remote_commands(
+            targets, 'ls', max_workers=1, max_errors=1
+        )
+        self.assertEqual([r.exit_status for r in results[:3]], [1, 0, 1])
+        self.assertIsInstance(results[3].error, ParallelCancelled)
+
+    def test_rollback_runs_on_failed_hosts(self):
+        targets = [self.target('failing'), self.target('a')]
+        results = run_remote_commands(
+            targets, 'ls', max_workers=1, rollback='undo {{ name }}'
+        )
+        self.assertEqual(results[0].rollback.exit_status, 1)
+        self.assertIsNone(results[1].rollback)
+        self.assertEqual(self.executed, [
+            ('failing', 'ls'), ('failing', 'undo failing'), ('a', 'ls')
+        ])
@@ -0,0 +1,93 @@
+from __future__ import absolute_import
+import mock
+from django.test import TestCase
+from redis.exceptions import ConnectionError
+from util.wait import wait_until, wait_metrics, WaitFailed
+
+
+class FakeRedis(object):
+
+    def __init__(self):
+        self.data = {}
+
+    def pipeline(self):
+        return self
+
+    def hincrby(self, name, key, amount):
+        counters = self.data.setdefault(name, {})
+        counters[key] = counters.get(key, 0) + amount
+
+    def hincrbyfloat(self, name, key, amount):
+        self.hincrby(name, key, amount)
+
+    def execute(self):
+        pass
+
+    def hgetall(self, name):
+        return self.data.get(name, {})
+
+
+@mock.patch('util.wait.time.sleep')
+class WaitUntilTestCase(TestCase):
+
+    def setUp(self):
+        self.client = FakeRedis()
+
+    def test_returns_as_soon_as_ready(self, sleep):
+        condition = mock.Mock(side_effect=[False, False, 'ready'])
+        self.assertEqual('ready', wait_until(
+            condition, jitter=0, name='test', client=self.client
+        ))
+        self.assertEqual(condition.call_count, 3)
+        self.assertEqual([call[0][0] for call in sleep.call_args_list], [1, 2])
+
+        metrics = wait_metrics('test', client=self.client)
+        self.assertEqual(metrics['calls'], 1)
+        self.assertEqual(metrics['ready'], 1)
+        self.assertEqual(metrics['attempts'], 3)
+
+    def test_interval_is_limited_by_max_interval(self, sleep):
+        condition = mock.Mock(side_effect=[False] * 5 + [True])
+        wait_until(condition, max_interval=5, jitter=0, client=self.client)
+        self.assertEqual(
+            [call[0][0] for call in sleep.call_args_list], [1, 2, 4, 5, 5]
+        )
+
+    def test_returns_last_value_on_timeout(self, sleep):
+        condition = mock.Mock(return_value=False)
+        self.assertFalse(wait_until(
+            condition, timeout=0, name='test', client=self.client
+        ))
+        self.assertEqual(condition.call_count, 1)
+        self.assertEqual(wait_metrics('test', self.client)['timeouts'], 1)
+
+    def test_stops_after_max_attempts(self, sleep):
+        condition = mock.Mock(return_value=False)
+        self.assertFalse(wait_until(
+            condition, timeout=None, max_attempts=3, client=self.client
+        ))
+        self.assertEqual(condition.call_count, 3)
+
+    def test_raises_last_retried_error_on_timeout(self, sleep):
+        condition = mock.Mock(side_effect=IOError('not ready'))
+        with self.assertRaises(IOError):
+            wait_until(
+                condition, max_attempts=2, retry_on=(IOError,),
+                client=self.client
+            )
+        self.assertEqual(condition.call_count, 2)
+
+    def test_failure_stops_wait(self, sleep):
+        condition = mock.Mock(side_effect=WaitFailed('dead'))
+        with self.assertRaises(WaitFailed):
+            wait_until(condition, name='test', client=self.client)
+        self.assertEqual(condition.call_count, 1)
+        self.assertFalse(sleep.called)
+        self.assertEqual(wait_metrics('test', self.client)['failures'], 1)
+
+    def test_works_without_redis(self, sleep):
+        client = mock.Mock()
+        client.pipeline.side_effect = ConnectionError()
+        client.hgetall.side_effect = ConnectionError()
+        self.assertTrue(wait_until(lambda: True, client=client))
+        self.assertEqual(wait_metrics('condition', client)['calls'], 0)
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import logging
+import random
+import time
+from redis.exceptions import RedisError
+
+LOG = logging.getLogger(__name__)
+
+WAIT_TIMEOUT = 10 * 60
+WAIT_INITIAL_INTERVAL = 1
+WAIT_MAX_INTERVAL = 30
+WAIT_BACKOFF = 2
+WAIT_JITTER = 0.25
+
+METRICS = ('calls', 'ready', 'timeouts', 'failures', 'attempts')
+
+
+class WaitFailed(Exception):
+
+    """ Raised by a condition when the resource will never be ready """
+    pass
+
+
+def _redis_client():
+    from util.decorators import REDIS_CLIENT
+    return REDIS_CLIENT
+
+
+def metrics_key(name):
+    return 'wait_metrics:{}'.format(name)
+
+
+def _record(name, result, attempts, elapsed, client=None):
+    try:
+        pipeline = (client or _redis_client()).pipeline()
+        key = metrics_key(name)
+        pipeline.hincrby(key, 'calls', 1)
+        pipeline.hincrby(key, result, 1)
+        pipeline.hincrby(key, 'attempts', attempts)
+        pipeline.hincrbyfloat(key, 'seconds', elapsed)
+        pipeline.execute()
+    except RedisError as e:
+        LOG.debug('Could not record wait metrics of %s: %s', name, e)
+
+
+def wait_metrics(name, client=None):
+    """ Returns the calls, ready, timeouts, failures, attempts and seconds
+    spent waiting on name """
+    try:
+        counters = (client or _redis_client()).hgetall(metrics_key(name))
+    except RedisError:
+        counters = {}
+
+    metrics = dict(
+        (metric, int(counters.get(metric, 0))) for metric in METRICS
+    )
+    metrics['seconds'] = float(counters.get('seconds', 0))
+    return metrics
+
+
+def backoff_intervals(initial_interval=WAIT_INITIAL_INTERVAL,
+                      max_interval=WAIT_MAX_INTERVAL, backoff=WAIT_BACKOFF,
+                      jitter=WAIT_JITTER):
+    """ Yields exponentially growing intervals, each one randomly moved by
+    up to jitter of itself so waiters do not poll at the same time """
+    interval = initial_interval
+    while True:
+        yield max(0, interval * (1 + random.uniform(-jitter, jitter)))
+        interval = min(interval * backoff, max_interval)
+
+
+def wait_until(condition, timeout=WAIT_TIMEOUT,
+               initial_interval=WAIT_INITIAL_INTERVAL,
+               max_interval=WAIT_MAX_INTERVAL, backoff=WAIT_BACKOFF,
+               jitter=WAIT_JITTER, retry_on=(), max_attempts=None, name=None,
+               client=None):
+    """
+    Calls condition() until it returns a true value, which is returned,
+    sleeping an exponentially growing interval between attempts.
+
+    When timeout seconds pass, or after max_attempts calls, the last value
+    returned by condition is returned or, when the last attempt raised one of the retry_on
+    exceptions, it is raised again. A WaitFailed raised by condition stops
+    the wait at once. The outcome and timing of each wait are logged and
+    added to the wait_metrics:<name> Redis hash.
+    """
+    name = name or getattr(condition, '__name__', 'condition')
+    started_at = time.time()
+    deadline = None if timeout is None else started_at + timeout
+    intervals = backoff_intervals(
+        initial_interval, max_interval, backoff, jitter
+    )
+    attempts = 0
+
+    def finish(result):
+        elapsed = time.time() - started_at
+        LOG.info('Wait for %s %s after %s attempts in %.1fs',
+                 name, result, attempts, elapsed)
+        _record(name, result, attempts, elapsed, client)
+
+    while True:
+        attempts += 1
+        error = None
+        try:
+            value = condition()
+        except WaitFailed:
+            finish('failures')
+            raise
+        except retry_on as e:
+            value, error = None, e
+            LOG.debug('Wait for %s attempt %s: %s', name, attempts, e)
+
+        if value and error is None:
+            finish('ready')
+            return value
+
+        interval = next(intervals)
+        if deadline is not None:
+            interval = min(interval, deadline - time.time())
+
+        if interval <= 0 or attempts == max_attempts:
+            finish('timeouts')
+            if error is not None:
+                raise error
+            return value
+
+        time.sleep(interval)
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import logging
+from collections import namedtuple
+from importlib import import_module
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_by_path
+from drivers.replication_topologies.base import BaseTopology, ParallelSteps
+from .steps.util.base import BaseStep
+
+LOG = logging.getLogger(__name__)
+
+TOPOLOGY_MODULES = (
+    'drivers.replication_topologies.mongodb',
+    'drivers.replication_topologies.mysql',
+    'drivers.replication_topologies.redis',
+)
+
+TOPOLOGY_STEPS = (
+    'get_deploy_steps',
+    'get_clone_steps',
+    'get_resize_steps',
+    'get_restore_snapshot_steps',
+    'get_upgrade_steps',
+    'get_add_database_instances_steps',
+    'get_remove_readonly_instance_steps',
+)
+
+PlanStep = namedtuple('PlanStep', ['path', 'step_class'])
+PlanGroup = namedtuple('PlanGroup', ['description', 'steps', 'parallel'])
+
+_step_classes = {}
+_topology_plans = {}
+
+
+class InvalidWorkflowPlan(ImproperlyConfigured):
+
+    def __init__(self, errors):
+        self.errors = errors
+        super(InvalidWorkflowPlan, self).__init__(
+            'Invalid workflow steps: {}'.format('; '.join(errors))
+        )
+
+
+class WorkflowPlan(tuple):
+
+    """ Immutable groups of resolved steps, built by compile_plan """
+
+    @property
+    def steps(self):
+        return tuple(step for group in self for step in group.steps)
+
+    @property
+    def paths(self):
+        return tuple(step.path for step in self.steps)
+
+
+def resolve_step(path):
+    """ Returns the step class of path, importing it only once """
+    try:
+        return _step_classes[path]
+    except KeyError:
+        pass
+
+    step_class = import_by_path(path)
+    if not isinstance(step_class, type) or not issubclass(step_class, BaseStep):
+        raise ImproperlyConfigured('{} is not a workflow step'.format(path))
+
+    _step_classes[path] = step_class
+    return step_class
+
+
+def compile_plan(groups_of_steps):
+    """
+    Resolves the steps of a sequence of step paths or of a list of
+    {description: steps} groups, raising InvalidWorkflowPlan with every
+    invalid step before anything runs.
+    """
+    if isinstance(groups_of_steps, WorkflowPlan):
+        return groups_of_steps
+
+    if all(isinstance(step, basestring) for step in groups_of_steps):
+        groups_of_steps = [{None: groups_of_steps}]
+
+    groups = []
+    errors = []
+    for group in groups_of_steps:
+        if not isinstance(group, dict) or len(group) != 1:
+            errors.append('{!r} is not a group of steps'.format(group))
+            continue
+
+        description, paths = group.items()[0]
+        steps = []
+        for path in paths:
+            try:
+                steps.append(PlanStep(path, resolve_step(path)))
+            except ImproperlyConfigured as e:
+                errors.append('{}'.format(e))
+
+        groups.append(PlanGroup(
+            description, tuple(steps), isinstance(paths, ParallelSteps)
+        ))
+
+    if errors:
+        raise InvalidWorkflowPlan(errors)
+    return WorkflowPlan(groups)
+
+
+def get_topology_plan(class_path, method):
+    """ Returns the compiled plan of a topology steps method """
+    key = (class_path, method)
+    try:
+        return _topology_plans[key]
+    except KeyError:
+        pass
+
+    topology = import_by_path(class_path)()
+    plan = compile_plan(getattr(topology, method)())
+    _topology_plans[key] = plan
+    return plan
+
+
+def topology_classes():
+    for module in TOPOLOGY_MODULES:
+        import_module(module)
+
+    classes = []
+    pending = [BaseTopology]
+    while pending:
+        topology_class = pending.pop()
+        for subclass in topology_class.__subclasses__():
+            if subclass not in classes:
+                classes.append(subclass)
+                pending.append(subclass)
+    return classes
+
+
+def compile_topologies():
+    """
+    Compiles the plans of every topology, returning the errors found by
+    topology class path and steps method.
+    """
+    errors = {}
+    for topology_class in topology_classes():
+        class_path = '{}.{}'.format(
+            topology_class.__module__, topology_class.__name__
+        )
+        for method in TOPOLOGY_STEPS:
+            try:
+                get_topology_plan(class_path, method)
+            except NotImplementedError:
+                continue
+            except ImproperlyConfigured as e:
+                LOG.error('Invalid %s of %s: %s', method, class_path, e)
+                errors[(class_path, method)] = e
+    return errors
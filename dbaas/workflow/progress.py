@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import logging
+import threading
+import time
+from redis.exceptions import RedisError
+
+LOG = logging.getLogger(__name__)
+
+PROGRESS_FLUSH_INTERVAL = 10
+PROGRESS_TIMEOUT = 60 * 60 * 24
+
+
+def progress_key(task_id):
+    return 'task_progress:{}'.format(task_id)
+
+
+def _redis_client():
+    from util.decorators import REDIS_CLIENT
+    return REDIS_CLIENT
+
+
+def get_progress(task_id, client=None):
+    """ Returns the last progress published for a task, or None """
+    client = client or _redis_client()
+    try:
+        progress = client.hgetall(progress_key(task_id))
+    except RedisError as e:
+        LOG.warning('Could not read progress of task %s: %s', task_id, e)
+        return None
+    return progress or None
+
+
+class StepProgress(object):
+
+    """
+    Reports the progress of steps_for_instances.
+    Details are kept in the task history buffer and written at the end of
+    each group of steps, when a step fails or when
+    workflow_progress_flush_interval seconds passed since the last write.
+    Every step change is also published to the task_progress:<task id>
+    Redis hash, which can be polled instead of the task history.
+    It can be shared by the threads running steps of different instances.
+    """
+
+    def __init__(self, task, steps_total, client=None):
+        self.task = task
+        self.steps_total = steps_total
+        self._client = client
+        self.flushed_at = time.time()
+        self.lock = threading.RLock()
+        self.task.auto_flush_details = False
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = _redis_client()
+        return self._client
+
+    @property
+    def flush_interval(self):
+        from system.models import Configuration
+        return Configuration.get_by_name_as_int(
+            'workflow_progress_flush_interval', default=PROGRESS_FLUSH_INTERVAL
+        )
+
+    def publish(self, **progress):
+        if not self.task.id:
+            return
+
+        progress['steps_total'] = self.steps_total
+        progress['updated_at'] = time.strftime("%m/%d/%Y %H:%M:%S")
+        key = progress_key(self.task.id)
+        try:
+            pipeline = self.client.pipeline()
+            pipeline.hmset(key, progress)
+            pipeline.expire(key, PROGRESS_TIMEOUT)
+            pipeline.execute()
+        except RedisError as e:
+            LOG.warning('Could not publish progress of task %s: %s',
+                        self.task.id, e)
+
+    def add_detail(self, message, level=None):
+        with self.lock:
+            self.task.add_detail(message, level=level)
+
+    def start_step(self, step, instance, description, detail=True):
+        """ With detail False the step line is only written when it
+        finishes, so steps running at the same time do not mix lines """
+        with self.lock:
+            if detail:
+                self.task.add_step(step, self.steps_total, description)
+            self.publish(
+                step=step, instance='{}'.format(instance),
+                description=description, status='RUNNING'
+            )
+
+    def finish_step(self, step, status, description=None):
+        with self.lock:
+            if description:
+                self.task.add_step(
+                    step, self.steps_total, '{} {}!'.format(description, status)
+                )
+            else:
+                self.task.update_details('{}!'.format(status))
+            self.publish(step=step, status=status)
+
+            if status == 'FAILED':
+                self.flush()
+            elif time.time() - self.flushed_at >= self.flush_interval:
+                self.flush()
+
+    def flush(self):
+        with self.lock:
+            self.task.flush_details()
+            self.flushed_at = time.time()
+
+    def close(self):
+        self.flush()
+        self.task.auto_flush_details = True
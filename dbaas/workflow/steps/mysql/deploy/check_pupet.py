@@ -3,7 +3,7 @@ import logging
 from dbaas_cloudstack.models import HostAttr as CsHostAttr
 from util import exec_remote_command
 from util import full_stack
-from time import sleep
+from util.wait import wait_until, WaitFailed
 from workflow.steps.util.base import BaseStep
 from workflow.exceptions.error_codes import DBAAS_0013
 
@@ -24,13 +24,8 @@ class CheckPuppetIsRunning(BaseStep):
                 LOG.info("Getting vm credentials...")
                 host_csattr = CsHostAttr.objects.get(host=host)
 
-                attempt = 1
-                retries = 60
-                interval = 20
-                sleep(interval)
-                while True:
-                    LOG.info("Check if puppet-setup is running on {} - attempt {} of {}"
-                             .format(host, attempt, retries))
+                def puppet_setup_finished():
+                    LOG.info("Check if puppet-setup is running on {}".format(host))
                     output = {}
                     return_code = exec_remote_command(server=host.address,
                                                       username=host_csattr.vm_user,
@@ -38,22 +33,22 @@ class CheckPuppetIsRunning(BaseStep):
                                                       command=script,
                                                       output=output)
                     if return_code != 0:
-                        raise Exception(str(output))
+                        raise WaitFailed(str(output))
 
                     ret_value = int(output['stdout'][0])
                     if ret_value == 0:
                         LOG.info("Puppet-setup is not running on {}".format(host))
-                        break
+                        return True
 
                     LOG.info("Puppet-setup is running on {}".format(host))
-
-                    attempt += 1
-                    if attempt == retries:
-                        error = "Maximum number of attempts check is puppet is running on {}.".format(host)
-                        LOG.error(error)
-                        raise Exception(error)
-
-                    sleep(interval)
+                    return False
+
+                if not wait_until(puppet_setup_finished, timeout=60 * 20,
+                                  initial_interval=5, max_interval=20,
+                                  name='puppet_setup'):
+                    error = "Maximum number of attempts check is puppet is running on {}.".format(host)
+                    LOG.error(error)
+                    raise Exception(error)
 
                 puppet_code_status, output = self.get_puppet_code_status(host, host_csattr)
                 if puppet_code_status != 0:
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import logging
+from django.db import transaction
 from util import full_stack
 from util import get_credentials_for
 from dbaas_cloudstack.provider import CloudStackProvider
@@ -7,12 +8,11 @@ from dbaas_credentials.models import CredentialType
 from dbaas_cloudstack.models import PlanAttr
 from dbaas_cloudstack.models import HostAttr
 from dbaas_cloudstack.models import LastUsedBundle
-from dbaas_cloudstack.models import LastUsedBundleDatabaseInfra
 from dbaas_cloudstack.models import DatabaseInfraOffering
 from django.core.exceptions import ObjectDoesNotExist
-from physical.models import Host
 from physical.models import Instance
 from ...util.base import BaseStep
+from ...util.deploy.virtual_machines import VirtualMachinesProvisioning
 from ....exceptions.error_codes import DBAAS_0011
 
 LOG = logging.getLogger(__name__)
@@ -28,15 +28,9 @@ class CreateVirtualMachine(BaseStep):
             if 'environment' not in workflow_dict or 'plan' not in workflow_dict:
                 return False
 
-            cs_credentials = get_credentials_for(
-                environment=workflow_dict['environment'],
-                credential_type=CredentialType.CLOUDSTACK)
-
-            vm_credentials = get_credentials_for(
-                environment=workflow_dict['environment'],
-                credential_type=CredentialType.VM)
-
-            cs_provider = CloudStackProvider(credentials=cs_credentials)
+            provisioning = VirtualMachinesProvisioning(
+                environment=workflow_dict['environment']
+            )
 
             cs_plan_attrs = PlanAttr.objects.get(plan=workflow_dict['plan'])
 
@@ -48,7 +42,11 @@ class CreateVirtualMachine(BaseStep):
             workflow_dict['plan'].validate_min_environment_bundles()
             bundles = list(cs_plan_attrs.bundle.filter(is_active=True))
 
-            for index, vm_name in enumerate(workflow_dict['names']['vms']):
+            vm_names = workflow_dict['names']['vms']
+            if workflow_dict['qt'] == 1:
+                vm_names = vm_names[:1]
+
+            for index, vm_name in enumerate(vm_names):
                 offering = cs_plan_attrs.get_stronger_offering()
 
                 if len(bundles) == 1:
@@ -61,84 +59,48 @@ class CreateVirtualMachine(BaseStep):
                         bundle = LastUsedBundle.get_next_bundle(
                             current_bundle=bundle, bundles=bundles)
 
-                try:
-                    DatabaseInfraOffering.objects.get(
-                        databaseinfra=workflow_dict['databaseinfra'])
-                except ObjectDoesNotExist:
-                    LOG.info("Creating databaseInfra Offering...")
-                    dbinfra_offering = DatabaseInfraOffering()
-                    dbinfra_offering.offering = offering
-                    dbinfra_offering.databaseinfra = workflow_dict[
-                        'databaseinfra']
-                    dbinfra_offering.save()
-
-                LOG.debug(
-                    "Deploying new vm on cs with bundle %s and offering %s" % (bundle, offering))
-
-                vm = cs_provider.deploy_virtual_machine(
-                    offering=offering.serviceofferingid,
-                    bundle=bundle,
-                    project_id=cs_credentials.project,
-                    vmname=vm_name,
-                    affinity_group_id=cs_credentials.get_parameter_by_name(
-                        'affinity_group_id'),
-                )
-
-                if not vm:
-                    raise Exception(
-                        "CloudStack could not create the virtualmachine")
-
-                LOG.debug("New virtualmachine: %s" % vm)
-
-                workflow_dict['vms_id'].append(vm['virtualmachine'][0]['id'])
-
-                host = Host()
-                host.address = vm['virtualmachine'][0]['nic'][0]['ipaddress']
-                host.hostname = host.address
-                host.cloud_portal_host = True
-                host.save()
-                LOG.info("Host created!")
-
-                workflow_dict['hosts'].append(host)
-
-                host_attr = HostAttr()
-                host_attr.vm_id = vm['virtualmachine'][0]['id']
-                host_attr.vm_user = vm_credentials.user
-                host_attr.vm_password = vm_credentials.password
-                host_attr.host = host
-                host_attr.bundle = bundle
-                host_attr.save()
-                LOG.info("Host attrs custom attributes created!")
-
-                instance = Instance()
-                instance.address = host.address
-                instance.port = 3306
-                instance.hostname = host
-                instance.databaseinfra = workflow_dict['databaseinfra']
-                instance.instance_type = Instance.MYSQL
-                instance.save()
-                LOG.info("Instance created!")
-
-                workflow_dict['instances'].append(instance)
+                provisioning.add(vm_name, offering, bundle)
 
-                databaseinfra = workflow_dict['databaseinfra']
-                databaseinfra.last_vm_created += 1
-                databaseinfra.save()
-                workflow_dict['databaseinfra'] = databaseinfra
+            try:
+                DatabaseInfraOffering.objects.get(
+                    databaseinfra=workflow_dict['databaseinfra'])
+            except ObjectDoesNotExist:
+                LOG.info("Creating databaseInfra Offering...")
+                dbinfra_offering = DatabaseInfraOffering()
+                dbinfra_offering.offering = provisioning.requests[0].offering
+                dbinfra_offering.databaseinfra = workflow_dict[
+                    'databaseinfra']
+                dbinfra_offering.save()
+
+            virtual_machines = provisioning.deploy()
+            workflow_dict['vms_id'] = [vm.vm_id for vm in virtual_machines]
 
-                LastUsedBundleDatabaseInfra.set_last_infra_bundle(
-                    databaseinfra=databaseinfra, bundle=host_attr.bundle)
+            with transaction.atomic():
+                databaseinfra = workflow_dict['databaseinfra']
+                hosts = provisioning.create_hosts(databaseinfra)
+
+                instances = []
+                for host in hosts:
+                    instance = Instance()
+                    instance.address = host.address
+                    instance.port = 3306
+                    instance.hostname = host
+                    instance.databaseinfra = databaseinfra
+                    instance.instance_type = Instance.MYSQL
+                    instance.save()
+                    instances.append(instance)
+                LOG.info("Instances created!")
 
                 if workflow_dict['qt'] == 1:
 
                     LOG.info("Updating databaseinfra endpoint...")
-                    databaseinfra = workflow_dict['databaseinfra']
                     databaseinfra.endpoint = instance.address + \
                         ":%i" % (instance.port)
                     databaseinfra.save()
-                    workflow_dict['databaseinfra'] = databaseinfra
 
-                    return True
+            workflow_dict['hosts'] = hosts
+            workflow_dict['instances'] = instances
+            workflow_dict['databaseinfra'] = databaseinfra
 
             return True
         except Exception:
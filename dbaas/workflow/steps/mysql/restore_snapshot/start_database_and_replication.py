@@ -7,8 +7,9 @@ from workflow.steps.mysql.util import get_replication_information_from_file
 from workflow.steps.util.restore_snapshot import use_database_initialization_script
 from workflow.steps.mysql.util import change_master_to
 from workflow.steps.mysql.util import start_slave
+from workflow.steps.mysql.util import wait_replication_is_running
+from workflow.steps.util.restore_snapshot import wait_database_is_up
 from physical.models import Instance
-from time import sleep
 
 LOG = logging.getLogger(__name__)
 
@@ -44,8 +45,9 @@ class StartDatabaseAndReplication(BaseStep):
             if return_code != 0:
                 raise Exception(str(output))
 
-            LOG.info("Waiting 1 minute to continue")
-            sleep(60)
+            LOG.info("Waiting databases to start")
+            wait_database_is_up(databaseinfra, master_host)
+            wait_database_is_up(databaseinfra, secondary_host)
 
             change_master_to(instance=master_instance,
                              master_host=secondary_host.address,
@@ -60,8 +62,8 @@ class StartDatabaseAndReplication(BaseStep):
             start_slave(instance=master_instance)
             start_slave(instance=secondary_instance)
 
-            LOG.info("Waiting 30 seconds to continue")
-            sleep(30)
+            LOG.info("Waiting replication to start")
+            wait_replication_is_running([master_instance, secondary_instance])
             driver = databaseinfra.get_driver()
             driver.set_read_ip(instance=master_instance)
             driver.set_master(instance=secondary_instance)
@@ -5,8 +5,8 @@ from workflow.steps.util.base import BaseStep
 from workflow.exceptions.error_codes import DBAAS_0021
 from workflow.steps.util.restore_snapshot import use_database_initialization_script
 from workflow.steps.mysql.util import start_slave
+from workflow.steps.mysql.util import wait_replication_is_running
 from physical.models import Instance
-from time import sleep
 
 
 LOG = logging.getLogger(__name__)
@@ -51,6 +51,7 @@ class StopDatabase(BaseStep):
         try:
             databaseinfra = workflow_dict['databaseinfra']
 
+            started_instances = []
             for host in workflow_dict['stoped_hosts']:
                 LOG.info('Starting database on host {}'.format(host))
                 return_code, output = use_database_initialization_script(databaseinfra=databaseinfra,
@@ -62,9 +63,10 @@ class StopDatabase(BaseStep):
 
                 instance = host.instances.all()[0]
                 start_slave(instance=instance)
+                started_instances.append(instance)
 
-            LOG.info('Wainting 30 seconds to setting write/read instances')
-            sleep(30)
+            LOG.info('Waiting replication to setting write/read instances')
+            wait_replication_is_running(started_instances)
             driver = databaseinfra.get_driver()
             master_host = workflow_dict['host']
             master_instance = Instance.objects.get(hostname=master_host)
@@ -1,8 +1,8 @@
 # -*- coding: utf-8 -*-
 import logging
-from time import sleep
 from dbaas_cloudstack.models import HostAttr as CsHostAttr
 from util import exec_remote_command
+from util.wait import wait_until, WaitFailed
 
 LOG = logging.getLogger(__name__)
 
@@ -106,8 +106,8 @@ def get_replication_info(instance):
 def check_seconds_behind(instance, retries=50):
     client = get_client(instance)
 
-    for attempt in range(retries):
-        LOG.info("Checking replication %i on %s " % (attempt + 1, instance))
+    def replication_is_synced():
+        LOG.info("Checking replication on %s " % instance)
 
         client.query("show slave status")
         r = client.store_result()
@@ -115,16 +115,34 @@ def check_seconds_behind(instance, retries=50):
         seconds_behind = row[0]['Seconds_Behind_Master']
 
         if seconds_behind is None:
-            raise Exception("Replication is not running")
+            raise WaitFailed("Replication is not running")
 
-        if seconds_behind == '0':
-            return True
-
-        if attempt == retries - 1:
+        if seconds_behind != '0':
             LOG.warning("Seconds behind: {}".format(seconds_behind))
             return False
-
-        sleep(10)
+        return True
+
+    return wait_until(
+        replication_is_synced, timeout=retries * 10, max_interval=10,
+        name='mysql_seconds_behind'
+    )
+
+
+def wait_replication_is_running(instances, timeout=30):
+    def replication_is_running():
+        for instance in instances:
+            client = get_client(instance)
+            client.query("show slave status")
+            r = client.store_result()
+            row = r.fetch_row(maxrows=0, how=1)
+            if row[0]['Seconds_Behind_Master'] is None:
+                return False
+        return True
+
+    return wait_until(
+        replication_is_running, timeout=timeout, initial_interval=2,
+        max_interval=10, name='mysql_replication_running'
+    )
 
 
 def change_master_to(instance, master_host, bin_log_file, bin_log_position):
@@ -31,8 +31,14 @@ class CloneDatabase(BaseStep):
 
             python_bin = Configuration.get_by_name('python_venv_bin')
 
+            task = workflow_dict.get('task')
+            output_callback = None
+            if task:
+                output_callback = lambda line: task.add_detail(line, level=1)
+
             return_code, output = call_script(
-                script_name, working_dir=settings.SCRIPTS_PATH, args=args, split_lines=False, python_bin=python_bin)
+                script_name, working_dir=settings.SCRIPTS_PATH, args=args, split_lines=False, python_bin=python_bin,
+                output_callback=output_callback)
 
             LOG.info("Script Output: {}".format(output))
             LOG.info("Return code: {}".format(return_code))
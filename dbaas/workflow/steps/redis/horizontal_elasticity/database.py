@@ -15,8 +15,11 @@ class AddInstanceToRedisCluster(DatabaseStep):
         client.slaveof(master.address, master.port)
 
     def undo(self):
-        self.stop_database()
-        sleep(10)
+        return_code, output = self.stop_database()
+        if not self.is_down:
+            raise EnvironmentError(
+                'Could not stop database {}: {}'.format(return_code, output)
+            )
 
         sentinel_instances = self.driver.get_non_database_instances()
         for sentinel_instance in sentinel_instances:
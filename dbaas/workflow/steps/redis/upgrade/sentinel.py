@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-from time import sleep
+from util.wait import wait_until
 from workflow.steps.util.base import BaseInstanceStep
 from workflow.steps.redis.util import reset_sentinel
 
@@ -15,8 +15,15 @@ class Reset(BaseInstanceStep):
         self.host = self.instance.hostname
         self.sentinel_instance = self.host.non_database_instance()
 
+    def database_is_up(self):
+        try:
+            return self.driver.check_status(instance=self.instance)
+        except Exception:
+            return False
+
     def do(self):
-        sleep(10)
+        wait_until(self.database_is_up, timeout=30, initial_interval=2,
+                   max_interval=10, name='sentinel_reset')
         if self.sentinel_instance:
             reset_sentinel(
                 self.host,
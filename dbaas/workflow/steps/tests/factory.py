@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 import logging
-from ..util.base import BaseStep
+from ..util.base import BaseStep, BaseInstanceStep
 
 LOG = logging.getLogger(__name__)
 
@@ -52,3 +52,26 @@ class TestStep4(BaseStep):
     def undo(self, workflow_dict):
         raise Exception
         return False
+
+
+class TestInstanceStep(BaseInstanceStep):
+
+    def __unicode__(self):
+        return "TestInstanceStep"
+
+    def do(self):
+        self.instance.done.append(self.__class__.__name__)
+
+    def undo(self):
+        self.instance.undone.append(self.__class__.__name__)
+
+
+class TestInstanceStep2(TestInstanceStep):
+
+    def __unicode__(self):
+        return "TestInstanceStep2"
+
+    def do(self):
+        super(TestInstanceStep2, self).do()
+        if self.instance.fail:
+            raise Exception('Step failed')
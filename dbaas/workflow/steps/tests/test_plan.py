@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+from django.test import TestCase
+from drivers.replication_topologies.base import ParallelSteps
+from workflow.plan import compile_plan, compile_topologies
+from workflow.plan import InvalidWorkflowPlan, WorkflowPlan
+from workflow.steps.tests.factory import TestInstanceStep, TestStep1
+
+
+class WorkflowPlanTestCase(TestCase):
+
+    def test_compile_groups_of_steps(self):
+        plan = compile_plan([
+            {'First': ParallelSteps((
+                'workflow.steps.tests.factory.TestInstanceStep',
+            ))},
+            {'Second': ('workflow.steps.tests.factory.TestStep1',)},
+        ])
+
+        self.assertIsInstance(plan, WorkflowPlan)
+        self.assertEqual([group.description for group in plan],
+                         ['First', 'Second'])
+        self.assertEqual([group.parallel for group in plan], [True, False])
+        self.assertEqual([step.step_class for step in plan.steps],
+                         [TestInstanceStep, TestStep1])
+        self.assertIs(compile_plan(plan), plan)
+
+    def test_compile_sequence_of_steps(self):
+        plan = compile_plan(('workflow.steps.tests.factory.TestStep1',))
+        self.assertEqual(plan.paths,
+                         ('workflow.steps.tests.factory.TestStep1',))
+
+    def test_invalid_steps_are_reported_together(self):
+        with self.assertRaises(InvalidWorkflowPlan) as context:
+            compile_plan((
+                'workflow.steps.tests.factory.TestStep1',
+                'workflow.steps.tests.factory.Typo',
+                'workflow.steps.tests.factory.LOG',
+            ))
+        self.assertEqual(len(context.exception.errors), 2)
+
+    def test_topologies_steps_are_valid(self):
+        self.assertEqual(compile_topologies(), {})
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import mock
+from django.test import TestCase
+from notification.tests.factory import TaskHistoryFactory
+from workflow.progress import StepProgress, progress_key
+
+
+class StepProgressTestCase(TestCase):
+
+    def setUp(self):
+        self.task = TaskHistoryFactory()
+        self.client = mock.Mock()
+        self.pipeline = self.client.pipeline.return_value
+        self.progress = StepProgress(self.task, 2, client=self.client)
+
+    def test_details_are_written_on_flush(self):
+        self.progress.start_step(1, 'instance', 'Creating VM')
+        self.progress.finish_step(1, 'SUCCESS')
+        self.assertEqual(self.task.detail_chunks.count(), 0)
+        self.assertIn('Creating VM', self.task.details)
+
+        self.progress.close()
+        self.assertEqual(self.task.detail_chunks.count(), 1)
+        self.assertTrue(self.task.auto_flush_details)
+
+    def test_failed_step_is_written(self):
+        self.progress.start_step(1, 'instance', 'Creating VM')
+        self.progress.finish_step(1, 'FAILED')
+        self.assertEqual(self.task.tail_details(lines=1)[0][-7:], 'FAILED!')
+
+    def test_publish_step_progress(self):
+        self.progress.start_step(1, 'instance', 'Creating VM')
+
+        key, progress = self.pipeline.hmset.call_args[0]
+        self.assertEqual(key, progress_key(self.task.id))
+        self.assertEqual(progress['step'], 1)
+        self.assertEqual(progress['steps_total'], 2)
+        self.assertEqual(progress['description'], 'Creating VM')
+        self.assertEqual(progress['status'], 'RUNNING')
+        self.assertTrue(self.pipeline.execute.called)
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import mock
+from django.test import TestCase
+from workflow.steps.util.deploy.virtual_machines import VirtualMachinesProvisioning
+
+MODULE = 'workflow.steps.util.deploy.virtual_machines'
+
+
+def deploy_virtual_machine(vmname, **kwargs):
+    if vmname == 'broken':
+        return None
+    return {'virtualmachine': [{
+        'id': 'id-{}'.format(vmname),
+        'nic': [{'ipaddress': 'ip-{}'.format(vmname)}],
+    }]}
+
+
+@mock.patch('{}.get_credentials_for'.format(MODULE), mock.Mock())
+@mock.patch('{}.CloudStackProvider'.format(MODULE))
+class VirtualMachinesProvisioningTestCase(TestCase):
+
+    def provisioning(self, *vm_names):
+        provisioning = VirtualMachinesProvisioning(environment=mock.Mock())
+        for vm_name in vm_names:
+            provisioning.add(vm_name, mock.Mock(), mock.Mock())
+        return provisioning
+
+    def test_deploy_keeps_order(self, provider):
+        provider.return_value.deploy_virtual_machine.side_effect = \
+            deploy_virtual_machine
+
+        virtual_machines = self.provisioning('vm1', 'vm2', 'vm3').deploy()
+        self.assertEqual(
+            [vm.vm_id for vm in virtual_machines], ['id-vm1', 'id-vm2', 'id-vm3']
+        )
+        self.assertEqual(virtual_machines[1].address, 'ip-vm2')
+
+    def test_deploy_error_destroys_deployed(self, provider):
+        provider.return_value.deploy_virtual_machine.side_effect = \
+            deploy_virtual_machine
+
+        provisioning = self.provisioning('vm1', 'broken', 'vm3')
+        with self.assertRaises(Exception):
+            provisioning.deploy()
+
+        destroyed = [
+            call[1]['vm_id'] for call in
+            provider.return_value.destroy_virtual_machine.call_args_list
+        ]
+        self.assertEqual(sorted(destroyed), ['id-vm1', 'id-vm3'])
+        self.assertEqual(provisioning.virtual_machines, [])
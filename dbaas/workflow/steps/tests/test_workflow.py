@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals
 import logging
+import mock
 from django.test import TestCase
+from drivers.replication_topologies.base import ParallelSteps
 from workflow.workflow import start_workflow
 from workflow.workflow import stop_workflow
+from workflow.workflow import steps_for_instances
+from workflow.workflow import steps_for_instances_with_rollback
 
 LOG = logging.getLogger(__name__)
 
@@ -76,3 +80,63 @@ class StopWorkflowTestCase(TestCase):
                          ('DBAAS_0001', 'Workflow error')])
         self.assertEqual(self.workflow_dict['steps'], ('workflow.steps.tests.factory.TestStep4',
                                                        'workflow.steps.tests.factory.TestStep3'))
+
+
+class StepsForInstancesTestCase(TestCase):
+
+    def setUp(self):
+        self.task = mock.Mock(id=None)
+        database = mock.Mock()
+        database.pin_task.return_value = True
+        self.instances = []
+        for fail in (False, True):
+            instance = mock.Mock(done=[], undone=[], fail=fail)
+            instance.databaseinfra.databases.first.return_value = database
+            self.instances.append(instance)
+
+        self.steps = ('workflow.steps.tests.factory.TestInstanceStep',
+                      'workflow.steps.tests.factory.TestInstanceStep2')
+
+    def test_parallel_steps_run_for_every_instance(self):
+        self.instances[1].fail = False
+        success = steps_for_instances(
+            [{'Parallel': ParallelSteps(self.steps)}], self.instances, self.task
+        )
+        self.assertTrue(success)
+        for instance in self.instances:
+            self.assertEqual(
+                instance.done, ['TestInstanceStep', 'TestInstanceStep2']
+            )
+
+    def test_parallel_steps_aggregate_failures(self):
+        executed_steps = [[], []]
+        success = steps_for_instances(
+            [{'Parallel': ParallelSteps(self.steps)}], self.instances,
+            self.task, executed_steps=executed_steps
+        )
+        self.assertFalse(success)
+        self.assertEqual(executed_steps, [list(self.steps), list(self.steps)])
+
+    def test_rollback_only_failed_instances(self):
+        success = steps_for_instances_with_rollback(
+            [{'Parallel': ParallelSteps(self.steps)}], self.instances, self.task
+        )
+        self.assertFalse(success)
+        self.assertEqual(self.instances[0].undone, [])
+        self.assertEqual(
+            self.instances[1].undone, ['TestInstanceStep2', 'TestInstanceStep']
+        )
+
+    def test_rollback_instances_of_all_groups(self):
+        success = steps_for_instances_with_rollback(
+            [{'First': ParallelSteps(self.steps[:1])},
+             {'Second': self.steps[1:]}], self.instances, self.task
+        )
+        self.assertFalse(success)
+        self.assertEqual(
+            self.instances[0].done, ['TestInstanceStep', 'TestInstanceStep2']
+        )
+        self.assertEqual(self.instances[0].undone, [])
+        self.assertEqual(
+            self.instances[1].undone, ['TestInstanceStep2', 'TestInstanceStep']
+        )
@@ -1,11 +1,11 @@
 # -*- coding: utf-8 -*-
 import logging
-from util import exec_remote_command
+from time import sleep
 from util import check_ssh
 from util import get_credentials_for
 from util import full_stack
-from util import build_context_script
-from time import sleep
+from util.wait import wait_until
+from util.ssh import RemoteTarget, run_remote_commands
 from dbaas_cloudstack.models import HostAttr
 from dbaas_cloudstack.provider import CloudStackProvider
 from dbaas_credentials.models import CredentialType
@@ -15,33 +15,38 @@ from workflow.exceptions.error_codes import DBAAS_0015
 LOG = logging.getLogger(__name__)
 
 
-def run_vm_script(workflow_dict, context_dict, script, reverse=False, wait=0):
+def run_vm_script(workflow_dict, context_dict, script, reverse=False, wait=0,
+                  parallel=False):
+    """
+    Runs script on the hosts one at a time, in order or in reverse order,
+    sleeping wait seconds after each host. With parallel the hosts run at
+    the same time, reverse only changes the start order and wait is not
+    used.
+    """
     try:
         instances_detail = workflow_dict['instances_detail']
 
         final_context_dict = dict(
             context_dict.items() + workflow_dict['initial_context_dict'].items())
 
-        if reverse:
-            instances_detail_final = instances_detail[::-1]
-        else:
-            instances_detail_final = instances_detail
-
-        for instance_detail in instances_detail_final:
-            host = instance_detail['instance'].hostname
-            host_csattr = HostAttr.objects.get(host=host)
-            final_context_dict['IS_MASTER'] = instance_detail['is_master']
-            command = build_context_script(final_context_dict, script)
-            output = {}
-            return_code = exec_remote_command(server=host.address,
-                                              username=host_csattr.vm_user,
-                                              password=host_csattr.vm_password,
-                                              command=command,
-                                              output=output)
-            if return_code:
-                raise Exception(
-                    "Could not run script. Output: {}".format(output))
+        targets = []
+        for instance_detail in instances_detail:
+            context = dict(final_context_dict)
+            context['IS_MASTER'] = instance_detail['is_master']
+            targets.append(RemoteTarget.for_host(
+                instance_detail['instance'].hostname, context=context
+            ))
+
+        if parallel:
+            check_vm_script_results(run_remote_commands(
+                targets, script, reverse=reverse, stop_on_error=True
+            ))
+            return True
 
+        if reverse:
+            targets = targets[::-1]
+        for target in targets:
+            check_vm_script_results(run_remote_commands([target], script))
             sleep(wait)
 
         return True
@@ -55,6 +60,16 @@ def run_vm_script(workflow_dict, context_dict, script, reverse=False, wait=0):
         return False
 
 
+def check_vm_script_results(results):
+    for result in results:
+        if result.error or result.exit_status:
+            raise Exception(
+                "Could not run script on {}. Output: {} {} {}".format(
+                    result.target, result.stdout, result.stderr,
+                    result.error or ''
+                ))
+
+
 def start_vm(workflow_dict):
     try:
         environment = workflow_dict['environment']
@@ -83,8 +98,20 @@ def start_vm(workflow_dict):
                 LOG.warn(error)
                 raise Exception(error)
 
-        from time import sleep
-        sleep(60)
+        def databases_are_up():
+            for instance_detail in instances_detail:
+                instance = instance_detail['instance']
+                try:
+                    driver = instance.databaseinfra.get_driver()
+                    if not driver.check_status(instance=instance):
+                        return False
+                except Exception:
+                    return False
+            return True
+
+        if not wait_until(databases_are_up, timeout=60, initial_interval=2,
+                          max_interval=10, name='start_vm_databases'):
+            LOG.warn("Databases are not up after starting hosts")
 
         return True
     except Exception:
@@ -28,8 +28,14 @@ class CloneDatabase(BaseStep):
             script_name = factory_for(
                 workflow_dict['clone'].databaseinfra).clone()
 
+            task = workflow_dict.get('task')
+            output_callback = None
+            if task:
+                output_callback = lambda line: task.add_detail(line, level=1)
+
             return_code, output = call_script(
-                script_name, working_dir=settings.SCRIPTS_PATH, args=args, split_lines=False,)
+                script_name, working_dir=settings.SCRIPTS_PATH, args=args, split_lines=False,
+                output_callback=output_callback)
 
             LOG.info("Script Output: {}".format(output))
             LOG.info("Return code: {}".format(return_code))
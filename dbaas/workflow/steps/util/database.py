@@ -1,9 +1,9 @@
 # -*- coding: utf-8 -*-
-from time import sleep
 from dbaas_cloudstack.models import HostAttr
 from workflow.steps.util.restore_snapshot import use_database_initialization_script
 from util import build_context_script, exec_remote_command
 from workflow.steps.util.base import BaseInstanceStep
+from util.wait import wait_until
 
 CHECK_SECONDS = 10
 CHECK_ATTEMPTS = 12
@@ -37,17 +37,18 @@ class DatabaseStep(BaseInstanceStep):
         return self._execute_init_script('stop')
 
     def __is_instance_status(self, expected):
-        for _ in range(CHECK_ATTEMPTS):
+        def is_expected_status():
             try:
                 status = self.driver.check_status(instance=self.instance)
             except:
                 status = False
+            return status == expected
 
-            if status == expected:
-                return True
-            else:
-                sleep(CHECK_SECONDS)
-        return False
+        return wait_until(
+            is_expected_status, timeout=CHECK_ATTEMPTS * CHECK_SECONDS,
+            max_interval=CHECK_SECONDS,
+            name='instance_up' if expected else 'instance_down'
+        )
 
     @property
     def is_up(self):
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import logging
 from util import full_stack
+from util.wait import wait_until
 from ..base import BaseStep
 from ....exceptions.error_codes import DBAAS_0004
 
@@ -21,12 +22,15 @@ class CheckDatabaseConnection(BaseStep):
             driver = workflow_dict['databaseinfra'].get_driver()
 
             if workflow_dict['qt'] > 1:
-                LOG.info("Waiting 60 seconds to init replication...")
-                from time import sleep
-
-                sleep(60)
-
-            if driver.check_status():
+                LOG.info("Waiting replication to init...")
+                status = wait_until(
+                    driver.check_status, timeout=120, initial_interval=5,
+                    retry_on=(Exception,), name='init_replication'
+                )
+            else:
+                status = driver.check_status()
+
+            if status:
                 LOG.info("Database is ok...")
                 return True
 
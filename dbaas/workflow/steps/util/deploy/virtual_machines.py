@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+import logging
+from collections import namedtuple
+from django.db import transaction
+from dbaas_cloudstack.provider import CloudStackProvider
+from dbaas_cloudstack.models import HostAttr
+from dbaas_cloudstack.models import LastUsedBundleDatabaseInfra
+from dbaas_credentials.models import CredentialType
+from physical.models import Host
+from system.models import Configuration
+from util import get_credentials_for
+from util.parallel import run_in_parallel
+
+LOG = logging.getLogger(__name__)
+
+DEPLOY_MAX_WORKERS = 5
+
+VirtualMachine = namedtuple(
+    'VirtualMachine', ['vm_name', 'offering', 'bundle', 'vm_id', 'address']
+)
+
+
+class VirtualMachinesProvisioning(object):
+
+    """
+    Deploys the virtual machines of a databaseinfra at the same time and
+    records their hosts in one transaction. When one deploy fails, the
+    virtual machines already deployed are destroyed.
+    """
+
+    def __init__(self, environment):
+        self.environment = environment
+        self.cs_credentials = get_credentials_for(
+            environment=environment, credential_type=CredentialType.CLOUDSTACK
+        )
+        self.vm_credentials = get_credentials_for(
+            environment=environment, credential_type=CredentialType.VM
+        )
+        self.requests = []
+        self.virtual_machines = []
+
+    def add(self, vm_name, offering, bundle):
+        self.requests.append(VirtualMachine(vm_name, offering, bundle, None, None))
+
+    def __deploy(self, request):
+        LOG.debug("Deploying new vm on cs with bundle %s and offering %s" % (
+            request.bundle, request.offering))
+
+        cs_provider = CloudStackProvider(credentials=self.cs_credentials)
+        vm = cs_provider.deploy_virtual_machine(
+            offering=request.offering.serviceofferingid,
+            bundle=request.bundle,
+            project_id=self.cs_credentials.project,
+            vmname=request.vm_name,
+            affinity_group_id=self.cs_credentials.get_parameter_by_name(
+                'affinity_group_id'),
+        )
+
+        if not vm:
+            raise Exception("CloudStack could not create the virtualmachine")
+
+        LOG.debug("New virtualmachine: %s" % vm)
+        return request._replace(
+            vm_id=vm['virtualmachine'][0]['id'],
+            address=vm['virtualmachine'][0]['nic'][0]['ipaddress'],
+        )
+
+    def __destroy(self, virtual_machine):
+        LOG.info("Destroying virtualmachine %s" % virtual_machine.vm_id)
+        cs_provider = CloudStackProvider(credentials=self.cs_credentials)
+        cs_provider.destroy_virtual_machine(
+            project_id=self.cs_credentials.project,
+            environment=self.environment,
+            vm_id=virtual_machine.vm_id
+        )
+
+    def deploy(self):
+        max_workers = Configuration.get_by_name_as_int(
+            'deploy_vm_max_workers', default=DEPLOY_MAX_WORKERS
+        )
+        results = run_in_parallel(
+            self.__deploy, self.requests, max_workers=max_workers
+        )
+
+        errors = [result for result in results if result.error]
+        deployed = [result.result for result in results if not result.error]
+        if errors:
+            self.destroy(deployed)
+            raise Exception('Could not create virtualmachines {}: {}'.format(
+                ', '.join(error.item.vm_name for error in errors),
+                errors[0].error
+            ))
+
+        self.virtual_machines = deployed
+        return deployed
+
+    def destroy(self, virtual_machines=None):
+        if virtual_machines is None:
+            virtual_machines = self.virtual_machines
+
+        results = run_in_parallel(self.__destroy, virtual_machines)
+        for result in results:
+            if result.error:
+                LOG.error('Could not destroy virtualmachine %s: %s' % (
+                    result.item.vm_id, result.error))
+
+    @transaction.atomic
+    def create_hosts(self, databaseinfra):
+        hosts = []
+        for virtual_machine in self.virtual_machines:
+            host = Host()
+            host.address = virtual_machine.address
+            host.hostname = host.address
+            host.cloud_portal_host = True
+            host.save()
+            hosts.append(host)
+
+        HostAttr.objects.bulk_create([
+            HostAttr(
+                vm_id=virtual_machine.vm_id,
+                vm_user=self.vm_credentials.user,
+                vm_password=self.vm_credentials.password,
+                host=host,
+                bundle=virtual_machine.bundle,
+            )
+            for virtual_machine, host in zip(self.virtual_machines, hosts)
+        ])
+        LOG.info("%s hosts created!" % len(hosts))
+
+        databaseinfra.last_vm_created += len(hosts)
+        databaseinfra.save()
+
+        LastUsedBundleDatabaseInfra.set_last_infra_bundle(
+            databaseinfra=databaseinfra,
+            bundle=self.virtual_machines[-1].bundle
+        )
+        return hosts
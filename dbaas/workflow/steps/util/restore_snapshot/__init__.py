@@ -3,6 +3,7 @@ import logging
 from dbaas_cloudstack.models import HostAttr as CsHostAttr
 from workflow.steps.util.nfsaas_utils import create_snapshot
 from util import exec_remote_command
+from util.wait import wait_until
 
 LOG = logging.getLogger(__name__)
 
@@ -26,6 +27,27 @@ def use_database_initialization_script(databaseinfra, host, option):
     return return_code, output
 
 
+def wait_database_is_up(databaseinfra, host, timeout=60):
+    driver = databaseinfra.get_driver()
+    instances = host.instances.all()
+
+    def database_is_up():
+        try:
+            return all(
+                driver.check_status(instance=instance) for instance in instances
+            )
+        except Exception as e:
+            LOG.debug("Database on {} is not up: {}".format(host, e))
+            return False
+
+    is_up = wait_until(database_is_up, timeout=timeout, initial_interval=2,
+                       max_interval=10, name='restore_database_up')
+    if not is_up:
+        LOG.warning("Database on {} is not up after {} seconds".format(
+            host, timeout))
+    return is_up
+
+
 def update_fstab(host, source_export_path, target_export_path):
     cs_host_attr = CsHostAttr.objects.get(host=host)
 
@@ -1,10 +1,10 @@
 # -*- coding: utf-8 -*-
 import logging
 from util import full_stack
-from time import sleep
 from workflow.steps.util.base import BaseStep
 from workflow.exceptions.error_codes import DBAAS_0021
 from workflow.steps.util.restore_snapshot import use_database_initialization_script
+from workflow.steps.util.restore_snapshot import wait_database_is_up
 
 LOG = logging.getLogger(__name__)
 
@@ -31,8 +31,8 @@ class StartDatabase(BaseStep):
                 if return_code != 0:
                     raise Exception(str(output))
 
-                LOG.info('Wait 1 minute before start other instance')
-                sleep(60)
+                LOG.info('Waiting database to start before start other instance')
+                wait_database_is_up(databaseinfra, host)
 
             return True
         except Exception:
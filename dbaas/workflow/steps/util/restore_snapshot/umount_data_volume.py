@@ -5,7 +5,7 @@ from workflow.steps.util.base import BaseStep
 from workflow.exceptions.error_codes import DBAAS_0021
 from dbaas_cloudstack.models import HostAttr as CsHostAttr
 from util import exec_remote_command
-from time import sleep
+from util.wait import wait_until
 
 LOG = logging.getLogger(__name__)
 
@@ -17,18 +17,21 @@ class UmountDataVolume(BaseStep):
 
     def do(self, workflow_dict):
         try:
-            sleep(10)
             host = workflow_dict['host']
             cs_host_attr = CsHostAttr.objects.get(host=host)
             command = 'umount /data'
             output = {}
-            return_code = exec_remote_command(server=host.address,
-                                              username=cs_host_attr.vm_user,
-                                              password=cs_host_attr.vm_password,
-                                              command=command,
-                                              output=output)
 
-            if return_code != 0:
+            def umount():
+                output.clear()
+                return_code = exec_remote_command(server=host.address,
+                                                  username=cs_host_attr.vm_user,
+                                                  password=cs_host_attr.vm_password,
+                                                  command=command,
+                                                  output=output)
+                return return_code == 0
+
+            if not wait_until(umount, timeout=30, name='umount_data'):
                 raise Exception(str(output))
 
             if len(workflow_dict['not_primary_hosts']) >= 1:
@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 from django.core.exceptions import ObjectDoesNotExist
-from time import sleep
+from django.db import transaction
 from util import check_ssh
+from util.wait import wait_until
 from dbaas_cloudstack.models import HostAttr, PlanAttr
 from dbaas_cloudstack.provider import CloudStackProvider
 from dbaas_credentials.models import CredentialType
@@ -157,18 +158,17 @@ class ChangeMaster(VmStep):
             return
 
         if self.driver.check_instance_is_master(instance=self.instance):
-            error = None
-
-            for _ in range(CHANGE_MASTER_ATTEMPS):
-                try:
-                    self.driver.check_replication_and_switch(self.instance)
-                except Exception as e:
-                    error = e
-                    sleep(CHANGE_MASTER_SECONDS)
-                else:
-                    return
-
-            raise error
+            def switch_master():
+                self.driver.check_replication_and_switch(self.instance)
+                return True
+
+            wait_until(
+                switch_master, timeout=None,
+                initial_interval=CHANGE_MASTER_SECONDS,
+                max_interval=CHANGE_MASTER_SECONDS, jitter=0,
+                max_attempts=CHANGE_MASTER_ATTEMPS, retry_on=(Exception,),
+                name='change_master'
+            )
 
 
 class CreateVirtualMachine(VmStep):
@@ -208,10 +208,16 @@ class CreateVirtualMachine(VmStep):
         self.instance.save()
 
     def update_databaseinfra_last_vm_created(self):
-        last_vm_created = self.databaseinfra.last_vm_created
-        last_vm_created += 1
-        self.databaseinfra.last_vm_created = last_vm_created
-        self.databaseinfra.save()
+        from django.db.models import F
+        from physical.models import DatabaseInfra
+
+        # VMs of the same infra can be created at the same time
+        DatabaseInfra.objects.filter(id=self.databaseinfra.id).update(
+            last_vm_created=F('last_vm_created') + 1
+        )
+        self.databaseinfra.last_vm_created = DatabaseInfra.objects.filter(
+            id=self.databaseinfra.id
+        ).values_list('last_vm_created', flat=True)[0]
 
     def get_next_bundle(self):
         raise NotImplementedError
@@ -279,7 +285,15 @@ class CreateVirtualMachineHorizontalElasticity(CreateVirtualMachine):
     def read_only_instance(self):
         return True
 
+    @transaction.atomic
     def get_next_bundle(self):
+        from physical.models import DatabaseInfra
+
+        # VMs of the infra are created in parallel, the lock of the infra
+        # keeps them from reading the same last used bundle
+        DatabaseInfra.objects.select_for_update().get(
+            id=self.databaseinfra.id
+        )
         bundle = LastUsedBundleDatabaseInfra.get_next_infra_bundle(
             databaseinfra=self.databaseinfra)
         return bundle
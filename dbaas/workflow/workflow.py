@@ -2,11 +2,15 @@
 import logging
 import time
 from util import full_stack
-from django.utils.module_loading import import_by_path
 from exceptions.error_codes import DBAAS_0001
+from util.parallel import run_in_parallel
+from .plan import compile_plan, resolve_step, InvalidWorkflowPlan
+from .progress import StepProgress
 
 LOG = logging.getLogger(__name__)
 
+PARALLEL_MAX_WORKERS = 5
+
 
 def start_workflow(workflow_dict, task=None):
     try:
@@ -43,10 +47,11 @@ def start_workflow(workflow_dict, task=None):
         workflow_dict['exceptions']['traceback'] = []
         workflow_dict['exceptions']['error_codes'] = []
 
+        compile_plan(workflow_dict['steps'])
         for step in workflow_dict['steps']:
             workflow_dict['step_counter'] += 1
 
-            my_class = import_by_path(step)
+            my_class = resolve_step(step)
             my_instance = my_class()
 
             time_now = str(time.strftime("%m/%d/%Y %H:%M:%S"))
@@ -133,9 +138,10 @@ def stop_workflow(workflow_dict, task=None):
 
     try:
 
+        compile_plan(workflow_dict['steps'])
         for step in workflow_dict['steps'][::-1]:
 
-            my_class = import_by_path(step)
+            my_class = resolve_step(step)
             my_instance = my_class()
 
             time_now = str(time.strftime("%m/%d/%Y %H:%M:%S"))
@@ -175,77 +181,177 @@ def stop_workflow(workflow_dict, task=None):
 
 
 def steps_for_instances_with_rollback(group_of_steps, instances, task):
+    try:
+        plan = compile_plan(group_of_steps)
+    except InvalidWorkflowPlan as e:
+        task.add_detail(str(e))
+        return False
 
-    steps_for_instances_with_rollback.current_step = 0
-
-    def update_step(step):
-        steps_for_instances_with_rollback.current_step = step
-
+    executed_steps = [[] for instance in instances]
     ret = steps_for_instances(
-        list_of_groups_of_steps=group_of_steps,
+        list_of_groups_of_steps=plan,
         instances=instances,
         task=task,
-        step_counter_method=update_step
+        executed_steps=executed_steps
     )
 
     if ret:
         return ret
 
-    if len(group_of_steps) > 1:
-        task.add_detail('Rollback is implemented only for one group of steps!')
-        return False
+    steps = plan.steps
+
+    for instance, executed in zip(instances, executed_steps):
+        if not executed or len(executed) == len(steps):
+            continue
+
+        task.add_detail('Starting undo for instance {}'.format(instance))
+        rollback_steps_for_instance(steps, instance, len(executed), task)
 
-    steps = group_of_steps[0].items()[0][1]
-    i = 0
+    databases = set()
     for instance in instances:
-        instance_current_step = 0
-        for step in steps:
-            i += 1
-            instance_current_step += 1
-            if i == steps_for_instances_with_rollback.current_step:
-                break
-        if i == steps_for_instances_with_rollback.current_step:
-            break
+        databases.add(instance.databaseinfra.databases.first())
+
+    for db in databases:
+        db.unpin_task()
+
+    return ret
 
-    task.add_detail('Starting undo for instance {}'.format(instance))
 
+def rollback_steps_for_instance(steps, instance, executed, task):
+    progress = StepProgress(task, len(steps))
     undo_step_current = len(steps)
     for step in reversed(steps):
 
         try:
-            step_class = import_by_path(step)
-            step_instance = step_class(instance)
+            step_instance = step.step_class(instance)
 
-            task.add_step(undo_step_current, len(steps), 'Rollback ' + str(step_instance))
+            progress.start_step(
+                undo_step_current, instance, 'Rollback ' + str(step_instance)
+            )
 
-            if instance_current_step < undo_step_current:
-                task.update_details("SKIPPED!", persist=True)
+            if executed < undo_step_current:
+                progress.finish_step(undo_step_current, 'SKIPPED')
             else:
                 step_instance.undo()
-                task.update_details("SUCCESS!", persist=True)
+                progress.finish_step(undo_step_current, 'SUCCESS')
 
         except Exception as e:
-            task.update_details("FAILED!", persist=True)
-            task.add_detail(str(e))
-            task.add_detail(full_stack())
+            progress.finish_step(undo_step_current, 'FAILED')
+            progress.add_detail(str(e))
+            progress.add_detail(full_stack())
 
         finally:
             undo_step_current -= 1
 
-    databases = set()
-    for instance in instances:
-        databases.add(instance.databaseinfra.databases.first())
+    progress.close()
 
-    for db in databases:
-        db.unpin_task()
 
-    return ret
+def run_steps_for_instance(
+        steps, instance, first_step, progress, since_step=0, undo=False,
+        step_counter_method=None, executed=None, parallel=False
+):
+    step_current = first_step
+    for step in steps:
+        step_current += 1
+
+        if step_counter_method:
+            step_counter_method(step_current)
+
+        str_step_instance = step.path
+        try:
+            step_instance = step.step_class(instance)
+
+            if undo:
+                str_step_instance = 'Rollback ' + str(step_instance)
+            else:
+                str_step_instance = str(step_instance)
+            progress.start_step(
+                step_current, instance, str_step_instance,
+                detail=not parallel
+            )
+
+            if step_current < since_step:
+                status = 'SKIPPED'
+            else:
+                if executed is not None:
+                    executed.append(step.path)
+                if undo:
+                    step_instance.undo()
+                else:
+                    step_instance.do()
+                status = 'SUCCESS'
+
+        except Exception as e:
+            progress.finish_step(
+                step_current, 'FAILED',
+                description=str_step_instance if parallel else None
+            )
+            progress.add_detail(str(e))
+            progress.add_detail(full_stack())
+            return False
+
+        progress.finish_step(
+            step_current, status,
+            description=str_step_instance if parallel else None
+        )
+
+    return True
+
+
+def run_parallel_steps_for_instances(
+        steps, instances, first_step, progress, since_step=0, undo=False,
+        step_counter_method=None, executed_steps=None
+):
+    from system.models import Configuration
+
+    if step_counter_method:
+        # Steps of a parallel group do not finish in order, a resumed task
+        # must start the group again
+        step_counter_method(first_step + 1)
+
+    def run(item):
+        index, instance = item
+        return run_steps_for_instance(
+            steps, instance, first_step + index * len(steps), progress,
+            since_step, undo,
+            executed=executed_steps and executed_steps[index],
+            parallel=True
+        )
+
+    max_workers = Configuration.get_by_name_as_int(
+        'workflow_parallel_max_workers', default=PARALLEL_MAX_WORKERS
+    )
+    results = run_in_parallel(
+        run, list(enumerate(instances)), max_workers=max_workers
+    )
+
+    success = True
+    for result in results:
+        if result.error or not result.result:
+            success = False
+            progress.add_detail('Instance {} failed'.format(result.item[1]))
+            if result.error:
+                progress.add_detail(str(result.error))
+    return success
 
 
 def steps_for_instances(
         list_of_groups_of_steps, instances, task, step_counter_method=None,
-        since_step=0, undo=False
+        since_step=0, undo=False, executed_steps=None
 ):
+    """
+    Runs each group of steps for every instance. A group of ParallelSteps
+    runs for all instances at the same time, the other groups run for one
+    instance after another. When executed_steps is given, it is filled with
+    the steps started for each instance, in the order of instances.
+    list_of_groups_of_steps can be a WorkflowPlan or the groups to compile.
+    """
+    try:
+        plan = compile_plan(list_of_groups_of_steps)
+    except InvalidWorkflowPlan as e:
+        task.add_detail(str(e))
+        return False
+
     databases = set()
     for instance in instances:
         databases.add(instance.databaseinfra.databases.first())
@@ -261,62 +367,53 @@ def steps_for_instances(
         else:
             db.update_task(task)
 
-    steps_total = 0
-    for group_of_steps in list_of_groups_of_steps:
-        steps_total += len(group_of_steps.items()[0][1])
-
-    steps_total = steps_total * len(instances)
+    steps_total = len(plan.steps) * len(instances)
     step_current = 0
 
-    task.add_detail('Instances: {}'.format(len(instances)))
+    progress = StepProgress(task, steps_total)
+    progress.add_detail('Instances: {}'.format(len(instances)))
     for instance in instances:
-        task.add_detail('{}'.format(instance), level=2)
-    task.add_detail('')
+        progress.add_detail('{}'.format(instance), level=2)
+    progress.add_detail('')
 
     if since_step:
-        task.add_detail('Skipping until step {}\n'.format(since_step))
+        progress.add_detail('Skipping until step {}\n'.format(since_step))
 
-    for count, group_of_steps in enumerate(list_of_groups_of_steps, start=1):
-        task.add_detail('Starting group of steps {} of {} - {}'.format(
-            count, len(list_of_groups_of_steps), group_of_steps.keys()[0])
+    for count, group in enumerate(plan, start=1):
+        progress.add_detail('Starting group of steps {} of {} - {}'.format(
+            count, len(plan), group.description)
         )
-        steps = group_of_steps.items()[0][1]
-        for instance in instances:
-            task.add_detail('Instance: {}'.format(instance))
-            for step in steps:
-                step_current += 1
-
-                if step_counter_method:
-                    step_counter_method(step_current)
-
-                try:
-                    step_class = import_by_path(step)
-                    step_instance = step_class(instance)
-
-                    if undo:
-                        str_step_instance = 'Rollback ' + str(step_instance)
-                    else:
-                        str_step_instance = str(step_instance)
-                    task.add_step(step_current, steps_total, str_step_instance)
-
-                    if step_current < since_step:
-                        task.update_details("SKIPPED!", persist=True)
-                    else:
-                        if undo:
-                            step_instance.undo()
-                        else:
-                            step_instance.do()
-                        task.update_details("SUCCESS!", persist=True)
-
-                except Exception as e:
-                    task.update_details("FAILED!", persist=True)
-                    task.add_detail(str(e))
-                    task.add_detail(full_stack())
-                    return False
-
-        task.add_detail('Ending group of steps: {} of {}\n'.format(
-            count, len(list_of_groups_of_steps))
+        steps = group.steps
+
+        if group.parallel and len(instances) > 1:
+            success = run_parallel_steps_for_instances(
+                steps, instances, step_current, progress, since_step, undo,
+                step_counter_method, executed_steps
+            )
+            step_current += len(steps) * len(instances)
+        else:
+            success = True
+            for index, instance in enumerate(instances):
+                progress.add_detail('Instance: {}'.format(instance))
+                success = run_steps_for_instance(
+                    steps, instance, step_current, progress, since_step, undo,
+                    step_counter_method,
+                    executed_steps and executed_steps[index]
+                )
+                step_current += len(steps)
+                if not success:
+                    break
+
+        if not success:
+            progress.close()
+            return False
+
+        progress.add_detail('Ending group of steps: {} of {}\n'.format(
+            count, len(plan))
         )
+        progress.flush()
+
+    progress.close()
 
     for db in databases:
         db.unpin_task()